@@ -0,0 +1,180 @@
+"""
+Memory Consolidation
+Background job that folds clusters of semantically similar memories (by
+default the many small `event` memories of a long campaign) into one summary
+memory each. The originals are archived: they leave retrieval and the
+resident index but keep their rows, linked to the summary via
+`consolidated_into`. Runs are incremental: only memories added since the
+previous run's watermark are clustered, against the whole active set.
+The job writes through the same FantasyMemorySystem as chat turns, whose
+flushes are serialized on the database writer, so it can run on a thread
+alongside them.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+from memory_system import FantasyMemorySystem
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryConsolidator:
+    def __init__(self, memory_system: FantasyMemorySystem, memory_types: Sequence[str] = ("event",),
+                 similarity_threshold: float = 0.8, min_cluster_size: int = 3,
+                 max_cluster_size: int = 50, batch_size: int = 2000, summary_chars: int = 600):
+        """
+        Args:
+            memory_system: Memory system whose memories are consolidated
+            memory_types: Types that are clustered (clusters never mix types)
+            similarity_threshold: Cosine similarity every member must have to the cluster's seed
+            min_cluster_size: Smallest cluster worth replacing by a summary
+            max_cluster_size: Largest cluster folded into one summary
+            batch_size: New memories examined per run; later ones wait for the next run
+            summary_chars: Maximum length of a summary's content
+        """
+        if not 0 < similarity_threshold <= 1:
+            raise ValueError(f"similarity_threshold must be in (0, 1]: {similarity_threshold}")
+        if min_cluster_size < 2:
+            raise ValueError(f"min_cluster_size must be at least 2: {min_cluster_size}")
+        self.memory = memory_system
+        self.memory_types = tuple(memory_types)
+        self.similarity_threshold = similarity_threshold
+        self.min_cluster_size = min_cluster_size
+        self.max_cluster_size = max(min_cluster_size, max_cluster_size)
+        self.batch_size = batch_size
+        self.summary_chars = summary_chars
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        with self.memory.db.write() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS consolidation_runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    finished_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    watermark INTEGER NOT NULL,  -- Highest memories.rowid examined
+                    examined INTEGER NOT NULL,
+                    clusters INTEGER NOT NULL,
+                    archived INTEGER NOT NULL
+                )
+            ''')
+
+    def watermark(self) -> int:
+        """Highest memory rowid examined by a previous run."""
+        with self.memory.db.read() as conn:
+            row = conn.execute('SELECT MAX(watermark) FROM consolidation_runs').fetchone()
+        return row[0] or 0
+
+    def run_once(self) -> Dict:
+        """Consolidate memories added since the last run; returns what was done."""
+        with self._run_lock:
+            start_time = time.time()
+            placeholders = ','.join('?' * len(self.memory_types))
+            with self.memory.db.read() as conn:
+                rows = conn.execute(f'''
+                    SELECT rowid, id
+                    FROM memories
+                    WHERE rowid > ? AND type IN ({placeholders}) AND status = 'active'
+                    ORDER BY rowid
+                    LIMIT ?
+                ''', [self.watermark(), *self.memory_types, self.batch_size]).fetchall()
+            stats = {'examined': len(rows), 'clusters': 0, 'archived': 0, 'summaries': []}
+            if not rows:
+                return stats
+
+            new_ids = [row[1] for row in rows]
+            neighbors = self.memory.similar_memories(new_ids, self.similarity_threshold)
+            for cluster in self._clusters(new_ids, neighbors):
+                summary_id = self._consolidate(cluster)
+                if summary_id is not None:
+                    stats['clusters'] += 1
+                    stats['archived'] += len(cluster)
+                    stats['summaries'].append(summary_id)
+
+            with self.memory.db.write() as conn:
+                conn.execute('''
+                    INSERT INTO consolidation_runs (watermark, examined, clusters, archived)
+                    VALUES (?, ?, ?, ?)
+                ''', (rows[-1][0], stats['examined'], stats['clusters'], stats['archived']))
+            logger.info(f"Consolidation examined {stats['examined']} memories: {stats['clusters']} clusters, "
+                        f"{stats['archived']} archived in {time.time() - start_time:.2f}s")
+            return stats
+
+    def _clusters(self, new_ids: List[str], neighbors: Dict[str, List]) -> List[List[str]]:
+        """
+        Greedy seed clustering: the new memory with the most unclaimed
+        neighbours seeds a cluster of itself plus those neighbours, so every
+        member is similar to the seed and clusters cannot chain.
+        """
+        claimed = set()
+        clusters = []
+        seeds = sorted((memory_id for memory_id in new_ids if memory_id in neighbors),
+                       key=lambda memory_id: len(neighbors[memory_id]), reverse=True)
+        for seed in seeds:
+            if seed in claimed:
+                continue
+            members = [seed] + [memory_id for memory_id, _ in neighbors[seed] if memory_id not in claimed]
+            members = members[:self.max_cluster_size]
+            if len(members) >= self.min_cluster_size:
+                claimed.update(members)
+                clusters.append(members)
+        return clusters
+
+    def _consolidate(self, cluster: List[str]) -> Optional[str]:
+        """Store a summary of the cluster and archive its members in one transaction."""
+        with self.memory.db.read() as conn:
+            placeholders = ','.join('?' * len(cluster))
+            members = conn.execute(f'''
+                SELECT id, type, name, content, importance, timestamp
+                FROM memories
+                WHERE id IN ({placeholders}) AND status = 'active'
+                ORDER BY timestamp, rowid
+            ''', cluster).fetchall()
+        if len(members) < self.min_cluster_size:
+            return None
+
+        memory_type = members[0][1]
+        by_importance = sorted(members, key=lambda member: member[4], reverse=True)
+        contents = list(dict.fromkeys(member[3] for member in by_importance))
+        content = f"Summary of {len(members)} related {memory_type} memories: " + " | ".join(contents)
+        if len(content) > self.summary_chars:
+            content = content[:self.summary_chars - 3] + "..."
+        # The seed's name (or the most important member's) labels the summary
+        name = next((member[2] for member in members if member[0] == cluster[0]), None) or by_importance[0][2]
+
+        with self.memory.unit_of_work():
+            summary_id = self.memory.store_memory(
+                content, memory_type, name,
+                attributes={'consolidated_from': len(members),
+                            'first_seen': members[0][5], 'last_seen': members[-1][5]},
+                importance=by_importance[0][4],
+                deduplicate=False
+            )
+            self.memory.archive_memories([member[0] for member in members], consolidated_into=summary_id)
+        return summary_id
+
+    def start(self, interval: float = 300.0):
+        """Run consolidation every `interval` seconds on a daemon thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.run_once()
+                except Exception as e:
+                    logger.error(f"Consolidation run failed: {e}")
+
+        self._thread = threading.Thread(target=loop, name="memory-consolidation", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        """Stop the background thread, waiting for a run in progress to finish."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
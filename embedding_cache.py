@@ -0,0 +1,174 @@
+"""
+Embedding Cache
+Content-hash cache in front of the sentence embedder: a bounded in-process
+LRU plus an optional SQLite tier that several processes can share.
+Also owns the process-wide, lazily loaded embedding model.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+
+from database import SQLiteConnectionManager
+
+logger = logging.getLogger(__name__)
+
+
+class LazyEmbedder:
+    """SentenceTransformer wrapper that defers importing and loading the model until first encode."""
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    start_time = time.time()
+                    # Deferred: importing sentence_transformers pulls in torch
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name)
+                    logger.info(f"Loaded embedding model {self.model_name} in {time.time() - start_time:.2f}s")
+        return self._model
+
+    def encode(self, texts, **kwargs):
+        return self.model.encode(texts, **kwargs)
+
+
+_shared_embedders: Dict[str, LazyEmbedder] = {}
+_shared_embedders_lock = threading.Lock()
+
+
+def get_shared_embedder(model_name: str) -> LazyEmbedder:
+    """Process-wide embedder for `model_name`, shared by every memory system instance."""
+    with _shared_embedders_lock:
+        if model_name not in _shared_embedders:
+            _shared_embedders[model_name] = LazyEmbedder(model_name)
+        return _shared_embedders[model_name]
+
+
+class EmbeddingCache:
+    def __init__(self, embedder, model_name: str, max_entries: int = 10000, disk_path: str = None):
+        """
+        Args:
+            embedder: Object with an encode(texts) method (e.g. SentenceTransformer)
+            model_name: Included in cache keys so different models never collide
+            max_entries: Capacity of the in-process LRU
+            disk_path: SQLite file for the shared on-disk tier (disabled if None)
+        """
+        self.embedder = embedder
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self._lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self.disk: Optional[SQLiteConnectionManager] = None
+        if disk_path:
+            self.disk = SQLiteConnectionManager(disk_path)
+            with self.disk.write() as conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS embedding_cache (
+                        key TEXT PRIMARY KEY,
+                        model TEXT NOT NULL,
+                        embedding BLOB NOT NULL
+                    )
+                ''')
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """Canonical form used for hashing: NFC with collapsed whitespace."""
+        return ' '.join(unicodedata.normalize('NFC', text).split())
+
+    def key(self, text: str) -> str:
+        digest = hashlib.sha1(self.normalize_text(text).encode('utf-8')).hexdigest()
+        return f"{self.model_name}:{digest}"
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed texts, only running the model for ones not cached in either tier."""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        keys = [self.key(text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+
+        with self._lock:
+            for key in keys:
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    found[key] = self._lru[key]
+            self.hits += sum(1 for key in keys if key in found)
+
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if missing and self.disk is not None:
+            on_disk = self._disk_get(missing)
+            found.update(on_disk)
+            self._remember(on_disk, disk_hits=sum(1 for key in keys if key in on_disk))
+            missing = [key for key in missing if key not in on_disk]
+
+        if missing:
+            first_text = {}
+            for key, text in zip(keys, texts):
+                first_text.setdefault(key, text)
+            vectors = np.asarray(self.embedder.encode([first_text[key] for key in missing]), dtype=np.float32)
+            computed = dict(zip(missing, vectors))
+            found.update(computed)
+            self._remember(computed, misses=sum(1 for key in keys if key in computed))
+            if self.disk is not None:
+                self._disk_put(computed)
+
+        return np.stack([found[key] for key in keys])
+
+    def _remember(self, entries: Dict[str, np.ndarray], disk_hits: int = 0, misses: int = 0):
+        with self._lock:
+            self.disk_hits += disk_hits
+            self.misses += misses
+            for key, vector in entries.items():
+                self._lru[key] = vector
+                self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def _disk_get(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        entries = {}
+        with self.disk.read() as conn:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                for key, blob in conn.execute(
+                        f'SELECT key, embedding FROM embedding_cache WHERE key IN ({placeholders})', chunk):
+                    entries[key] = np.frombuffer(blob, dtype=np.float32)
+        return entries
+
+    def _disk_put(self, entries: Dict[str, np.ndarray]):
+        with self.disk.write() as conn:
+            conn.executemany('INSERT OR IGNORE INTO embedding_cache (key, model, embedding) VALUES (?, ?, ?)',
+                             [(key, self.model_name, vector.tobytes()) for key, vector in entries.items()])
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for both tiers."""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            'entries': len(self._lru)
+        }
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
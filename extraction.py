@@ -0,0 +1,321 @@
+"""
+Memory Extraction Pipeline
+Finds memory candidates (characters, locations, items, events) in chat text.
+Every trigger keyword of every registered extractor is compiled into one
+Aho-Corasick automaton, so the text is scanned once; extractors then parse
+only the text around their hits with precompiled, anchored regexes.
+"""
+
+import re
+from collections import deque
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+# Proper names: capitalized words, e.g. "Thorin" or "Old Tom"
+NAME = r'[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*'
+# How far back before a trigger an extractor looks for the name it refers to
+BEFORE_WINDOW = 80
+
+
+class Candidate(NamedTuple):
+    """A memory the pipeline proposes to store."""
+    memory_type: str
+    name: Optional[str]
+    content: str
+    importance: int = 5
+
+    def as_record(self) -> Dict:
+        """Keyword arguments for FantasyMemorySystem.store_memories()."""
+        return {'memory_type': self.memory_type, 'name': self.name,
+                'content': self.content, 'importance': self.importance}
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton matching many lowercase keywords in one pass."""
+
+    def __init__(self, keywords: Iterable[str] = ()):
+        self.keywords: List[str] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        self._built = False
+        for keyword in keywords:
+            self.add(keyword)
+
+    def add(self, keyword: str) -> int:
+        """Add a keyword and return its index."""
+        if not keyword:
+            raise ValueError("Keywords must be non-empty")
+        state = 0
+        for char in keyword.lower():
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self.keywords.append(keyword.lower())
+        self._out[state].append(len(self.keywords) - 1)
+        self._built = False
+        return len(self.keywords) - 1
+
+    def build(self):
+        """Compute failure links breadth-first."""
+        queue = deque(self._goto[0].values())
+        for state in queue:
+            self._fail[state] = 0
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                if self._fail[next_state] == next_state:
+                    self._fail[next_state] = 0
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+        self._built = True
+
+    def find_all(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """Yield (start, end, keyword index) for every occurrence, ordered by end offset."""
+        if not self._built:
+            self.build()
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # A few characters lowercase to several; keep offsets aligned with the original
+            lowered = ''.join(char.lower() if len(char.lower()) == 1 else char for char in text)
+        goto, fail, out, keywords = self._goto, self._fail, self._out, self.keywords
+        state = 0
+        for position, char in enumerate(lowered):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in out[state]:
+                yield position + 1 - len(keywords[index]), position + 1, index
+
+
+class Extractor:
+    """
+    Base class for per-type extractors. `triggers` are keywords that fire
+    on_match(); extractors without triggers implement scan() instead.
+    """
+    triggers: Sequence[str] = ()
+
+    def __init__(self, memory_type: str, importance: int = 5, limit: int = None):
+        """
+        Args:
+            memory_type: Type of the memories this extractor proposes
+            importance: Importance given to its candidates
+            limit: Maximum candidates per extracted text (unlimited if None)
+        """
+        self.memory_type = memory_type
+        self.importance = importance
+        self.limit = limit
+
+    def on_match(self, text: str, start: int, end: int) -> Optional[Candidate]:
+        return None
+
+    def scan(self, text: str) -> Iterable[Candidate]:
+        return ()
+
+
+class PatternExtractor(Extractor):
+    """
+    Parses the text after a trigger with an anchored regex that has a
+    `detail` group and optionally a `name` group; `before` optionally takes
+    the name from the text just before the trigger instead.
+    """
+
+    def __init__(self, memory_type: str, triggers: Sequence[str], after: str, before: str = None,
+                 importance: int = 5, limit: int = None):
+        super().__init__(memory_type, importance, limit)
+        self.triggers = tuple(triggers)
+        self.after = re.compile(after)
+        self.before = re.compile(before) if before else None
+
+    def on_match(self, text: str, start: int, end: int) -> Optional[Candidate]:
+        name = None
+        if self.before is not None:
+            match = self.before.search(text, max(0, start - BEFORE_WINDOW), start)
+            if match is None:
+                return None
+            name = match.group('name')
+        match = self.after.match(text, end)
+        if match is None:
+            return None
+        if name is None and 'name' in self.after.groupindex:
+            name = match.group('name')
+        detail = match.group('detail').strip()
+
+        if name:
+            name = name.strip()
+            content = f"{name}: {detail}" if detail else name
+        else:
+            content = detail
+            name = content[:50] + "..." if len(content) > 50 else content
+        if not content:
+            return None
+        return Candidate(self.memory_type, name, content, self.importance)
+
+
+class ProperNounExtractor(Extractor):
+    """Proposes a character for each capitalized word that isn't a stopword."""
+
+    WORD = re.compile(r'\b[A-Z][a-z]+\b')
+    STOPWORDS = frozenset(['the', 'and', 'you', 'are', 'with', 'from'])
+
+    def scan(self, text: str) -> Iterator[Candidate]:
+        for match in self.WORD.finditer(text):
+            word = match.group()
+            if len(word) > 2 and word.lower() not in self.STOPWORDS:
+                yield Candidate(self.memory_type, word, f"{word} is mentioned in the story", self.importance)
+
+
+class PlaceKeywordExtractor(Extractor):
+    """Proposes a location named by a place keyword and the word before it ("old tavern")."""
+
+    WORD_BEFORE = re.compile(r'(?P<word>\w+)\s+$')
+
+    def __init__(self, memory_type: str, keywords: Sequence[str], importance: int = 5, limit: int = None):
+        super().__init__(memory_type, importance, limit)
+        self.triggers = tuple(keywords)
+
+    def on_match(self, text: str, start: int, end: int) -> Optional[Candidate]:
+        match = self.WORD_BEFORE.search(text, max(0, start - BEFORE_WINDOW), start)
+        if match is None:
+            return None
+        location_name = f"{match.group('word')} {text[start:end]}".lower()
+        return Candidate(self.memory_type, location_name.title(),
+                         f"{location_name} is mentioned in the story", self.importance)
+
+
+class PlotIndicatorExtractor(Extractor):
+    """Proposes one plot-development event when the text contains a narrative indicator."""
+
+    def __init__(self, memory_type: str, indicators: Sequence[str], importance: int = 7):
+        super().__init__(memory_type, importance, limit=1)
+        self.triggers = tuple(indicators)
+
+    def on_match(self, text: str, start: int, end: int) -> Optional[Candidate]:
+        return Candidate(self.memory_type, None, f"Plot development: {text[:100]}...", self.importance)
+
+
+class ExtractionPipeline:
+    """Runs registered extractors over a text in a single keyword pass."""
+
+    def __init__(self):
+        self._extractors: Dict[str, List[Extractor]] = {}
+        self._automaton: Optional[KeywordAutomaton] = None
+        self._by_keyword: List[List[Extractor]] = []
+
+    def register(self, extractor: Extractor) -> 'ExtractionPipeline':
+        """Add an extractor under its memory type."""
+        self._extractors.setdefault(extractor.memory_type, []).append(extractor)
+        self._automaton = None
+        return self
+
+    def extractors(self, memory_type: str = None) -> List[Extractor]:
+        """Registered extractors, optionally only those of one memory type."""
+        if memory_type is not None:
+            return list(self._extractors.get(memory_type, []))
+        return [extractor for group in self._extractors.values() for extractor in group]
+
+    def _compile(self):
+        automaton = KeywordAutomaton()
+        by_keyword: List[List[Extractor]] = []
+        indexes: Dict[str, int] = {}
+        for extractor in self.extractors():
+            for trigger in extractor.triggers:
+                trigger = trigger.lower()
+                if trigger not in indexes:
+                    indexes[trigger] = automaton.add(trigger)
+                    by_keyword.append([])
+                by_keyword[indexes[trigger]].append(extractor)
+        automaton.build()
+        self._automaton, self._by_keyword = automaton, by_keyword
+
+    @staticmethod
+    def _at_word_boundary(text: str, start: int, end: int) -> bool:
+        """Triggers must not start or end inside a word ("inn" in "dinner")."""
+        if text[start].isalnum() and start > 0 and text[start - 1].isalnum():
+            return False
+        if text[end - 1].isalnum() and end < len(text) and text[end].isalnum():
+            return False
+        return True
+
+    def extract(self, text: str) -> List[Candidate]:
+        """Candidates found in text, in order of discovery and without duplicates."""
+        if self._automaton is None:
+            self._compile()
+        candidates: List[Candidate] = []
+        seen = set()
+        counts: Dict[int, int] = {}
+
+        def accept(extractor: Extractor, candidate: Optional[Candidate]):
+            if candidate is None:
+                return
+            key = (candidate.memory_type, candidate.content.lower())
+            if key not in seen:
+                seen.add(key)
+                candidates.append(candidate)
+                counts[id(extractor)] = counts.get(id(extractor), 0) + 1
+
+        def exhausted(extractor: Extractor) -> bool:
+            return extractor.limit is not None and counts.get(id(extractor), 0) >= extractor.limit
+
+        for start, end, index in self._automaton.find_all(text):
+            if not self._at_word_boundary(text, start, end):
+                continue
+            for extractor in self._by_keyword[index]:
+                if not exhausted(extractor):
+                    accept(extractor, extractor.on_match(text, start, end))
+
+        for extractor in self.extractors():
+            if extractor.triggers:
+                continue
+            remaining = None if extractor.limit is None else extractor.limit
+            for candidate in islice(extractor.scan(text), remaining):
+                accept(extractor, candidate)
+        return candidates
+
+
+def build_mention_pipeline() -> ExtractionPipeline:
+    """Entities and plot beats mentioned anywhere in a turn (auto_extract_memories)."""
+    return (ExtractionPipeline()
+            .register(ProperNounExtractor("character", importance=6, limit=3))
+            .register(PlaceKeywordExtractor("location", ['village', 'town', 'city', 'forest', 'mountain',
+                                                         'castle', 'tavern', 'inn', 'palace', 'river',
+                                                         'lake']))
+            .register(PlotIndicatorExtractor("event", ['suddenly', 'meanwhile', 'however', 'unexpectedly',
+                                                       'the next day', 'afterwards'])))
+
+
+def build_narrative_pipeline() -> ExtractionPipeline:
+    """
+    New facts stated in an LLM response (FantasyChatbot._extract_and_store_memories).
+
+    Triggers match in any case, as the legacy patterns did. Names must be
+    capitalized: the legacy patterns ran with re.IGNORECASE, which let their
+    [A-Z] classes take any word ("The door is locked" stored a "The door" character).
+    """
+    article = r'(?:(?i:a|an|the)\s+)?'
+    named = rf'\s*{article}(?P<name>{NAME})\s*,?\s*(?P<detail>.*?)(?:\.|\n)'
+    labelled = rf'\s*(?P<name>{NAME})\s*[:\-]\s*(?P<detail>.*?)(?:\.|\n)'
+    item = r'[A-Z][a-z]+(?:\s+[a-z]+)*'
+    return (ExtractionPipeline()
+            .register(PatternExtractor("character", ['i meet', 'meet', 'see', 'encounter'], named))
+            .register(PatternExtractor("character", ['is', 'appears', 'seems'], r'\s+(?P<detail>.*?)(?:\.|\n)',
+                                       before=rf'(?P<name>{NAME})\s+$'))
+            .register(PatternExtractor("character", ['npc:'], labelled))
+            .register(PatternExtractor("location", ['go to', 'enter', 'arrive at', 'reach'],
+                                       rf'\s+(?:(?i:the)\s+)?(?P<name>{NAME})\s*,?\s*(?P<detail>.*?)(?:\.|\n)'))
+            .register(PatternExtractor("location", ['location:', 'place:'], labelled))
+            .register(PatternExtractor("item", ['find', 'discover', 'pick up', 'take'],
+                                       rf'\s*{article}(?P<name>{item})\s*,?\s*(?P<detail>.*?)(?:\.|\n)'))
+            .register(PatternExtractor("item", ['item:', 'object:'],
+                                       rf'\s*(?P<name>{item})\s*[:\-]\s*(?P<detail>.*?)(?:\.|\n)'))
+            .register(PatternExtractor("event", ['suddenly', 'then', 'afterwards'], r'\s+(?P<detail>.*?)(?:\.|\n)'))
+            .register(PatternExtractor("event", ['event:', 'incident:'], r'\s*(?P<detail>.*?)(?:\.|\n)')))
@@ -7,12 +7,15 @@ import os
 import json
 import uuid
 import argparse
+from collections import deque
 from datetime import datetime
 from typing import List, Dict, Optional
 import threading
 import time
 
 from memory_system import FantasyMemorySystem
+from extraction import build_narrative_pipeline
+from consolidation import MemoryConsolidator
 from local_llm import LocalFantasyLLM, get_model_for_vram
 import logging
 
@@ -21,7 +24,8 @@ logger = logging.getLogger(__name__)
 
 class FantasyChatbot:
     def __init__(self, session_id: str = None, model_name: str = None, 
-                 use_quantization: bool = True, memory_db_path: str = "fantasy_world.db"):
+                 use_quantization: bool = True, memory_db_path: str = "fantasy_world.db",
+                 history_buffer_size: int = 20, consolidation_interval: float = None):
         """
         Initialize the fantasy chatbot with memory and LLM.
         
@@ -30,10 +34,27 @@ class FantasyChatbot:
             model_name: LLM model to use (auto-detects if None)
             use_quantization: Use model quantization to save VRAM
             memory_db_path: Path to SQLite database for memories
+            history_buffer_size: Recent exchanges kept in memory per session
+            consolidation_interval: Seconds between background consolidation runs
+                that fold clusters of similar event memories into summaries (off if None)
         """
         self.session_id = session_id or str(uuid.uuid4())
         self.memory_system = FantasyMemorySystem(memory_db_path)
         
+        # Per-session ring buffers of recent exchanges, with the data_version they were checked at
+        self.history_buffer_size = history_buffer_size
+        self._history: Dict[str, deque] = {}
+        self._history_versions: Dict[str, int] = {}
+        self._history_lock = threading.Lock()
+        
+        # Single-pass extractors for new facts in LLM responses
+        self.extraction_pipeline = build_narrative_pipeline()
+        
+        self.consolidator: Optional[MemoryConsolidator] = None
+        if consolidation_interval:
+            self.consolidator = MemoryConsolidator(self.memory_system)
+            self.consolidator.start(consolidation_interval)
+        
         # Auto-detect GPU memory and recommend model
         if model_name is None:
             if self._has_cuda():
@@ -63,40 +84,41 @@ class FantasyChatbot:
         """Initialize the fantasy world with default content if database is empty."""
         stats = self.memory_system.get_memory_stats()
         
-        if stats['total_memories'] == 0:
+        if sum(stats['by_status'].values()) == 0:
             logger.info("Initializing new fantasy world...")
             
-            # Store initial world setup
-            self.memory_system.store_memory(
-                "A vast fantasy realm where magic flows through ancient ley lines",
-                "world",
-                "The Realm",
-                {"magic_level": "high", "technology_level": "medieval", "era": "age_of_legends"},
-                importance=10
-            )
-            
-            # Add a starting location
-            self.memory_system.store_memory(
-                "A bustling medieval town with cobblestone streets, timber-framed houses, and a grand tavern called 'The Prancing Pony'",
-                "location", 
-                "Havenbrook",
-                {"type": "town", "population": "medium", "tech_level": "medieval"},
-                importance=8
-            )
-            
-            # Add some NPCs
-            self.memory_system.store_memory(
-                "Barkeep Thorin Oakenshield - a friendly dwarf with a red beard and a hearty laugh",
-                "character",
-                "Thorin",
-                {"race": "dwarf", "role": "barkeeper", "personality": "friendly", "age": "middle-aged"},
-                importance=7
-            )
-            
-            # Set initial world state
-            self.memory_system.set_world_state("current_time", "morning", "The sun is rising over Havenbrook")
-            self.memory_system.set_world_state("weather", "clear", "A beautiful, crisp morning with light clouds")
-            self.memory_system.set_world_state("mood", "peaceful", "The town is quiet and peaceful as people start their day")
+            with self.memory_system.unit_of_work():
+                self.memory_system.store_memories([
+                    # Initial world setup
+                    {
+                        'content': "A vast fantasy realm where magic flows through ancient ley lines",
+                        'memory_type': "world",
+                        'name': "The Realm",
+                        'attributes': {"magic_level": "high", "technology_level": "medieval", "era": "age_of_legends"},
+                        'importance': 10
+                    },
+                    # A starting location
+                    {
+                        'content': "A bustling medieval town with cobblestone streets, timber-framed houses, and a grand tavern called 'The Prancing Pony'",
+                        'memory_type': "location",
+                        'name': "Havenbrook",
+                        'attributes': {"type": "town", "population": "medium", "tech_level": "medieval"},
+                        'importance': 8
+                    },
+                    # Some NPCs
+                    {
+                        'content': "Barkeep Thorin Oakenshield - a friendly dwarf with a red beard and a hearty laugh",
+                        'memory_type': "character",
+                        'name': "Thorin",
+                        'attributes': {"race": "dwarf", "role": "barkeeper", "personality": "friendly", "age": "middle-aged"},
+                        'importance': 7
+                    }
+                ])
+                
+                # Set initial world state
+                self.memory_system.set_world_state("current_time", "morning", "The sun is rising over Havenbrook")
+                self.memory_system.set_world_state("weather", "clear", "A beautiful, crisp morning with light clouds")
+                self.memory_system.set_world_state("mood", "peaceful", "The town is quiet and peaceful as people start their day")
             
             logger.info("World initialized with default content")
     
@@ -110,14 +132,14 @@ class FantasyChatbot:
         start_time = time.time()
         
         try:
-            # Retrieve relevant memories
-            relevant_memories = self.memory_system.retrieve_relevant_memories(user_input, limit=7)
+            # Retrieve relevant memories (keyword + semantic, so proper names rank well)
+            relevant_memories = self.memory_system.retrieve_relevant_memories(user_input, limit=7, mode="hybrid")
             
             # Get world state
             world_state = self.memory_system.get_world_state()
             
             # Get recent conversation history
-            conversation_history = self.memory_system.get_conversation_history(self.session_id, limit=5)
+            conversation_history = self._recent_history(self.session_id, limit=5)
             
             # Generate response using LLM
             response = self.llm.generate_response(
@@ -127,23 +149,29 @@ class FantasyChatbot:
                 conversation_history=conversation_history
             )
             
-            # Auto-extract important memories from user input and response
-            auto_extracted = self.memory_system.auto_extract_memories(user_input, response)
-            
-            # Extract and store new memories from the response (existing functionality)
-            self._extract_and_store_memories(response, relevant_memories)
-            
-            # Store the conversation
-            retrieved_memory_ids = [mem['id'] for mem in relevant_memories]
-            self.memory_system.store_conversation(
-                session_id=self.session_id,
-                user_input=user_input,
-                ai_response=response,
-                retrieved_memory_ids=retrieved_memory_ids
-            )
+            # Record everything the turn produced atomically, in a single transaction
+            with self.memory_system.unit_of_work():
+                # Auto-extract important memories from user input and response
+                auto_extracted = self.memory_system.auto_extract_memories(user_input, response)
+                
+                # Extract and store new memories from the response (existing functionality)
+                self._extract_and_store_memories(response, relevant_memories)
+                
+                # Store the conversation
+                retrieved_memory_ids = [mem['id'] for mem in relevant_memories]
+                exchange = self.memory_system.store_conversation(
+                    session_id=self.session_id,
+                    user_input=user_input,
+                    ai_response=response,
+                    retrieved_memory_ids=retrieved_memory_ids,
+                    retrieval_scores=[mem.get('similarity') for mem in relevant_memories]
+                )
+                
+                # Update world state with time progression
+                self._update_world_state_after_turn()
             
-            # Update world state with time progression
-            self._update_world_state_after_turn()
+            # Only buffer the exchange once the turn has committed
+            self._remember_exchange(self.session_id, exchange)
             
             processing_time = time.time() - start_time
             
@@ -166,54 +194,13 @@ class FantasyChatbot:
     
     def _extract_and_store_memories(self, response: str, context_memories: List[Dict]):
         """Extract new facts from the LLM response and store them as memories."""
-        import re
-        
-        # Simple extraction patterns (can be enhanced with more sophisticated NLP)
-        patterns = {
-            'character': [
-                r'(?:I meet|meet|see|encounter)\s+(?:a|an|the)?\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\s*,?\s*(.*?)(?:\.|\n)',
-                r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\s+(?:is|appears|seems)\s+(.*?)(?:\.|\n)',
-                r'NPC:\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\s*[:\-]\s*(.*?)(?:\.|\n)'
-            ],
-            'location': [
-                r'(?:go to|enter|arrive at|reach)\s+(?:the\s+)?([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\s*,?\s*(.*?)(?:\.|\n)',
-                r'(?:Location|Place):\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\s*[:\-]\s*(.*?)(?:\.|\n)'
-            ],
-            'item': [
-                r'(?:find|discover|pick up|take)\s+(?:a|an|the)?\s*([A-Z][a-z]+(?:\s+[a-z]+)*)\s*,?\s*(.*?)(?:\.|\n)',
-                r'(?:Item|Object):\s*([A-Z][a-z]+(?:\s+[a-z]+)*)\s*[:\-]\s*(.*?)(?:\.|\n)'
-            ],
-            'event': [
-                r'(?:suddenly|then|afterwards)\s+(.*?)(?:\.|\n)',
-                r'(?:Event|Incident):\s*(.*?)(?:\.|\n)'
-            ]
-        }
+        candidates = [candidate for candidate in self.extraction_pipeline.extract(response)
+                      # Avoid duplicating existing memories
+                      if not self._memory_already_exists(candidate.content, context_memories)]
+        stored_ids = self.memory_system.store_candidates(candidates)
         
-        extracted_count = 0
-        for memory_type, type_patterns in patterns.items():
-            for pattern in type_patterns:
-                matches = re.finditer(pattern, response, re.IGNORECASE)
-                for match in matches:
-                    if memory_type in ['character', 'location', 'item']:
-                        name = match.group(1).strip()
-                        content = match.group(2).strip() if len(match.groups()) > 1 else ""
-                        full_content = f"{name}: {content}" if content else name
-                    else:  # event
-                        full_content = match.group(1).strip()
-                        name = full_content[:50] + "..." if len(full_content) > 50 else full_content
-                    
-                    # Avoid duplicating existing memories
-                    if not self._memory_already_exists(full_content, context_memories):
-                        self.memory_system.store_memory(
-                            content=full_content,
-                            memory_type=memory_type,
-                            name=name,
-                            importance=5  # Default importance
-                        )
-                        extracted_count += 1
-        
-        if extracted_count > 0:
-            logger.info(f"Extracted and stored {extracted_count} new memories")
+        if stored_ids:
+            logger.info(f"Extracted and stored {len(stored_ids)} new memories")
     
     def _memory_already_exists(self, content: str, existing_memories: List[Dict]) -> bool:
         """Check if a similar memory already exists."""
@@ -223,23 +210,55 @@ class FantasyChatbot:
                 return True
         return False
     
+    def _recent_history(self, session_id: str, limit: int) -> List[Dict]:
+        """
+        Last `limit` exchanges of a session, served from its ring buffer.
+        
+        The buffer is loaded from the database once. Afterwards the database is
+        only consulted when PRAGMA data_version shows another connection has
+        committed, and then only to compare the session's newest rowid.
+        """
+        memory_system = self.memory_system
+        with self._history_lock:
+            version = memory_system.db.data_version()
+            buffer = self._history.get(session_id)
+            if buffer is None or self._history_versions.get(session_id) != version:
+                newest = memory_system.get_latest_conversation_rowid(session_id)
+                if buffer is None or newest != (buffer[-1].rowid if buffer else None):
+                    buffer = deque(memory_system.get_conversation_history(session_id, self.history_buffer_size),
+                                   maxlen=self.history_buffer_size)
+                    self._history[session_id] = buffer
+                self._history_versions[session_id] = version
+            return list(buffer)[-limit:] if limit > 0 else []
+    
+    def _remember_exchange(self, session_id: str, exchange):
+        """Append a committed exchange to the session's ring buffer, if it is loaded."""
+        with self._history_lock:
+            buffer = self._history.get(session_id)
+            # A refresh after our commit (another process wrote meanwhile) may have loaded it already
+            if buffer is not None and all(record.rowid != exchange.rowid for record in buffer):
+                buffer.append(exchange)
+    
     def _update_world_state_after_turn(self):
         """Update world state to reflect time progression after each turn."""
         # Simple time progression - can be enhanced
         current_states = self.memory_system.get_world_state("current_time")
         if current_states:
-            last_time = current_states[0]['value']
+            # The time of day is the key; the value holds its description
+            last_time = current_states[0]['key']
             # Simple progression (could be made more sophisticated)
             if last_time == "morning":
-                self.memory_system.set_world_state("current_time", "midday", "The sun is at its zenith")
+                self.memory_system.set_world_state("current_time", "midday", "The sun is at its zenith", exclusive=True)
             elif last_time == "midday":
-                self.memory_system.set_world_state("current_time", "afternoon", "The afternoon shadows grow longer")
+                self.memory_system.set_world_state("current_time", "afternoon", "The afternoon shadows grow longer", exclusive=True)
             elif last_time == "afternoon":
-                self.memory_system.set_world_state("current_time", "evening", "The sun sets, painting the sky orange")
+                self.memory_system.set_world_state("current_time", "evening", "The sun sets, painting the sky orange", exclusive=True)
             elif last_time == "evening":
-                self.memory_system.set_world_state("current_time", "night", "Stars twinkle in the darkening sky")
+                self.memory_system.set_world_state("current_time", "night", "Stars twinkle in the darkening sky", exclusive=True)
             elif last_time == "night":
-                self.memory_system.set_world_state("current_time", "dawn", "Dawn breaks over the horizon")
+                self.memory_system.set_world_state("current_time", "dawn", "Dawn breaks over the horizon", exclusive=True)
+            elif last_time == "dawn":
+                self.memory_system.set_world_state("current_time", "morning", "The sun is rising over Havenbrook", exclusive=True)
     
     def get_memory_stats(self) -> Dict:
         """Get current memory statistics."""
@@ -249,18 +268,25 @@ class FantasyChatbot:
         """Get current LLM memory usage."""
         return self.llm.get_memory_usage()
     
-    def search_memories(self, query: str, memory_type: str = None) -> List[Dict]:
-        """Search memories by query and optionally by type."""
-        if memory_type:
-            memories = self.memory_system.get_memories_by_type(memory_type, limit=20)
-            # Filter by relevance
-            relevant = []
-            for mem in memories:
-                if query.lower() in mem['content'].lower() or query.lower() in (mem['name'] or "").lower():
-                    relevant.append(mem)
-            return relevant
-        else:
-            return self.memory_system.retrieve_relevant_memories(query, limit=20)
+    def search_memories(self, query: str, memory_type: str = None, attributes: Dict = None,
+                        since=None, until=None, include_cold: bool = False) -> List[Dict]:
+        """
+        Search memories by query, optionally scoped by type, attributes and time range.
+        include_cold also searches memories the retention policy moved to the cold tier.
+        """
+        if since is not None or until is not None:
+            # Filters are pushed down into both the keyword and the vector pass
+            return self.memory_system.retrieve_relevant_memories(
+                query, limit=20, mode="hybrid", memory_type=memory_type,
+                attributes=attributes, since=since, until=until, include_cold=include_cold)
+        # Keyword matches come from the FTS index, ranked by BM25
+        results = self.memory_system.search_memories_keyword(query, memory_type, limit=20,
+                                                             attributes=attributes, include_cold=include_cold)
+        if results:
+            return results
+        # Nothing matched literally: fall back to semantic search within the filters
+        return self.memory_system.retrieve_relevant_memories(query, limit=20, memory_type=memory_type,
+                                                             attributes=attributes, include_cold=include_cold)
 
 
 def run_cli(chatbot: FantasyChatbot):
@@ -345,6 +371,7 @@ def main():
     parser.add_argument('--db-path', type=str, default='fantasy_world.db', help='Path to memory database')
     parser.add_argument('--session-id', type=str, help='Session ID for conversation continuity')
     parser.add_argument('--load-model-only', action='store_true', help='Only load the model without starting chat')
+    parser.add_argument('--consolidate-every', type=float, help='Seconds between background memory consolidation runs')
     
     args = parser.parse_args()
     
@@ -353,7 +380,8 @@ def main():
         session_id=args.session_id,
         model_name=args.model,
         use_quantization=not args.no_quantization,
-        memory_db_path=args.db_path
+        memory_db_path=args.db_path,
+        consolidation_interval=args.consolidate_every
     )
     
     # Load the LLM model
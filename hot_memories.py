@@ -0,0 +1,122 @@
+"""
+Hot Memory Tier
+In-memory retrieval counters plus a small tier of the most frequently
+retrieved memories, kept fully materialized so they are returned without a
+database read. Counts are written back to SQLite in batches (write-behind)
+and feed the retrieval ranking boost and the retention policy.
+"""
+
+import math
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from memory_records import MemoryRecord
+
+
+class HotMemoryTier:
+    def __init__(self, capacity: int = 256, min_hits: int = 3, boost: float = 0.1,
+                 saturation_hits: int = 50):
+        """
+        Args:
+            capacity: Most memories kept materialized (0 only tracks counts)
+            min_hits: Retrievals before a memory may enter the tier
+            boost: Largest relative ranking boost, reached at saturation_hits retrievals
+            saturation_hits: Retrieval count at which the boost stops growing
+        """
+        self.capacity = capacity
+        self.min_hits = min_hits
+        self.boost = boost
+        self.saturation_hits = max(1, saturation_hits)
+        self._hits: Dict[str, int] = {}
+        self._records: Dict[str, MemoryRecord] = {}
+        self._pending: Dict[str, Tuple[int, str]] = {}  # id -> (unsaved hits, last retrieval time)
+        self._lock = threading.Lock()
+        self.served = 0
+        self.missed = 0
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, memory_id: str) -> bool:
+        return memory_id in self._records
+
+    def seed(self, counts: Iterable[Tuple[str, int]]):
+        """Start counts from persisted retrieval counts (ones already known are kept)."""
+        with self._lock:
+            for memory_id, count in counts:
+                if count:
+                    self._hits.setdefault(memory_id, count)
+
+    def hits(self, memory_id: str) -> int:
+        return self._hits.get(memory_id, 0)
+
+    def boost_factor(self, hits: int) -> float:
+        """Score multiplier for a memory retrieved `hits` times (1.0 when never retrieved)."""
+        return 1.0 + self.boost * min(1.0, math.log1p(hits) / math.log1p(self.saturation_hits))
+
+    def record(self, memory_ids: Iterable[str], timestamp: str) -> Dict[str, int]:
+        """Count one retrieval of each memory; returns their new counts."""
+        counts = {}
+        with self._lock:
+            for memory_id in memory_ids:
+                count = self._hits.get(memory_id, 0) + 1
+                self._hits[memory_id] = count
+                unsaved = self._pending.get(memory_id, (0, None))[0]
+                self._pending[memory_id] = (unsaved + 1, timestamp)
+                counts[memory_id] = count
+        return counts
+
+    def has_pending(self) -> bool:
+        return bool(self._pending)
+
+    def take_pending(self) -> List[Tuple[int, str, str]]:
+        """Unsaved (hits, last retrieval time, id) updates, handing them to the caller."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return [(hits, timestamp, memory_id) for memory_id, (hits, timestamp) in pending.items()]
+
+    def get(self, memory_id: str) -> Optional[MemoryRecord]:
+        """A private copy of a hot memory, or None."""
+        with self._lock:
+            record = self._records.get(memory_id)
+            if record is None:
+                self.missed += 1
+                return None
+            self.served += 1
+            return record.copy()
+
+    def offer(self, record: MemoryRecord):
+        """Admit a freshly read memory if it is retrieved often enough to displace the coldest one."""
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            hits = self._hits.get(record.id, 0)
+            if hits < self.min_hits or record.id in self._records:
+                return
+            if len(self._records) >= self.capacity:
+                coldest = min(self._records, key=lambda memory_id: self._hits.get(memory_id, 0))
+                if self._hits.get(coldest, 0) >= hits:
+                    return
+                del self._records[coldest]
+            self._records[record.id] = record.copy()
+
+    def discard(self, memory_ids: Iterable[str]):
+        """Drop memories whose stored row changed or left the active set."""
+        with self._lock:
+            for memory_id in memory_ids:
+                self._records.pop(memory_id, None)
+
+    def clear(self):
+        """Drop every materialized memory (counts are kept)."""
+        with self._lock:
+            self._records.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.served + self.missed
+        return {
+            'hot_memories': len(self._records),
+            'tracked_memories': len(self._hits),
+            'served': self.served,
+            'missed': self.missed,
+            'hit_rate': self.served / lookups if lookups else 0.0
+        }
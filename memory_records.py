@@ -0,0 +1,138 @@
+"""
+Memory Records
+Compact __slots__ records built straight from SQLite rows by a row factory.
+They behave like read-only dicts (record['name'], record.get('attributes'),
+dict(record)) so existing callers keep working, but avoid allocating a dict
+per row and only decode the attributes JSON when it is first read.
+"""
+
+import json
+from collections.abc import Mapping
+from typing import Dict, Optional, Tuple
+
+# Columns every memory query selects, in this order; extra columns (scores) follow
+MEMORY_COLUMNS = 'id, type, name, content, attributes, importance, timestamp'
+
+
+class MemoryRecord(Mapping):
+    """A stored memory plus any ranking scores it was retrieved with."""
+    __slots__ = ('id', 'type', 'name', 'content', 'importance', 'timestamp',
+                 '_attributes', '_raw_attributes', '_scores')
+
+    _FIELDS = ('id', 'type', 'name', 'content', 'attributes', 'importance', 'timestamp')
+
+    def __init__(self, row: Tuple, scores: Dict = None):
+        """row: (id, type, name, content, attributes_json, importance, timestamp)"""
+        self.id, self.type, self.name, self.content, raw, self.importance, self.timestamp = row[:7]
+        self._raw_attributes = raw or None
+        self._attributes = None
+        self._scores = scores
+
+    @classmethod
+    def row_factory(cls, cursor, row: Tuple) -> 'MemoryRecord':
+        """sqlite3 row factory; columns after the first seven become scores."""
+        if len(row) == 7:
+            return cls(row)
+        return cls(row, {column[0]: value for column, value in zip(cursor.description[7:], row[7:])})
+
+    @property
+    def attributes(self) -> Optional[Dict]:
+        if self._raw_attributes is not None:
+            self._attributes = json.loads(self._raw_attributes)
+            self._raw_attributes = None
+        return self._attributes
+
+    def copy(self) -> 'MemoryRecord':
+        """Copy of the stored fields, without scores."""
+        record = MemoryRecord.__new__(MemoryRecord)
+        for slot in self.__slots__:
+            setattr(record, slot, getattr(self, slot))
+        record._scores = None
+        return record
+
+    def with_scores(self, **scores) -> 'MemoryRecord':
+        """Attach ranking scores (e.g. similarity) and return self."""
+        self._scores = {**(self._scores or {}), **scores}
+        return self
+
+    def __getitem__(self, key: str):
+        if key in self._FIELDS:
+            return getattr(self, key)
+        if self._scores is not None and key in self._scores:
+            return self._scores[key]
+        raise KeyError(key)
+
+    def __iter__(self):
+        yield from self._FIELDS
+        if self._scores:
+            yield from self._scores
+
+    def __len__(self) -> int:
+        return len(self._FIELDS) + len(self._scores or ())
+
+    def to_dict(self) -> Dict:
+        """Plain dict, ready for json.dumps."""
+        data = {'id': self.id, 'type': self.type, 'name': self.name, 'content': self.content,
+                'attributes': self.attributes, 'importance': self.importance, 'timestamp': self.timestamp}
+        if self._scores:
+            data.update(self._scores)
+        return data
+
+    def __repr__(self) -> str:
+        return f"MemoryRecord({self.to_dict()!r})"
+
+
+class ConversationRecord(Mapping):
+    """One user/AI exchange from the conversation history."""
+    __slots__ = ('user_input', 'ai_response', 'timestamp', 'rowid')
+
+    _FIELDS = ('user_input', 'ai_response', 'timestamp')
+
+    def __init__(self, user_input: str, ai_response: str, timestamp: str, rowid: int = None):
+        self.user_input = user_input
+        self.ai_response = ai_response
+        self.timestamp = timestamp
+        self.rowid = rowid
+
+    @classmethod
+    def row_factory(cls, cursor, row: Tuple) -> 'ConversationRecord':
+        """sqlite3 row factory for (user_input, ai_response, timestamp[, rowid]) rows."""
+        return cls(*row[:4])
+
+    @property
+    def cursor(self) -> Optional[str]:
+        """Keyset pagination token positioned at this exchange."""
+        if self.rowid is None:
+            return None
+        return encode_history_cursor(self.timestamp, self.rowid)
+
+    def __getitem__(self, key: str):
+        if key in self._FIELDS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._FIELDS)
+
+    def __len__(self) -> int:
+        return len(self._FIELDS)
+
+    def to_dict(self) -> Dict:
+        """Plain dict, ready for json.dumps."""
+        return {'user_input': self.user_input, 'ai_response': self.ai_response, 'timestamp': self.timestamp}
+
+    def __repr__(self) -> str:
+        return f"ConversationRecord({self.to_dict()!r})"
+
+
+def encode_history_cursor(timestamp: str, rowid: int) -> str:
+    """Keyset token holding the (timestamp, rowid) sort key of a conversation row."""
+    return f"{timestamp}|{rowid}"
+
+
+def decode_history_cursor(cursor: str) -> Tuple[str, int]:
+    """Inverse of encode_history_cursor; raises ValueError for malformed tokens."""
+    timestamp, sep, rowid = cursor.rpartition('|')
+    if not sep or not timestamp or not rowid.isdigit():
+        raise ValueError(f"Invalid history cursor: {cursor!r}")
+    return timestamp, int(rowid)
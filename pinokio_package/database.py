@@ -0,0 +1,125 @@
+"""
+SQLite Connection Manager
+One long-lived writer connection plus thread-local readers, tuned for
+WAL mode so chat turns and concurrent web requests don't reconnect per query.
+"""
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import List
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteConnectionManager:
+    def __init__(self, db_path: str, cache_size_kb: int = 65536, mmap_size: int = 256 * 1024 * 1024,
+                 cached_statements: int = 256, busy_timeout: float = 5.0):
+        """
+        Args:
+            db_path: Path to the SQLite database (":memory:" shares one connection)
+            cache_size_kb: Page cache size per connection
+            mmap_size: Bytes of the database file to memory-map for reads
+            cached_statements: Prepared statements kept per connection
+            busy_timeout: Seconds to wait on a locked database
+        """
+        self.db_path = db_path
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.cached_statements = cached_statements
+        self.busy_timeout = busy_timeout
+        self.in_memory = db_path == ":memory:"
+
+        self._write_lock = threading.RLock()
+        self._write_depth = 0
+        self._write_owner = None
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        self._writer = self._connect()
+        if not self.in_memory:
+            self._writer.execute('PRAGMA journal_mode=WAL')
+        self._data_version = self._writer.execute('PRAGMA data_version').fetchone()[0]
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, check_same_thread=False,
+                               cached_statements=self.cached_statements)
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA cache_size=-{self.cache_size_kb}')
+        conn.execute(f'PRAGMA mmap_size={self.mmap_size}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        return conn
+
+    @contextmanager
+    def write(self):
+        """
+        Run statements on the writer connection inside a transaction.
+        Nested blocks join the outermost transaction, which commits once
+        on exit or rolls back everything if an exception escapes.
+        """
+        with self._write_lock:
+            self._write_owner = threading.get_ident()
+            self._write_depth += 1
+            try:
+                yield self._writer
+                if self._write_depth == 1:
+                    self._writer.commit()
+            except BaseException:
+                if self._write_depth == 1:
+                    self._writer.rollback()
+                raise
+            finally:
+                self._write_depth -= 1
+                if self._write_depth == 0:
+                    self._write_owner = None
+
+    def data_version(self) -> int:
+        """
+        PRAGMA data_version of the writer connection. It only changes when
+        another connection (e.g. another process) commits, so an unchanged value
+        means nothing outside this manager's own writes touched the database.
+        
+        Never waits for a write in progress: while another thread holds the
+        writer, the last observed value is returned and the next call catches up.
+        """
+        if self._write_lock.acquire(blocking=False):
+            try:
+                self._data_version = self._writer.execute('PRAGMA data_version').fetchone()[0]
+            finally:
+                self._write_lock.release()
+        return self._data_version
+    
+    def _owns_write(self) -> bool:
+        """True when the calling thread is inside write()."""
+        return self._write_owner == threading.get_ident()
+
+    @contextmanager
+    def read(self):
+        """
+        Yield a connection for queries.
+        Each thread gets its own reader, so reads proceed alongside the writer
+        under WAL; inside write() the writer is used to see uncommitted rows.
+        """
+        if self.in_memory or self._owns_write():
+            with self._write_lock:
+                yield self._writer
+            return
+
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        yield conn
+
+    def close(self):
+        """Close the writer and every reader connection."""
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+        with self._write_lock:
+            self._writer.close()
+        self._local = threading.local()
@@ -0,0 +1,91 @@
+"""
+Embedding Sidecar Store
+Append-only, fixed-stride file of unit-length float32 embeddings that lives
+next to the SQLite database. Each memory row records its row number in the
+sidecar, so the whole collection can be opened zero-copy with np.memmap
+instead of deserializing every embedding BLOB at startup.
+"""
+
+import os
+import struct
+import threading
+from typing import Iterable, Optional
+import numpy as np
+
+MAGIC = b"FEMB"
+VERSION = 1
+HEADER_SIZE = 64  # Keeps the first vector 64-byte aligned
+
+
+class EmbeddingSidecar:
+    """Fixed-stride float32 vector file addressed by row number."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.dim: Optional[int] = None
+        # Appends read the file end, may trim a torn vector and then write; they must not interleave
+        self._lock = threading.Lock()
+        if os.path.exists(path) and os.path.getsize(path) >= HEADER_SIZE:
+            with open(path, "rb") as f:
+                magic, version, dim = struct.unpack("<4sII", f.read(12))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not an embedding sidecar file")
+            self.dim = dim
+
+    @property
+    def stride(self) -> int:
+        return 4 * (self.dim or 0)
+
+    @property
+    def rows(self) -> int:
+        """Number of complete vectors in the file."""
+        if self.dim is None or not os.path.exists(self.path):
+            return 0
+        return (os.path.getsize(self.path) - HEADER_SIZE) // self.stride
+
+    @staticmethod
+    def _header(dim: int) -> bytes:
+        return struct.pack("<4sII", MAGIC, VERSION, dim).ljust(HEADER_SIZE, b"\0")
+
+    def append(self, vectors: np.ndarray) -> int:
+        """
+        Append vectors and return the row number of the first one.
+        Safe to call from several threads; appends from other processes must be
+        serialized by the caller (FantasyMemorySystem holds SQLite's write lock).
+        """
+        vectors = np.ascontiguousarray(np.atleast_2d(vectors), dtype="<f4")
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match sidecar ({self.dim})")
+
+            with open(self.path, "ab") as f:
+                end = f.seek(0, os.SEEK_END)
+                if end == 0:
+                    f.write(self._header(self.dim))
+                    end = HEADER_SIZE
+                elif (end - HEADER_SIZE) % self.stride:
+                    # Drop a partial vector left behind by an interrupted write
+                    end -= (end - HEADER_SIZE) % self.stride
+                    f.truncate(end)
+                f.write(vectors.tobytes())
+            return (end - HEADER_SIZE) // self.stride
+
+    def view(self, rows: int = None) -> np.ndarray:
+        """Read-only memory map of the first `rows` vectors (all by default)."""
+        rows = self.rows if rows is None else rows
+        if rows == 0:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return np.memmap(self.path, dtype="<f4", mode="r", offset=HEADER_SIZE, shape=(rows, self.dim))
+
+    def rewrite(self, batches: Iterable[np.ndarray], dim: int):
+        """Atomically replace the file with the given vectors, in order."""
+        tmp_path = self.path + ".tmp"
+        with self._lock:
+            with open(tmp_path, "wb") as f:
+                f.write(self._header(dim))
+                for batch in batches:
+                    f.write(np.ascontiguousarray(batch, dtype="<f4").tobytes())
+            os.replace(tmp_path, self.path)
+            self.dim = dim
@@ -3,29 +3,149 @@ Fantasy World Memory System
 Handles persistent storage and retrieval of world state using SQLite and embeddings.
 """
 
-import sqlite3
 import json
+import os
+import re
+import sqlite3
+import time
+import unicodedata
 import uuid
-from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Sequence, Tuple
 import numpy as np
-from sentence_transformers import SentenceTransformer
 import logging
 
+from vector_index import EmbeddingIndex, IVFIndex
+from embedding_store import EmbeddingSidecar
+from database import SQLiteConnectionManager
+from embedding_cache import EmbeddingCache, get_shared_embedder
+from extraction import Candidate, build_mention_pipeline
+from retention import RetentionPolicy
+from hot_memories import HotMemoryTier
+from memory_records import MEMORY_COLUMNS, ConversationRecord, MemoryRecord, decode_history_cursor
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+
+
+class _UnitOfWork:
+    """Writes buffered by FantasyMemorySystem.unit_of_work()."""
+    
+    def __init__(self):
+        self.memories: List[Tuple] = []  # (id, type, name, content, attributes, importance, context)
+        self.operations: List[Callable] = []
+        self.entities: Dict[Tuple[str, str], str] = {}  # (type, name key) -> id of buffered memories
+        self.vectors: Optional[EmbeddingIndex] = None  # Embeddings of memories, for near-duplicate checks
+        self.depth = 1
+    
+    def add_memories(self, memories: List[Tuple]):
+        self.memories.extend(memories)
+        for memory in memories:
+            if memory[2]:
+                self.entities.setdefault((memory[1], FantasyMemorySystem.normalize_name(memory[2])), memory[0])
+
+
+# Attribute keys exposed as indexed generated columns (attr_<key>) on the memories table
+INDEXED_ATTRIBUTES = ('race', 'role', 'location', 'danger_level')
+
+# Memory types whose names identify a distinct entity; near-duplicates only merge on equal names
+NAMED_ENTITY_TYPES = ('character', 'location', 'item')
+
+
 class FantasyMemorySystem:
-    def __init__(self, db_path: str = "fantasy_world.db"):
+    def __init__(self, db_path: str = "fantasy_world.db", index_type: str = "exact",
+                 ann_nprobe: int = 8, ann_nlist: int = None, ann_min_size: int = 20000,
+                 use_embedding_store: bool = True, embedding_cache_size: int = 10000,
+                 embedding_cache_path: str = None, retrieval_mode: str = "vector",
+                 hybrid_candidates: int = 200, rrf_k: int = 60, world_state_snapshot_every: int = 500,
+                 dedup_threshold: Optional[float] = 0.92, retention_policy: RetentionPolicy = None,
+                 hot_tier_size: int = 256, access_boost: float = 0.1):
+        """
+        Args:
+            db_path: Path to the SQLite database
+            index_type: "exact" for brute-force scoring or "ivf" for approximate search
+            ann_nprobe: IVF lists scanned per query (higher = better recall, slower)
+            ann_nlist: Number of IVF lists (defaults to ~4*sqrt(N))
+            ann_min_size: Below this many memories exact search is used even with "ivf"
+            use_embedding_store: Keep embeddings in a memory-mapped sidecar file next
+                to the database so the index opens without reading BLOBs
+            embedding_cache_size: Entries in the in-process embedding LRU
+            embedding_cache_path: SQLite file for an embedding cache shared across processes
+            retrieval_mode: Default mode of retrieve_relevant_memories ("vector" or "hybrid")
+            hybrid_candidates: Candidates generated per pass in hybrid retrieval
+            rrf_k: Rank offset of reciprocal rank fusion (higher flattens the fused ranking)
+            world_state_snapshot_every: World state changes between snapshots of the
+                current state; bounds the history replayed by get_world_state(as_of=...)
+            dedup_threshold: Cosine similarity at or above which a new memory is merged
+                into an existing one of the same type instead of stored (None disables)
+            retention_policy: Bounds the active memory set; when it outgrows the
+                policy's capacity the lowest scoring memories move to the cold tier
+            hot_tier_size: Frequently retrieved memories kept materialized in RAM
+            access_boost: Largest relative ranking boost for frequently retrieved memories
+        """
+        if index_type not in ("exact", "ivf"):
+            raise ValueError(f"Unknown index_type: {index_type}")
+        if retrieval_mode not in ("vector", "hybrid"):
+            raise ValueError(f"Unknown retrieval_mode: {retrieval_mode}")
+        if dedup_threshold is not None and not 0 < dedup_threshold <= 1:
+            raise ValueError(f"dedup_threshold must be in (0, 1]: {dedup_threshold}")
         self.db_path = db_path
-        self.embedder = SentenceTransformer('all-MiniLM-L6-v2')
+        # Shared across instances and only loaded on the first cache miss
+        self.embedder = get_shared_embedder(EMBEDDING_MODEL)
+        self.embedding_cache = EmbeddingCache(self.embedder, EMBEDDING_MODEL,
+                                              max_entries=embedding_cache_size,
+                                              disk_path=embedding_cache_path)
+        self.index_type = index_type
+        self.ann_nprobe = ann_nprobe
+        self.ann_nlist = ann_nlist
+        self.ann_min_size = ann_min_size
+        self.retrieval_mode = retrieval_mode
+        self.hybrid_candidates = hybrid_candidates
+        self.rrf_k = rrf_k
+        self.world_state_snapshot_every = world_state_snapshot_every
+        self.dedup_threshold = dedup_threshold
+        self.retention_policy = retention_policy
+        self._index: Optional[EmbeddingIndex] = None
+        self._ann: Optional[IVFIndex] = None
+        self._index_lock = threading.Lock()
+        self._index_version: Optional[int] = None  # data_version the index was last synced at
+        # Retrieval counters (written back in batches) and the hot tier they feed
+        self.hot_tier = HotMemoryTier(capacity=hot_tier_size, boost=access_boost)
+        self.embedding_store: Optional[EmbeddingSidecar] = None
+        if use_embedding_store and db_path != ":memory:":
+            self.embedding_store = EmbeddingSidecar(self._sidecar_path(".vectors"))
+        self._store_checked = False
+        self.fts_enabled = False
+        self.indexed_attributes: Tuple[str, ...] = ()
+        # Lazily loaded per-type {name key: memory id} maps, valid for one data_version
+        self._entities: Dict[str, Dict[str, str]] = {}
+        self._entities_version: Optional[int] = None
+        self._entities_lock = threading.Lock()
+        # Extractors behind auto_extract_memories(); register more per memory type
+        self.mention_pipeline = build_mention_pipeline()
+        self.db = SQLiteConnectionManager(db_path)
+        self._local = threading.local()
+        self.last_bulk_stats: Optional[Dict] = None
         self._init_database()
     
+    def _sidecar_path(self, suffix: str) -> Optional[str]:
+        """Location of a file stored next to the database (None for in-memory databases)."""
+        if self.db_path == ":memory:":
+            return None
+        return os.path.splitext(self.db_path)[0] + suffix
+    
     def _init_database(self):
         """Initialize the SQLite database with necessary tables."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
+        with self.db.write() as conn:
+            self._create_schema(conn.cursor())
+        logger.info("Database initialized successfully")
+    
+    def _create_schema(self, cursor):
+        """Create tables and indexes, upgrading older databases in place."""
         # Main memory store
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS memories (
@@ -48,12 +168,12 @@ class FantasyMemorySystem:
                 session_id TEXT NOT NULL,
                 user_input TEXT NOT NULL,
                 ai_response TEXT NOT NULL,
-                retrieved_memories TEXT,  -- JSON array of memory IDs used
+                retrieved_memories TEXT,  -- Legacy JSON array of memory IDs; no longer written (migrated by _create_conversation_memories)
                 timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
             )
         ''')
         
-        # World state tracking
+        # World state tracking (append-only history log)
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS world_state (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -65,265 +185,1781 @@ class FantasyMemorySystem:
             )
         ''')
         
+        # Schema upgrades for databases created by older versions
+        self._ensure_column(cursor, 'memories', 'embedding_row', 'INTEGER')  # Row in the embedding sidecar
+        self._ensure_column(cursor, 'world_state', 'exclusive', 'INTEGER DEFAULT 0')  # Replaced other keys
+        if self._ensure_column(cursor, 'memories', 'name_key', 'TEXT'):  # normalize_name(name)
+            cursor.execute('SELECT rowid, name FROM memories WHERE name IS NOT NULL')
+            cursor.executemany('UPDATE memories SET name_key = ? WHERE rowid = ?',
+                               [(self.normalize_name(name), rowid) for rowid, name in cursor.fetchall()])
+        # Archived (consolidated) and cold (evicted) memories stay, but leave retrieval and the resident index
+        self._ensure_column(cursor, 'memories', 'status', "TEXT NOT NULL DEFAULT 'active'")
+        self._ensure_column(cursor, 'memories', 'consolidated_into', 'TEXT')  # Summary that replaced it
+        # Retrieval frequency and recency, inputs of the retention policy
+        self._ensure_column(cursor, 'memories', 'retrieval_count', 'INTEGER NOT NULL DEFAULT 0')
+        self._ensure_column(cursor, 'memories', 'last_retrieved', 'DATETIME')
+        
+        # Current value per (state_type, key), upserted alongside the history log
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='world_state_current'")
+        backfill = cursor.fetchone() is None
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS world_state_current (
+                state_type TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                description TEXT,
+                timestamp DATETIME,
+                log_id INTEGER NOT NULL,  -- world_state row that set the value
+                PRIMARY KEY (state_type, key)
+            )
+        ''')
+        if backfill:
+            cursor.execute('''
+                INSERT INTO world_state_current (state_type, key, value, description, timestamp, log_id)
+                SELECT state_type, key, value, description, timestamp, id
+                FROM world_state
+                WHERE id IN (SELECT MAX(id) FROM world_state GROUP BY state_type, key)
+            ''')
+        
+        self._create_world_state_snapshots(cursor)
+        self._create_conversation_memories(cursor)
+        
         # Indexes for performance
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_memories_type ON memories(type)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_memories_timestamp ON memories(timestamp)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_conversations_session ON conversations(session_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_memories_type_timestamp ON memories(type, timestamp)')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_memories_consolidated_into ON memories(consolidated_into)
+            WHERE consolidated_into IS NOT NULL
+        ''')
+        # (session_id, timestamp) plus the implicit rowid serves history seeks and keyset pages
+        cursor.execute('DROP INDEX IF EXISTS idx_conversations_session')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_conversations_session_time ON conversations(session_id, timestamp)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_conversations_timestamp ON conversations(timestamp)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_world_state_type ON world_state(state_type)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_world_state_key_time ON world_state(state_type, key, timestamp)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_memories_embedding_row ON memories(embedding_row)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_memories_name_key ON memories(type, name_key)')
         
-        conn.commit()
-        conn.close()
-        logger.info("Database initialized successfully")
+        self.fts_enabled = self._create_fts_index(cursor)
+        self._create_stats_table(cursor)
+        self.indexed_attributes = self._create_attribute_columns(cursor)
+    
+    @classmethod
+    def _create_attribute_columns(cls, cursor) -> Tuple[str, ...]:
+        """
+        Expose INDEXED_ATTRIBUTES as virtual generated columns over the attributes
+        JSON, each indexed together with the memory type. Returns the keys that
+        are available (none if this SQLite build lacks JSON1 or generated columns).
+        """
+        available = []
+        for key in INDEXED_ATTRIBUTES:
+            # TEXT affinity lets both 5 and "5" match a stored danger_level of 5
+            definition = f"TEXT GENERATED ALWAYS AS (json_extract(attributes, '$.{key}')) VIRTUAL"
+            try:
+                cls._ensure_column(cursor, 'memories', f'attr_{key}', definition)
+            except sqlite3.OperationalError as e:
+                logger.warning(f"Indexed attribute columns unavailable, filtering falls back to json_extract: {e}")
+                return ()
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_memories_attr_{key} ON memories(attr_{key}, type)')
+            available.append(key)
+        return tuple(available)
     
-    def _ensure_tables_exist(self):
-        """Ensure all required tables exist before database operations."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def _create_world_state_snapshots(self, cursor):
+        """
+        Periodic copies of world_state_current, so an as-of query starts from the
+        nearest earlier snapshot and only replays the log rows after it.
+        Older databases get their snapshots built once from the full history.
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='world_state_snapshots'")
+        backfill = cursor.fetchone() is None
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS world_state_snapshots (
+                log_id INTEGER PRIMARY KEY,  -- Last world_state row included
+                timestamp DATETIME NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS world_state_snapshot_rows (
+                snapshot_id INTEGER NOT NULL,
+                state_type TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                description TEXT,
+                timestamp DATETIME,
+                log_id INTEGER NOT NULL,
+                PRIMARY KEY (snapshot_id, state_type, key)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_world_state_snapshots_time
+            ON world_state_snapshots(timestamp, log_id)
+        ''')
+        if not backfill:
+            return
         
-        # Check if memories table exists
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='memories'")
-        if not cursor.fetchone():
-            logger.info("Tables not found, reinitializing database...")
-            self._init_database()
+        state: Dict[Tuple[str, str], Tuple] = {}
+        since_snapshot = 0
+        reader = cursor.connection.cursor()
+        reader.execute('''
+            SELECT id, state_type, key, value, description, timestamp, exclusive
+            FROM world_state ORDER BY id
+        ''')
+        for row in reader:
+            self._apply_world_state_change(state, row)
+            since_snapshot += 1
+            if since_snapshot >= self.world_state_snapshot_every:
+                self._write_world_state_snapshot(cursor, row[0], row[5], state.values())
+                since_snapshot = 0
+    
+    @staticmethod
+    def _create_conversation_memories(cursor):
+        """
+        One row per memory a conversation turn retrieved, so usage questions are
+        index seeks instead of JSON parsing. Older databases are backfilled once
+        from the conversations.retrieved_memories JSON arrays.
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='conversation_memories'")
+        backfill = cursor.fetchone() is None
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS conversation_memories (
+                conversation_id TEXT NOT NULL,
+                memory_id TEXT NOT NULL,
+                rank INTEGER NOT NULL,  -- 1 = best match of the turn
+                rank_score REAL,  -- Retrieval score (importance-weighted similarity); NULL if unscored
+                PRIMARY KEY (conversation_id, rank)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_conversation_memories_memory
+            ON conversation_memories(memory_id, conversation_id)
+        ''')
+        if not backfill:
             return
-            
-        conn.close()
+        
+        rows = []
+        reader = cursor.connection.cursor()
+        reader.execute('SELECT id, retrieved_memories FROM conversations WHERE retrieved_memories IS NOT NULL')
+        for conversation_id, retrieved in reader:
+            try:
+                memory_ids = json.loads(retrieved)
+            except ValueError:
+                logger.warning(f"Skipping unreadable retrieved_memories of conversation {conversation_id}")
+                continue
+            rows.extend((conversation_id, memory_id, rank, None)
+                        for rank, memory_id in enumerate(memory_ids or [], start=1))
+        cursor.executemany('''
+            INSERT OR IGNORE INTO conversation_memories (conversation_id, memory_id, rank, rank_score)
+            VALUES (?, ?, ?, ?)
+        ''', rows)
+        if rows:
+            logger.info(f"Backfilled {len(rows)} conversation memory links")
+    
+    @staticmethod
+    def _apply_world_state_change(state: Dict[Tuple[str, str], Tuple], row: Tuple):
+        """Replay one log row (id, state_type, key, value, description, timestamp, exclusive)."""
+        if row[6]:
+            for state_key in [k for k in state if k[0] == row[1] and k[1] != row[2]]:
+                del state[state_key]
+        state[(row[1], row[2])] = (row[1], row[2], row[3], row[4], row[5], row[0])
+    
+    @staticmethod
+    def _write_world_state_snapshot(cursor, log_id: int, timestamp: str, rows: Iterable[Tuple]):
+        """Store rows of (state_type, key, value, description, timestamp, log_id) as a snapshot."""
+        cursor.execute('INSERT INTO world_state_snapshots (log_id, timestamp) VALUES (?, ?)', (log_id, timestamp))
+        cursor.executemany('''
+            INSERT INTO world_state_snapshot_rows
+                (snapshot_id, state_type, key, value, description, timestamp, log_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [(log_id,) + tuple(row) for row in rows])
+    
+    @staticmethod
+    def _create_stats_table(cursor):
+        """Memory counts per (type, status), kept current by triggers so stats reads skip COUNT(*) scans."""
+        cursor.execute('PRAGMA table_info(memory_stats)')
+        columns = [row[1] for row in cursor.fetchall()]
+        if columns and 'status' not in columns:
+            # Older per-type counts lumped archived and cold memories in with active ones
+            for trigger in ('memory_stats_insert', 'memory_stats_delete', 'memory_stats_update'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+            cursor.execute('DROP TABLE memory_stats')
+            columns = []
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS memory_stats (
+                type TEXT NOT NULL,
+                status TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (type, status)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS memory_stats_insert AFTER INSERT ON memories BEGIN
+                INSERT INTO memory_stats (type, status, count) VALUES (new.type, new.status, 1)
+                ON CONFLICT (type, status) DO UPDATE SET count = count + 1;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS memory_stats_delete AFTER DELETE ON memories BEGIN
+                UPDATE memory_stats SET count = count - 1 WHERE type = old.type AND status = old.status;
+                DELETE FROM memory_stats WHERE type = old.type AND status = old.status AND count <= 0;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS memory_stats_update AFTER UPDATE OF type, status ON memories
+            WHEN old.type IS NOT new.type OR old.status IS NOT new.status BEGIN
+                UPDATE memory_stats SET count = count - 1 WHERE type = old.type AND status = old.status;
+                DELETE FROM memory_stats WHERE type = old.type AND status = old.status AND count <= 0;
+                INSERT INTO memory_stats (type, status, count) VALUES (new.type, new.status, 1)
+                ON CONFLICT (type, status) DO UPDATE SET count = count + 1;
+            END
+        ''')
+        
+        if not columns:
+            # Count memories written before the stats table existed
+            cursor.execute('''
+                INSERT INTO memory_stats (type, status, count)
+                SELECT type, status, COUNT(*) FROM memories GROUP BY type, status
+            ''')
+    
+    @staticmethod
+    def _create_fts_index(cursor) -> bool:
+        """
+        Create the FTS5 keyword index over memory names and content, kept in
+        sync by triggers. Returns False if this SQLite build lacks FTS5.
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='memories_fts'")
+        existed = cursor.fetchone() is not None
+        try:
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS memories_fts USING fts5(
+                    name, content,
+                    content='memories', content_rowid='rowid',
+                    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 unavailable, keyword search falls back to LIKE: {e}")
+            return False
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS memories_fts_insert AFTER INSERT ON memories BEGIN
+                INSERT INTO memories_fts (rowid, name, content) VALUES (new.rowid, new.name, new.content);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS memories_fts_delete AFTER DELETE ON memories BEGIN
+                INSERT INTO memories_fts (memories_fts, rowid, name, content)
+                VALUES ('delete', old.rowid, old.name, old.content);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS memories_fts_update AFTER UPDATE OF name, content ON memories BEGIN
+                INSERT INTO memories_fts (memories_fts, rowid, name, content)
+                VALUES ('delete', old.rowid, old.name, old.content);
+                INSERT INTO memories_fts (rowid, name, content) VALUES (new.rowid, new.name, new.content);
+            END
+        ''')
+        
+        if not existed:
+            # Index memories written before the FTS table existed
+            cursor.execute("INSERT INTO memories_fts (memories_fts) VALUES ('rebuild')")
+        return True
+    
+    @staticmethod
+    def _ensure_column(cursor, table: str, column: str, definition: str) -> bool:
+        """Add a column to an existing table if it is missing. Returns True if it was added."""
+        cursor.execute(f'PRAGMA table_xinfo({table})')  # xinfo also lists generated columns
+        if column not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+            return True
+        return False
+    
+    def close(self):
+        """Close all database connections."""
+        self.flush_access_counts()
+        self.embedding_cache.close()
+        self.db.close()
+    
+    @contextmanager
+    def unit_of_work(self):
+        """
+        Buffer every write made inside the block and flush them in one transaction.
+        
+        New memories are embedded with a single batched encode call on exit.
+        If the block raises, nothing is written. Nested blocks join the
+        outermost one. Memories stored inside the block are visible to
+        get_memories_by_type() before they are flushed.
+        """
+        uow = getattr(self._local, 'uow', None)
+        if uow is not None:
+            uow.depth += 1
+            try:
+                yield uow
+            finally:
+                uow.depth -= 1
+            return
+        
+        uow = _UnitOfWork()
+        self._local.uow = uow
+        try:
+            yield uow
+        finally:
+            self._local.uow = None
+        self._flush(uow.memories, uow.operations)
+    
+    def _current_uow(self) -> Optional['_UnitOfWork']:
+        return getattr(self._local, 'uow', None)
+    
+    def _write(self, operation: Callable):
+        """
+        Run a write operation now, or queue it on the active unit of work.
+        The operation gets the connection and may return a callable that is
+        run after the transaction commits.
+        """
+        uow = self._current_uow()
+        if uow is not None:
+            uow.operations.append(operation)
+        else:
+            self._flush([], [operation])
+    
+    def _flush(self, memories: List[Tuple], operations: List[Callable]):
+        """
+        Embed pending memories in one batch and write everything in one transaction.
+        Safe to call from several threads (e.g. a chat turn and the consolidation
+        job): units of work are per thread, the transaction and sidecar append run
+        under the writer lock, and commits published out of rowid order are picked
+        up by the next _sync_index().
+        """
+        if not memories and not operations:
+            return
+        
+        embeddings = None
+        embedding_rows = [None] * len(memories)
+        if memories:
+            embeddings = np.asarray(self.embedding_cache.encode([memory[3] for memory in memories]))
+        
+        last_rowid = None
+        with self.db.write() as conn:
+            if memories and self.embedding_store is not None:
+                # Hold SQLite's write lock while appending, so concurrent flushes (in this or
+                # another process) get distinct sidecar rows; appending before the insert means
+                # an interrupted transaction only leaves unused rows
+                if not conn.in_transaction:
+                    conn.execute('BEGIN IMMEDIATE')
+                first_row = self.embedding_store.append(EmbeddingIndex.normalize(embeddings))
+                embedding_rows = list(range(first_row, first_row + len(memories)))
+            # Piggyback retrieval counts gathered since the last write
+            self._write_access_counts(conn)
+            if memories:
+                conn.executemany('''
+                    INSERT INTO memories (id, type, name, content, attributes, importance, context,
+                                          embedding, embedding_row, name_key)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', [memory + (embeddings[i].tobytes(), embedding_rows[i],
+                                self.normalize_name(memory[2]) if memory[2] else None)
+                      for i, memory in enumerate(memories)])
+                # Rowids are allocated sequentially while we hold the write lock
+                last_rowid = conn.execute('SELECT MAX(rowid) FROM memories').fetchone()[0]
+            # Operations may return a callback to run once the transaction has committed
+            committed = [operation(conn) for operation in operations]
+        
+        if memories:
+            self._publish_to_index(memories, embeddings, embedding_rows, last_rowid - len(memories) + 1)
+            self._remember_entities(memories)
+        for callback in committed:
+            if callback is not None:
+                callback()
+        
+        if memories and self.retention_policy is not None and self._over_capacity():
+            self.enforce_retention()
+    
+    def _publish_to_index(self, memories: List[Tuple], embeddings: np.ndarray,
+                          embedding_rows: List[Optional[int]], first_rowid: int):
+        """
+        Keep the resident index in sync with freshly committed memories; gaps
+        (rows written by another process) are picked up by the next _sync_index().
+        """
+        with self._index_lock:
+            if self._index is None:
+                return
+            if first_rowid != self._index.last_rowid + 1:
+                self._index_version = None  # Make the next _sync_index() read the gap
+                return
+            ids = [memory[0] for memory in memories]
+            importances = [memory[5] for memory in memories]
+            types = [memory[1] for memory in memories]
+            last_rowid = first_rowid + len(memories) - 1
+            if self.embedding_store is not None:
+                self._index.add_from_store(ids, self.embedding_store, embedding_rows, importances,
+                                           last_rowid, types)
+            else:
+                self._index.add_batch(ids, embeddings, importances, last_rowid, types)
+            if self._ann is not None:
+                # Bucket new rows on insert, so neither the next query nor the file on disk lags behind
+                self._ann.flush()
     
     def store_memory(self, content: str, memory_type: str, name: str = None, 
-                    attributes: Dict = None, importance: int = 5, context: str = None) -> str:
-        """Store a new memory with automatic embedding generation."""
-        # Ensure tables exist
-        self._ensure_tables_exist()
+                    attributes: Dict = None, importance: int = 5, context: str = None,
+                    deduplicate: bool = True) -> str:
+        """
+        Store a new memory with automatic embedding generation.
         
+        A near-duplicate of an existing memory of the same type is merged into
+        it instead (see _merge_near_duplicates); its id is returned then.
+        """
         memory_id = str(uuid.uuid4())
         
-        # Generate embedding
-        embedding = self.embedder.encode([content])[0]
-        embedding_bytes = embedding.tobytes()
-        
         # Serialize attributes
         attributes_json = json.dumps(attributes) if attributes else None
+        memory = (memory_id, memory_type, name, content, attributes_json, importance, context)
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO memories (id, type, name, content, attributes, embedding, importance, context)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (memory_id, memory_type, name, content, attributes_json, embedding_bytes, importance, context))
+        if deduplicate:
+            new_memories, (memory_id,) = self._merge_near_duplicates([memory])
+            if not new_memories:
+                return memory_id
         
-        conn.commit()
-        conn.close()
+        uow = self._current_uow()
+        if uow is not None:
+            uow.add_memories([memory])
+        else:
+            self._flush([memory], [])
         
         logger.info(f"Stored memory: {memory_id} ({memory_type})")
         return memory_id
     
+    def store_memories(self, memories: Iterable[Dict], batch_size: int = 256,
+                       deduplicate: bool = True) -> List[str]:
+        """
+        Store many memories, embedding and inserting them in batches.
+        
+        Args:
+            memories: Records with the keyword arguments of store_memory
+                (content, memory_type, name, attributes, importance, context)
+            batch_size: Memories per encode call and per transaction
+            deduplicate: Merge near-duplicates into existing memories (see store_memory)
+        
+        Returns:
+            Memory IDs in input order (the existing memory's id for merged
+            near-duplicates). Throughput is logged and kept in last_bulk_stats.
+        """
+        start_time = time.time()
+        stored_ids = []
+        uow = self._current_uow()
+        batch = []
+        
+        def write_batch():
+            new_memories = batch
+            if deduplicate:
+                new_memories, resolved_ids = self._merge_near_duplicates(batch)
+                stored_ids[len(stored_ids) - len(batch):] = resolved_ids
+            if uow is not None:
+                uow.add_memories(new_memories)
+            elif new_memories:
+                self._flush(new_memories, [])
+            batch.clear()
+        
+        for record in memories:
+            attributes = record.get('attributes')
+            memory = (str(uuid.uuid4()), record['memory_type'], record.get('name'), record['content'],
+                      json.dumps(attributes) if attributes else None, record.get('importance', 5),
+                      record.get('context'))
+            stored_ids.append(memory[0])
+            batch.append(memory)
+            if len(batch) >= batch_size:
+                write_batch()
+        if batch:
+            write_batch()
+        
+        elapsed = time.time() - start_time
+        self.last_bulk_stats = {
+            'memories': len(stored_ids),
+            'seconds': elapsed,
+            'memories_per_second': len(stored_ids) / elapsed if elapsed > 0 else float('inf')
+        }
+        logger.info(f"Stored {len(stored_ids)} memories in {elapsed:.2f}s "
+                    f"({self.last_bulk_stats['memories_per_second']:.1f} memories/s)")
+        return stored_ids
+    
+    def _merge_near_duplicates(self, memories: List[Tuple]) -> Tuple[List[Tuple], List[str]]:
+        """
+        Fold near-duplicates into memories that already exist.
+        
+        A new memory is a near-duplicate when its cosine similarity to a stored
+        or pending memory of the same type reaches dedup_threshold (for named
+        entity types the normalized names must match too). Instead of a new
+        row, the existing memory's importance is bumped and the newcomer's
+        context, or its content, is appended to the existing context.
+        
+        Returns:
+            (memories still to insert, resolved id of every input memory)
+        """
+        resolved = [memory[0] for memory in memories]
+        if self.dedup_threshold is None or not memories:
+            return memories, resolved
+        
+        # The flush re-encodes these texts from the embedding cache
+        vectors = EmbeddingIndex.normalize(self.embedding_cache.encode([memory[3] for memory in memories]))
+        stored_matches = self._stored_near_duplicates(memories, vectors)
+        
+        # Unsaved memories a newcomer can merge into: the unit of work's, then earlier ones of this batch
+        uow = self._current_uow()
+        pending = uow.memories if uow is not None else []
+        unsaved_matches = self._unsaved_near_duplicates(memories, vectors, uow)
+        kept: List[Tuple] = []
+        kept_at: Dict[int, int] = {}  # batch position -> position in kept
+        
+        for i, memory in enumerate(memories):
+            if stored_matches[i] is not None:
+                existing_id, similarity = stored_matches[i]
+                self._write(self._merge_into_stored(existing_id, memory))
+                resolved[i] = existing_id
+                logger.info(f"Merged near-duplicate {memory[1]} memory into {existing_id} (cosine {similarity:.3f})")
+                continue
+            
+            target = None
+            for in_batch, position in unsaved_matches[i]:
+                if in_batch:
+                    if position not in kept_at:
+                        continue  # Merged away itself
+                    owner, position = kept, kept_at[position]
+                else:
+                    owner = pending
+                if self._same_entity(memory, owner[position][2]):
+                    target = owner, position
+                    break
+            if target is not None:
+                owner, position = target
+                resolved[i] = owner[position][0]
+                owner[position] = self._merged_memory(owner[position], memory)
+                continue
+            
+            kept_at[i] = len(kept)
+            kept.append(memory)
+        return kept, resolved
+    
+    def _unsaved_near_duplicates(self, memories: List[Tuple], vectors: np.ndarray,
+                                 uow: Optional['_UnitOfWork']) -> List[List[Tuple[bool, int]]]:
+        """
+        Unsaved memories each newcomer reaches dedup_threshold with, most similar
+        first, as (in this batch, position) pairs: positions in the unit of work's
+        buffer, or of earlier memories in the batch. One matrix product per type.
+        """
+        pending = self._pending_vectors(uow) if uow is not None else None
+        by_type: Dict[str, List[int]] = {}
+        for i, memory in enumerate(memories):
+            by_type.setdefault(memory[1], []).append(i)
+        
+        matches: List[List[Tuple[bool, int]]] = [[] for _ in memories]
+        for memory_type, rows in by_type.items():
+            block = vectors[rows]
+            positions = pending.partition(memory_type) if pending is not None else np.zeros(0, dtype=np.int64)
+            buffered = pending.cosine(block, positions).T if len(positions) else np.zeros((len(rows), 0))
+            within = block @ block.T
+            for column, i in enumerate(rows):
+                # Only batch memories before this one are candidates
+                similarities = np.concatenate([buffered[column], within[column, :column]])
+                above = np.flatnonzero(similarities >= self.dedup_threshold)
+                matches[i] = [(False, int(positions[t])) if t < len(positions) else (True, rows[t - len(positions)])
+                              for t in above[np.argsort(-similarities[above], kind="stable")]]
+        return matches
+    
+    def _pending_vectors(self, uow: '_UnitOfWork') -> EmbeddingIndex:
+        """
+        Unit-vector embeddings of the memories buffered by a unit of work, partitioned
+        by type. Built incrementally: only memories queued since the last call are encoded.
+        """
+        if uow.vectors is None:
+            uow.vectors = EmbeddingIndex(initial_capacity=64)
+        queued = uow.memories[len(uow.vectors):]
+        if queued:
+            uow.vectors.add_batch([memory[0] for memory in queued],
+                                  self.embedding_cache.encode([memory[3] for memory in queued]),
+                                  [memory[5] for memory in queued], types=[memory[1] for memory in queued])
+        return uow.vectors
+    
+    def _stored_near_duplicates(self, memories: List[Tuple],
+                                vectors: np.ndarray) -> List[Optional[Tuple[str, float]]]:
+        """Best stored (memory_id, cosine) match of each memory, or None; one matrix product per type."""
+        index = self._sync_index()
+        candidates: Dict[int, List[Tuple[str, float]]] = {}
+        with self._index_lock:
+            for memory_type in {memory[1] for memory in memories}:
+                positions = index.partition(memory_type)
+                if len(positions) == 0:
+                    continue
+                rows = [i for i, memory in enumerate(memories) if memory[1] == memory_type]
+                similarities = index.cosine(vectors[rows], positions)
+                for column, i in enumerate(rows):
+                    above = np.flatnonzero(similarities[:, column] >= self.dedup_threshold)
+                    # A few runners-up, in case the closest one belongs to a differently named entity
+                    best = above[np.argsort(-similarities[above, column], kind="stable")][:5]
+                    if len(best):
+                        candidates[i] = [(index.ids[positions[p]], float(similarities[p, column])) for p in best]
+        
+        matches: List[Optional[Tuple[str, float]]] = [None] * len(memories)
+        if not candidates:
+            return matches
+        memory_ids = list({memory_id for options in candidates.values() for memory_id, _ in options})
+        with self.db.read() as conn:
+            placeholders = ','.join('?' * len(memory_ids))
+            names = dict(conn.execute(f'SELECT id, name FROM memories WHERE id IN ({placeholders})',
+                                      memory_ids).fetchall())
+        for i, options in candidates.items():
+            for memory_id, similarity in options:
+                if memory_id in names and self._same_entity(memories[i], names[memory_id]):
+                    matches[i] = (memory_id, similarity)
+                    break
+        return matches
+    
+    @classmethod
+    def _same_entity(cls, memory: Tuple, other_name: Optional[str]) -> bool:
+        """Named entities only merge with memories of the same normalized name."""
+        if memory[1] not in NAMED_ENTITY_TYPES or not memory[2] or not other_name:
+            return True
+        return cls.normalize_name(memory[2]) == cls.normalize_name(other_name)
+    
+    @staticmethod
+    def _merged_memory(target: Tuple, duplicate: Tuple) -> Tuple:
+        """An unsaved memory tuple with a near-duplicate folded in."""
+        addition = duplicate[6] or duplicate[3]
+        context = target[6]
+        if addition != target[3] and addition not in (context or ''):
+            context = f"{context}\n{addition}" if context else addition
+        return target[:5] + (min(10, max(target[5], duplicate[5]) + 1), context)
+    
+    def _merge_into_stored(self, memory_id: str, duplicate: Tuple) -> Callable:
+        """Write operation folding a near-duplicate into a stored memory (same rules as _merged_memory)."""
+        params = {'id': memory_id, 'importance': duplicate[5], 'addition': duplicate[6] or duplicate[3]}
+        
+        def write(conn):
+            rows = conn.execute('''
+                UPDATE memories
+                SET importance = MIN(10, MAX(importance, :importance) + 1),
+                    context = CASE
+                        WHEN content = :addition OR instr(COALESCE(context, ''), :addition) > 0 THEN context
+                        WHEN context IS NULL OR context = '' THEN :addition
+                        ELSE context || char(10) || :addition
+                    END
+                WHERE id = :id
+                RETURNING importance
+            ''', params).fetchall()
+            if not rows:
+                return None
+            
+            def publish():
+                self.hot_tier.discard([memory_id])
+                with self._index_lock:
+                    if self._index is not None:
+                        self._index.set_importance(memory_id, rows[0][0])
+            return publish
+        
+        return write
+    
+    @staticmethod
+    def normalize_name(name: str) -> str:
+        """Case-folded, NFKC, whitespace-collapsed form used to deduplicate entity names."""
+        return ' '.join(unicodedata.normalize('NFKC', name).casefold().split())
+    
+    def _entity_map(self, memory_type: str) -> Dict[str, str]:
+        """Name-key map of one type; call with _entities_lock held."""
+        version = self.db.data_version()
+        if version != self._entities_version:
+            # Another connection committed: names it added are not in our maps
+            self._entities.clear()
+            self._entities_version = version
+        names = self._entities.get(memory_type)
+        if names is None:
+            with self.db.read() as conn:
+                rows = conn.execute('''
+                    SELECT name_key, id FROM memories
+                    WHERE type = ? AND name_key IS NOT NULL
+                    ORDER BY rowid
+                ''', (memory_type,)).fetchall()
+            names = {}
+            for name_key, memory_id in rows:
+                names.setdefault(name_key, memory_id)
+            self._entities[memory_type] = names
+        return names
+    
+    def _remember_entities(self, memories: List[Tuple]):
+        """Add freshly committed named memories to the loaded name maps."""
+        with self._entities_lock:
+            for memory in memories:
+                names = self._entities.get(memory[1])
+                if names is not None and memory[2]:
+                    names.setdefault(self.normalize_name(memory[2]), memory[0])
+    
+    def find_entity(self, memory_type: str, name: str) -> Optional[str]:
+        """Id of the memory of this type whose normalized name matches, including buffered writes."""
+        name_key = self.normalize_name(name)
+        uow = self._current_uow()
+        if uow is not None and (memory_type, name_key) in uow.entities:
+            return uow.entities[(memory_type, name_key)]
+        with self._entities_lock:
+            return self._entity_map(memory_type).get(name_key)
+    
+    def store_candidates(self, candidates: Iterable[Candidate], entity_types: Iterable[str] = ()) -> List[str]:
+        """
+        Store extraction candidates in one batch.
+        
+        Args:
+            candidates: Output of an ExtractionPipeline
+            entity_types: Types whose named candidates are skipped when a memory
+                with the same normalized name already exists
+        
+        Returns:
+            IDs of the stored memories (or of the existing ones near-duplicates merged into)
+        """
+        entity_types = set(entity_types)
+        records = [candidate.as_record() for candidate in candidates
+                   if not (candidate.memory_type in entity_types and candidate.name
+                           and self.find_entity(candidate.memory_type, candidate.name) is not None)]
+        return self.store_memories(records) if records else []
+    
     def auto_extract_memories(self, user_input: str, ai_response: str = None) -> List[str]:
         """
         Automatically extract and store important memories from user input and AI response.
         This helps maintain the god-like control by remembering key story elements.
-        """
-        stored_ids = []
         
-        # Extract important entities and events from user input
+        Character and location mentions are only stored the first time a name is
+        seen; at most one plot development is stored per analysis.
+        """
         text_to_analyze = f"{user_input} {ai_response or ''}"
+        candidates = self.mention_pipeline.extract(text_to_analyze)
+        return self.store_candidates(candidates, entity_types=('character', 'location'))
+    
+    def _sync_index(self) -> EmbeddingIndex:
+        """
+        Load the resident embedding index, or bring it up to date with rows
+        changed since the last sync. Our own writes are published to the index
+        directly, so the database is only read again once another connection
+        has committed.
+        """
+        version = self.db.data_version()
+        with self._index_lock:
+            if self._index is None or version != self._index_version:
+                if self._index is not None:
+                    # Another connection committed: hot copies of rows it changed would be stale,
+                    # and rows it archived, evicted, restored or re-weighted are already indexed
+                    self.hot_tier.clear()
+                    self._reconcile_index()
+                self._load_index_rows()
+                self._index_version = version
+                if self._ann is not None:
+                    self._ann.flush()
+            index = self._index
+            
+            if self.index_type == "ivf" and self._ann is None and len(index) >= self.ann_min_size:
+                self._ann = IVFIndex(index, nlist=self.ann_nlist, nprobe=self.ann_nprobe,
+                                     path=self._ann_index_path())
+                self._ann.load()
+            return index
+    
+    def _load_index_rows(self):
+        """Append active rows past the index's last rowid; call with _index_lock held."""
+        if self._index is None:
+            self._index = EmbeddingIndex()
+        index = self._index
         
-        # Look for character mentions (proper nouns that could be names)
-        import re
-        
-        # Find potential character names (capitalized words)
-        potential_names = re.findall(r'\b[A-Z][a-z]+\b', text_to_analyze)
-        for name in potential_names[:3]:  # Limit to avoid over-storing
-            if len(name) > 2 and name.lower() not in ['the', 'and', 'you', 'are', 'with', 'from']:
-                # Check if this character isn't already stored
-                existing_chars = self.get_memories_by_type("character")
-                if not any(name.lower() in char['name'].lower() if char['name'] else False for char in existing_chars):
-                    stored_id = self.store_memory(
-                        f"{name} is mentioned in the story",
-                        "character", 
-                        name,
-                        importance=6
-                    )
-                    stored_ids.append(stored_id)
-        
-        # Extract location mentions
-        location_keywords = ['village', 'town', 'city', 'forest', 'mountain', 'castle', 'tavern', 'inn', 'palace', 'forest', 'river', 'lake']
-        for keyword in location_keywords:
-            if keyword in text_to_analyze.lower():
-                # Try to find the full location name
-                pattern = rf'(\b\w+\s+){keyword}\b'
-                matches = re.findall(pattern, text_to_analyze.lower())
-                if matches:
-                    location_name = ' '.join(matches[0]).strip() + f" {keyword}"
-                    if location_name not in [loc['name'] for loc in self.get_memories_by_type("location")]:
-                        stored_id = self.store_memory(
-                            f"{location_name} is mentioned in the story",
-                            "location",
-                            location_name.title(),
-                            importance=5
-                        )
-                        stored_ids.append(stored_id)
-        
-        # Extract event/plot developments
-        event_indicators = ['suddenly', 'meanwhile', 'however', 'unexpectedly', 'the next day', 'afterwards']
-        for indicator in event_indicators:
-            if indicator in text_to_analyze.lower():
-                # Store significant plot moments
-                stored_id = self.store_memory(
-                    f"Plot development: {text_to_analyze[:100]}...",
-                    "event",
-                    importance=7
-                )
-                stored_ids.append(stored_id)
-                break  # Only store one event per analysis
+        if self.embedding_store is not None:
+            if not self._store_checked:
+                with self.db.write() as conn:
+                    self._check_embedding_store(conn.cursor())
+                self._store_checked = True
+            # Only small columns are read; vectors come from the memory-mapped sidecar
+            with self.db.read() as conn:
+                rows = conn.execute('''
+                    SELECT rowid, id, importance, embedding_row, type, retrieval_count
+                    FROM memories
+                    WHERE rowid > ? AND embedding_row IS NOT NULL AND status = 'active'
+                    ORDER BY rowid
+                ''', (index.last_rowid,)).fetchall()
+            if rows:
+                index.add_from_store([row[1] for row in rows], self.embedding_store,
+                                     [row[3] for row in rows], [row[2] for row in rows], rows[-1][0],
+                                     [row[4] for row in rows])
+        else:
+            with self.db.read() as conn:
+                rows = conn.execute('''
+                    SELECT rowid, id, embedding, importance, type, retrieval_count
+                    FROM memories
+                    WHERE rowid > ? AND embedding IS NOT NULL AND status = 'active'
+                    ORDER BY rowid
+                ''', (index.last_rowid,)).fetchall()
+            if rows:
+                embeddings = np.stack([np.frombuffer(row[2], dtype=np.float32) for row in rows])
+                index.add_batch([row[1] for row in rows], embeddings,
+                                [row[3] for row in rows], rows[-1][0], [row[4] for row in rows])
         
-        return stored_ids
+        # Persisted retrieval counts seed the access counters and ranking boosts
+        retrieved = [(row[1], row[5]) for row in rows if row[5]]
+        self.hot_tier.seed(retrieved)
+        for memory_id, _ in retrieved:
+            index.set_boost(memory_id, self.hot_tier.boost_factor(self.hot_tier.hits(memory_id)))
     
-    def retrieve_relevant_memories(self, query: str, limit: int = 5) -> List[Dict]:
-        """Retrieve memories relevant to the query using semantic similarity."""
-        # Ensure tables exist
-        self._ensure_tables_exist()
+    def _reconcile_index(self):
+        """
+        Apply status and importance changes committed by other connections to
+        rows the index already covers: memories that were archived or evicted
+        are dropped, restored ones are re-added and importances are refreshed.
+        Call with _index_lock held.
+        """
+        index = self._index
+        with self.db.read() as conn:
+            rows = conn.execute('''
+                SELECT id, status, importance FROM memories
+                WHERE rowid <= ? AND embedding IS NOT NULL
+            ''', (index.last_rowid,)).fetchall()
         
-        # Generate query embedding
-        query_embedding = self.embedder.encode([query])[0]
+        inactive = [row[0] for row in rows if row[1] != 'active' and row[0] in index.id_to_pos]
+        restored = [row[0] for row in rows if row[1] == 'active' and row[0] not in index.id_to_pos]
+        for memory_id, status, importance in rows:
+            if status == 'active' and memory_id in index.id_to_pos:
+                index.set_importance(memory_id, importance)
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        if inactive:
+            keep = index.remove(inactive)
+            if keep is not None and self._ann is not None:
+                self._ann.compact(keep)
+        if restored:
+            with self.db.read() as conn:
+                placeholders = ','.join('?' * len(restored))
+                restored_rows = conn.execute(f'''
+                    SELECT id, type, importance, embedding_row, embedding, retrieval_count
+                    FROM memories
+                    WHERE id IN ({placeholders})
+                ''', restored).fetchall()
+            self._append_rows(restored_rows)
+        if inactive or restored:
+            logger.info(f"Index reconciled with other connections: {len(inactive)} dropped, "
+                        f"{len(restored)} restored")
+    
+    def _ann_index_path(self) -> Optional[str]:
+        """Location of the persisted IVF index, next to the database file."""
+        return self._sidecar_path(".ivf.npz")
+    
+    def _check_embedding_store(self, cursor):
+        """
+        Cheap startup check of the sidecar against the memories table.
+        Rows written before the sidecar existed are appended; dangling
+        pointers (e.g. a deleted or truncated sidecar) trigger a full repair.
+        """
+        store = self.embedding_store
+        cursor.execute('SELECT MAX(embedding_row) FROM memories')
+        max_row = cursor.fetchone()[0]
+        if max_row is not None and max_row >= store.rows:
+            logger.warning("Embedding sidecar is missing rows, rebuilding it from the database")
+            self._rewrite_embedding_store(cursor)
+            return
         
-        # Get all memories with their embeddings
         cursor.execute('''
-            SELECT id, type, name, content, attributes, embedding, importance, timestamp
-            FROM memories
+            SELECT rowid, embedding FROM memories
+            WHERE embedding_row IS NULL AND embedding IS NOT NULL
+            ORDER BY rowid
         ''')
+        unmapped = cursor.fetchall()
+        if unmapped:
+            vectors = EmbeddingIndex.normalize(np.stack([np.frombuffer(row[1], dtype=np.float32)
+                                                         for row in unmapped]))
+            first_row = store.append(vectors)
+            cursor.executemany('UPDATE memories SET embedding_row = ? WHERE rowid = ?',
+                               [(first_row + i, row[0]) for i, row in enumerate(unmapped)])
+            logger.info(f"Added {len(unmapped)} existing embeddings to the sidecar store")
+    
+    def _rewrite_embedding_store(self, cursor, batch_size: int = 4096):
+        """Rebuild the sidecar from the embedding BLOBs, in rowid order."""
+        cursor.execute('SELECT length(embedding) FROM memories WHERE embedding IS NOT NULL LIMIT 1')
+        first = cursor.fetchone()
+        if first is None:
+            return
+        dim = first[0] // 4
         
-        memories = cursor.fetchall()
-        conn.close()
+        reader = cursor.connection.cursor()
+        reader.execute('SELECT rowid, embedding FROM memories WHERE embedding IS NOT NULL ORDER BY rowid')
+        rowids = []
         
-        # Calculate similarities
-        similarities = []
-        for memory in memories:
-            memory_embedding = np.frombuffer(memory[5], dtype=np.float32)
-            similarity = np.dot(query_embedding, memory_embedding) / (
-                np.linalg.norm(query_embedding) * np.linalg.norm(memory_embedding)
-            )
-            
-            # Weight by importance
-            weighted_similarity = similarity * (memory[6] / 10.0)
-            
-            similarities.append({
-                'id': memory[0],
-                'type': memory[1],
-                'name': memory[2],
-                'content': memory[3],
-                'attributes': json.loads(memory[4]) if memory[4] else None,
-                'importance': memory[6],
-                'timestamp': memory[7],
-                'similarity': weighted_similarity
-            })
-        
-        # Sort by weighted similarity and return top results
-        similarities.sort(key=lambda x: x['similarity'], reverse=True)
-        return similarities[:limit]
-    
-    def get_memories_by_type(self, memory_type: str, limit: int = 50) -> List[Dict]:
+        def batches():
+            while True:
+                chunk = reader.fetchmany(batch_size)
+                if not chunk:
+                    return
+                rowids.extend(row[0] for row in chunk)
+                yield EmbeddingIndex.normalize(np.stack([np.frombuffer(row[1], dtype=np.float32)
+                                                         for row in chunk]))
+        
+        self.embedding_store.rewrite(batches(), dim)
+        cursor.execute('UPDATE memories SET embedding_row = NULL')
+        cursor.executemany('UPDATE memories SET embedding_row = ? WHERE rowid = ?',
+                           [(position, rowid) for position, rowid in enumerate(rowids)])
+    
+    def verify_embedding_store(self, deep: bool = False) -> Dict:
+        """
+        Check the embedding sidecar against the memories table.
+        
+        Args:
+            deep: Also compare every sidecar vector with its embedding BLOB
+        """
+        if self.embedding_store is None:
+            return {'enabled': False, 'consistent': True}
+        store = self.embedding_store
+        sidecar_rows = store.rows
+        
+        with self.db.read() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT COUNT(*) FROM memories WHERE embedding IS NOT NULL')
+            total = cursor.fetchone()[0]
+            cursor.execute('SELECT COUNT(*) FROM memories WHERE embedding_row IS NULL AND embedding IS NOT NULL')
+            unmapped = cursor.fetchone()[0]
+            cursor.execute('SELECT COUNT(*) FROM memories WHERE embedding_row >= ?', (sidecar_rows,))
+            out_of_range = cursor.fetchone()[0]
+            cursor.execute('''
+                SELECT COUNT(*) FROM (
+                    SELECT embedding_row FROM memories
+                    WHERE embedding_row IS NOT NULL
+                    GROUP BY embedding_row HAVING COUNT(*) > 1
+                )
+            ''')
+            shared = cursor.fetchone()[0]
+        
+            mismatched = 0
+            if deep and sidecar_rows:
+                vectors = store.view()
+                cursor.execute('''
+                    SELECT embedding, embedding_row FROM memories
+                    WHERE embedding IS NOT NULL AND embedding_row < ?
+                ''', (sidecar_rows,))
+                while True:
+                    chunk = cursor.fetchmany(4096)
+                    if not chunk:
+                        break
+                    expected = EmbeddingIndex.normalize(np.stack([np.frombuffer(row[0], dtype=np.float32)
+                                                                  for row in chunk]))
+                    actual = vectors[[row[1] for row in chunk]]
+                    mismatched += int((~np.isclose(expected, actual, atol=1e-5).all(axis=1)).sum())
+        
+        return {
+            'enabled': True,
+            'memories': total,
+            'sidecar_rows': sidecar_rows,
+            'unmapped': unmapped,
+            'out_of_range': out_of_range,
+            'shared_rows': shared,
+            'mismatched': mismatched,
+            'consistent': unmapped == out_of_range == shared == mismatched == 0
+        }
+    
+    def repair_embedding_store(self):
+        """Rewrite the embedding sidecar from the database and reload the index."""
+        if self.embedding_store is None:
+            return
+        with self._index_lock:
+            with self.db.write() as conn:
+                cursor = conn.cursor()
+                self._rewrite_embedding_store(cursor)
+            self._index = None
+            self._ann = None
+            self._store_checked = True
+        logger.info("Embedding sidecar rebuilt from the database")
+    
+    def _search_index(self, query_embedding: np.ndarray, limit: int,
+                      positions: np.ndarray = None) -> List[Tuple[str, float]]:
+        """
+        Top-k search, routed through the ANN index when it is active.
+        Filtered searches score only the allowed positions, exactly.
+        """
+        index = self._sync_index()
+        with self._index_lock:
+            if positions is not None:
+                return index.search(query_embedding, limit, positions)
+            if self._ann is not None:
+                return self._ann.search(query_embedding, limit)
+            return index.search(query_embedding, limit)
+    
+    def ann_recall_report(self, queries: List[str], k: int = 10, nprobe: int = None) -> Dict:
+        """Report recall@k and per-query latency of the ANN index against exact search."""
+        index = self._sync_index()
+        query_embeddings = self.embedding_cache.encode(queries)
+        with self._index_lock:
+            ann = self._ann or IVFIndex(index, nlist=self.ann_nlist, nprobe=self.ann_nprobe)
+            return ann.evaluate_recall(query_embeddings, k, nprobe)
+    
+    def retrieve_relevant_memories(self, query: str, limit: int = 5, mode: str = None,
+                                   memory_type: str = None, attributes: Dict = None,
+                                   since=None, until=None, include_cold: bool = False) -> List[MemoryRecord]:
+        """
+        Retrieve memories relevant to the query.
+        
+        Args:
+            query: Free text to match
+            limit: Maximum number of memories
+            mode: "vector" for semantic similarity only, or "hybrid" to fuse
+                BM25 keyword and vector rankings (defaults to retrieval_mode)
+            memory_type: Only consider memories of this type
+            attributes: Only consider memories whose attributes equal these values
+            since: Only consider memories stored at or after this time (datetime or
+                "YYYY-MM-DD HH:MM:SS" UTC string)
+            until: Only consider memories stored before this time
+            include_cold: Also score memories evicted to the cold tier (read from disk)
+        
+        Filters are applied before scoring, so narrow queries only score their subset.
+        """
+        mode = mode or self.retrieval_mode
+        index = self._sync_index()
+        filters = (memory_type, attributes, since, until)
+        allowed = self._filtered_positions(index, *filters) if len(index) else np.zeros(0, dtype=np.int64)
+        if (allowed is not None and len(allowed) == 0) and not include_cold:
+            return []
+        
+        # Generate query embedding and score the index in one pass
+        query_embedding = self.embedding_cache.encode([query])[0]
+        top = []
+        if allowed is None or len(allowed):
+            if mode == "hybrid":
+                top = self._hybrid_search(query, query_embedding, limit, filters, allowed)
+            else:
+                top = [(memory_id, {'similarity': similarity})
+                       for memory_id, similarity in self._search_index(query_embedding, limit, allowed)]
+        if include_cold:
+            top = self._merge_cold_results(top, self._search_cold(query_embedding, limit, filters), limit)
+        results = self._materialize_memories(top)
+        self._record_access([record.id for record in results])
+        return results
+    
+    @staticmethod
+    def _sql_timestamp(value) -> str:
+        """Format a datetime the way SQLite's CURRENT_TIMESTAMP stores it."""
+        if isinstance(value, datetime):
+            if value.tzinfo is not None:
+                value = value.astimezone(timezone.utc).replace(tzinfo=None)
+            return value.strftime('%Y-%m-%d %H:%M:%S')
+        return str(value)
+    
+    def _filter_clause(self, memory_type: str = None, attributes: Dict = None, since=None,
+                       until=None, alias: str = '', include_archived: bool = False,
+                       include_cold: bool = False, statuses: Sequence[str] = None) -> Tuple[str, List]:
+        """
+        SQL conditions (joined with AND) and parameters for the retrieval filters.
+        Indexed attribute keys use their generated column; others use json_extract.
+        Attribute values are compared as text either way.
+        Only active memories match unless cold or archived ones are included
+        (or `statuses` lists the tiers explicitly).
+        """
+        conditions, params = [], []
+        statuses = list(statuses or ['active'] + ['cold'] * include_cold + ['archived'] * include_archived)
+        if len(statuses) < 3:
+            conditions.append(f"{alias}status IN ({','.join('?' * len(statuses))})")
+            params += statuses
+        if memory_type:
+            conditions.append(f'{alias}type = ?')
+            params.append(memory_type)
+        for key, value in (attributes or {}).items():
+            if key in self.indexed_attributes:
+                conditions.append(f'{alias}attr_{key} = ?')
+                params.append(value)
+            else:
+                # Compared as text like the indexed columns, so 5 and "5" match either stored form
+                conditions.append(f'CAST(json_extract({alias}attributes, ?) AS TEXT) = CAST(? AS TEXT)')
+                params += [f'$."{key}"', value]
+        if since is not None:
+            conditions.append(f'{alias}timestamp >= ?')
+            params.append(self._sql_timestamp(since))
+        if until is not None:
+            conditions.append(f'{alias}timestamp < ?')
+            params.append(self._sql_timestamp(until))
+        return ' AND '.join(conditions), params
+    
+    def _filtered_positions(self, index: EmbeddingIndex, memory_type: str = None,
+                            attributes: Dict = None, since=None, until=None) -> Optional[np.ndarray]:
+        """
+        Index positions allowed by the filters, or None when unfiltered.
+        A type alone maps straight to its index partition; attribute and time
+        filters are resolved with an indexed SQL lookup.
+        """
+        if not attributes and since is None and until is None:
+            if not memory_type:
+                return None
+            with self._index_lock:
+                return index.partition(memory_type)
+        
+        where, params = self._filter_clause(memory_type, attributes, since, until)
+        with self.db.read() as conn:
+            ids = [row[0] for row in conn.execute(f'SELECT id FROM memories WHERE {where}', params)]
+        with self._index_lock:
+            return index.positions_of(ids)
+    
+    def _hybrid_search(self, query: str, query_embedding: np.ndarray, limit: int,
+                       filters: Tuple = (), allowed: np.ndarray = None) -> List[Tuple[str, Dict]]:
+        """
+        Reciprocal rank fusion of a BM25 pass and a vector pass.
+        
+        The two rankings are independent: the keyword top-N and the vector
+        top-N (the ANN shortlist when active, otherwise an exact search), so
+        memories that only match by meaning compete with keyword matches.
+        Both passes honour the retrieval filters.
+        """
+        lexical = self._keyword_candidates(query, self.hybrid_candidates, *filters)
+        vector = self._search_index(query_embedding, self.hybrid_candidates, allowed)
+        
+        fused: Dict[str, Dict] = {}
+        for rank, (memory_id, similarity) in enumerate(vector):
+            fused[memory_id] = {'similarity': similarity, 'rrf_score': 1.0 / (self.rrf_k + rank + 1)}
+        for rank, memory_id in enumerate(lexical):
+            entry = fused.setdefault(memory_id, {'similarity': None, 'rrf_score': 0.0})
+            entry['rrf_score'] += 1.0 / (self.rrf_k + rank + 1)
+        
+        ranked = sorted(fused.items(), key=lambda item: item[1]['rrf_score'], reverse=True)
+        return ranked[:limit]
+    
+    def _keyword_candidates(self, query: str, limit: int, memory_type: str = None,
+                            attributes: Dict = None, since=None, until=None) -> List[str]:
+        """Memory ids matching any query word and the filters, best BM25 first."""
+        match = self._fts_query(query, prefix=True, match_all=False) if self.fts_enabled else None
+        if match is None:
+            return []
+        where, params = self._filter_clause(memory_type, attributes, since, until, alias='m.')
+        with self.db.read() as conn:
+            rows = conn.execute(f'''
+                SELECT m.id
+                FROM memories_fts
+                JOIN memories m ON m.rowid = memories_fts.rowid
+                WHERE memories_fts MATCH ? {'AND ' + where if where else ''}
+                ORDER BY bm25(memories_fts, 2.0, 1.0)
+                LIMIT ?
+            ''', [match] + params + [limit]).fetchall()
+        return [row[0] for row in rows]
+    
+    def _materialize_memories(self, top: List[Tuple[str, Dict]]) -> List[MemoryRecord]:
+        """Fetch full rows for ranked memory ids, merging in their scores."""
+        if not top:
+            return []
+        
+        # Hot memories come from RAM; only the rest of the winners are read
+        records = {}
+        for memory_id, _ in top:
+            record = self.hot_tier.get(memory_id)
+            if record is not None:
+                records[memory_id] = record
+        # A hit must still be in the tier it was scored in; stale index hits are dropped
+        missing = {'active': [], 'cold': []}
+        for memory_id, scores in top:
+            if memory_id not in records:
+                missing[scores.get('tier', 'active')].append(memory_id)
+        if any(missing.values()):
+            with self.db.read() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = MemoryRecord.row_factory
+                for status, memory_ids in missing.items():
+                    if not memory_ids:
+                        continue
+                    placeholders = ','.join('?' * len(memory_ids))
+                    cursor.execute(f'''
+                        SELECT {MEMORY_COLUMNS}
+                        FROM memories
+                        WHERE id IN ({placeholders}) AND status = ?
+                    ''', memory_ids + [status])
+                    for record in cursor:
+                        if status == 'active':
+                            self.hot_tier.offer(record)
+                        records[record.id] = record
+        
+        return [records[memory_id].with_scores(**scores) for memory_id, scores in top
+                if memory_id in records]
+    
+    @staticmethod
+    def _fts_query(query: str, prefix: bool = True, match_all: bool = True) -> Optional[str]:
+        """Turn free text into a safe FTS5 MATCH expression of quoted (prefix) terms."""
+        terms = re.findall(r'\w+', query.lower())
+        if not terms:
+            return None
+        terms = [f'"{term}"*' if prefix else f'"{term}"' for term in terms]
+        return (' ' if match_all else ' OR ').join(terms)
+    
+    def search_memories_keyword(self, query: str, memory_type: str = None, limit: int = 20,
+                                prefix: bool = True, match_all: bool = True,
+                                attributes: Dict = None, include_archived: bool = False,
+                                include_cold: bool = False) -> List[MemoryRecord]:
+        """
+        BM25-ranked keyword search over memory names and content.
+        
+        Args:
+            query: Free text; every word must match unless match_all is False
+            memory_type: Only return memories of this type
+            limit: Maximum number of results
+            prefix: Match words by prefix ("thor" finds "Thorin")
+            match_all: Require all words (AND) rather than any (OR)
+            attributes: Only return memories whose attributes equal these values
+            include_archived: Also search memories archived by consolidation
+            include_cold: Also search memories evicted to the cold tier
+        """
+        if not self.fts_enabled:
+            return self._search_memories_like(query, memory_type, limit, attributes, include_archived, include_cold)
+        
+        match = self._fts_query(query, prefix, match_all)
+        if match is None:
+            return []
+        where, filter_params = self._filter_clause(memory_type, attributes, alias='m.',
+                                                   include_archived=include_archived, include_cold=include_cold)
+        type_filter = 'AND ' + where if where else ''
+        params = [match] + filter_params + [limit]
+        
+        with self.db.read() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = MemoryRecord.row_factory
+            # Names weigh twice as much as content in the BM25 score
+            cursor.execute(f'''
+                SELECT m.id, m.type, m.name, m.content, m.attributes, m.importance, m.timestamp,
+                       -bm25(memories_fts, 2.0, 1.0) AS score
+                FROM memories_fts
+                JOIN memories m ON m.rowid = memories_fts.rowid
+                WHERE memories_fts MATCH ? {type_filter}
+                ORDER BY score DESC
+                LIMIT ?
+            ''', params)
+            return cursor.fetchall()
+    
+    def _search_memories_like(self, query: str, memory_type: str = None, limit: int = 20,
+                              attributes: Dict = None, include_archived: bool = False,
+                              include_cold: bool = False) -> List[MemoryRecord]:
+        """Substring search used when FTS5 is not available."""
+        pattern = f"%{query}%"
+        where, filter_params = self._filter_clause(memory_type, attributes, include_archived=include_archived,
+                                                   include_cold=include_cold)
+        type_filter = 'AND ' + where if where else ''
+        params = [pattern, pattern] + filter_params + [limit]
+        with self.db.read() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = MemoryRecord.row_factory
+            cursor.execute(f'''
+                SELECT {MEMORY_COLUMNS}
+                FROM memories
+                WHERE (name LIKE ? OR content LIKE ?) {type_filter}
+                ORDER BY importance DESC, timestamp DESC
+                LIMIT ?
+            ''', params)
+            return cursor.fetchall()
+    
+    def get_memories_by_type(self, memory_type: str, limit: int = 50) -> List[MemoryRecord]:
         """Retrieve memories of a specific type."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self.db.read() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = MemoryRecord.row_factory
+            cursor.execute(f'''
+                SELECT {MEMORY_COLUMNS}
+                FROM memories
+                WHERE type = ? AND status = 'active'
+                ORDER BY importance DESC, timestamp DESC
+                LIMIT ?
+            ''', (memory_type, limit))
         
-        cursor.execute('''
-            SELECT id, type, name, content, attributes, importance, timestamp
-            FROM memories
-            WHERE type = ?
-            ORDER BY importance DESC, timestamp DESC
-            LIMIT ?
-        ''', (memory_type, limit))
+            results = cursor.fetchall()
         
-        results = cursor.fetchall()
-        conn.close()
+        # Read-your-writes for memories buffered by an open unit of work
+        uow = self._current_uow()
+        if uow is not None:
+            pending = [MemoryRecord(memory[:6] + (None,)) for memory in reversed(uow.memories)
+                       if memory[1] == memory_type]
+            results = (pending + results)[:limit]
         
-        return [{
-            'id': row[0],
-            'type': row[1],
-            'name': row[2],
-            'content': row[3],
-            'attributes': json.loads(row[4]) if row[4] else None,
-            'importance': row[5],
-            'timestamp': row[6]
-        } for row in results]
+        return results
+    
+    def find_memories(self, memory_type: str = None, attributes: Dict = None, since=None,
+                      until=None, limit: int = 50, include_archived: bool = False,
+                      include_cold: bool = False) -> List[MemoryRecord]:
+        """List memories matching type, attribute and time-range filters, most important first."""
+        where, params = self._filter_clause(memory_type, attributes, since, until,
+                                            include_archived=include_archived, include_cold=include_cold)
+        with self.db.read() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = MemoryRecord.row_factory
+            cursor.execute(f'''
+                SELECT {MEMORY_COLUMNS}
+                FROM memories
+                {'WHERE ' + where if where else ''}
+                ORDER BY importance DESC, timestamp DESC
+                LIMIT ?
+            ''', params + [limit])
+            return cursor.fetchall()
+    
+    def similar_memories(self, memory_ids: Sequence[str], threshold: float,
+                         block_cells: int = 1 << 24) -> Dict[str, List[Tuple[str, float]]]:
+        """
+        For each indexed memory, the active memories of the same type whose
+        cosine similarity reaches threshold, most similar first (itself excluded).
+        
+        Scored as matrix products of the given rows against their type's index
+        partition, in blocks of at most block_cells similarities.
+        """
+        index = self._sync_index()
+        neighbors: Dict[str, List[Tuple[str, float]]] = {}
+        with self._index_lock:
+            queries = index.positions_of(memory_ids)
+            for memory_type in index.memory_types():
+                partition = index.partition(memory_type)
+                rows = np.intersect1d(queries, partition, assume_unique=True)
+                step = max(1, block_cells // max(1, len(partition)))
+                for start in range(0, len(rows), step):
+                    block = rows[start:start + step]
+                    similarities = index.cosine(index.matrix[block], partition)
+                    for column, position in enumerate(block):
+                        above = np.flatnonzero(similarities[:, column] >= threshold)
+                        above = above[partition[above] != position]
+                        above = above[np.argsort(-similarities[above, column], kind="stable")]
+                        neighbors[index.ids[position]] = [(index.ids[partition[p]], float(similarities[p, column]))
+                                                          for p in above]
+        return neighbors
+    
+    def archive_memories(self, memory_ids: Sequence[str], consolidated_into: str = None):
+        """
+        Take memories out of retrieval while keeping their rows.
+        
+        Args:
+            memory_ids: Active memories to archive
+            consolidated_into: Id of the summary memory that replaces them (provenance)
+        """
+        memory_ids = list(memory_ids)
+        if not memory_ids:
+            return
+        
+        def write(conn):
+            conn.executemany('''
+                UPDATE memories SET status = 'archived', consolidated_into = ?
+                WHERE id = ? AND status = 'active'
+            ''', [(consolidated_into, memory_id) for memory_id in memory_ids])
+            return lambda: self._drop_from_index(memory_ids)
+        
+        self._write(write)
+    
+    def _drop_from_index(self, memory_ids: Sequence[str]):
+        """Remove memories from the resident index (and the ANN buckets built over it)."""
+        self.hot_tier.discard(memory_ids)
+        with self._index_lock:
+            if self._index is None:
+                return
+            keep = self._index.remove(memory_ids)
+            if keep is not None and self._ann is not None:
+                self._ann.compact(keep)
+    
+    def _record_access(self, memory_ids: List[str]):
+        """Count retrievals in RAM and refresh the ranking boost of the retrieved memories."""
+        if not memory_ids:
+            return
+        counts = self.hot_tier.record(memory_ids, self._sql_timestamp(datetime.now(timezone.utc)))
+        with self._index_lock:
+            if self._index is not None:
+                for memory_id, count in counts.items():
+                    self._index.set_boost(memory_id, self.hot_tier.boost_factor(count))
+    
+    def _write_access_counts(self, conn):
+        """Add the retrieval counts gathered since the last write to their rows."""
+        pending = self.hot_tier.take_pending()
+        if pending:
+            conn.executemany('''
+                UPDATE memories
+                SET retrieval_count = retrieval_count + ?, last_retrieved = MAX(COALESCE(last_retrieved, ''), ?)
+                WHERE id = ?
+            ''', pending)
+    
+    def flush_access_counts(self):
+        """Write pending retrieval counts now rather than with the next write."""
+        if self.hot_tier.has_pending():
+            self._write(self._write_access_counts)
+    
+    def get_hot_tier_stats(self) -> Dict:
+        """Size and hit rate of the hot memory tier."""
+        return self.hot_tier.stats()
+    
+    def _over_capacity(self) -> bool:
+        """Whether the active set holds more memories than the retention policy allows."""
+        # Loads the index on first use: the policy bounds it whether or not anything was retrieved yet
+        index = self._sync_index()
+        capacity = self.retention_policy.capacity(index.dim)
+        return capacity is not None and len(index) > capacity
+    
+    def enforce_retention(self, policy: RetentionPolicy = None) -> int:
+        """
+        Move the lowest scoring active memories to the cold tier until the
+        active set is down to the policy's target size.
+        
+        Returns:
+            Number of memories evicted
+        """
+        policy = policy or self.retention_policy
+        if policy is None:
+            raise ValueError("No retention policy configured")
+        index = self._sync_index()
+        capacity = policy.capacity(index.dim)
+        if capacity is None or len(index) <= capacity:
+            return 0
+        
+        self.flush_access_counts()
+        with self.db.read() as conn:
+            rows = conn.execute('''
+                SELECT id, type, importance, retrieval_count,
+                       julianday('now') - julianday(MAX(timestamp, COALESCE(last_retrieved, timestamp)))
+                FROM memories
+                WHERE status = 'active' AND embedding IS NOT NULL
+            ''').fetchall()
+        # Hot memories are retrieved too often to evict
+        candidates = [row for row in rows if row[1] not in policy.protected_types and row[0] not in self.hot_tier]
+        excess = min(len(rows) - policy.target(capacity), len(candidates))
+        if excess <= 0:
+            return 0
+        
+        scores = policy.scores([row[2] or 0 for row in candidates], [row[4] or 0.0 for row in candidates],
+                               [row[3] for row in candidates])
+        lowest = np.argpartition(scores, excess - 1)[:excess] if excess < len(candidates) else range(excess)
+        evicted = [candidates[i][0] for i in lowest]
+        
+        def write(conn):
+            conn.executemany("UPDATE memories SET status = 'cold' WHERE id = ? AND status = 'active'",
+                             [(memory_id,) for memory_id in evicted])
+            return lambda: self._drop_from_index(evicted)
+        
+        self._write(write)
+        logger.info(f"Evicted {len(evicted)} memories to the cold tier (capacity {capacity})")
+        return len(evicted)
+    
+    def restore_memories(self, memory_ids: Sequence[str]):
+        """Bring cold memories back into the active set and the resident index."""
+        memory_ids = list(memory_ids)
+        if not memory_ids:
+            return
+        
+        def write(conn):
+            placeholders = ','.join('?' * len(memory_ids))
+            rows = conn.execute(f'''
+                SELECT id, type, importance, embedding_row, embedding, retrieval_count
+                FROM memories
+                WHERE id IN ({placeholders}) AND status = 'cold'
+            ''', memory_ids).fetchall()
+            conn.executemany("UPDATE memories SET status = 'active' WHERE id = ?", [(row[0],) for row in rows])
+            return lambda: self._add_to_index(rows)
+        
+        self._write(write)
+    
+    def _add_to_index(self, rows: List[Tuple]):
+        """Append (id, type, importance, embedding_row, embedding, retrieval_count) rows to a loaded resident index."""
+        with self._index_lock:
+            if self._index is not None:
+                self._append_rows(rows)
+    
+    def _append_rows(self, rows: List[Tuple]):
+        """Append rows that are not indexed yet (see _add_to_index); call with _index_lock held."""
+        rows = [row for row in rows if row[0] not in self._index.id_to_pos]
+        if not rows:
+            return
+        self._index.add_batch([row[0] for row in rows], self._row_vectors(rows, 3),
+                              [row[2] for row in rows], types=[row[1] for row in rows])
+        if self._ann is not None:
+            self._ann.flush()
+        retrieved = [(row[0], row[5]) for row in rows if row[5]]
+        self.hot_tier.seed(retrieved)
+        for memory_id, _ in retrieved:
+            self._index.set_boost(memory_id, self.hot_tier.boost_factor(self.hot_tier.hits(memory_id)))
+    
+    def _row_vectors(self, rows: List[Tuple], column: int) -> np.ndarray:
+        """Embeddings of rows whose `column` holds the sidecar row and `column + 1` the BLOB."""
+        if self.embedding_store is not None and all(row[column] is not None for row in rows):
+            return self.embedding_store.view()[np.asarray([row[column] for row in rows], dtype=np.int64)]
+        return np.stack([np.frombuffer(row[column + 1], dtype=np.float32) for row in rows])
+    
+    def _search_cold(self, query_embedding: np.ndarray, limit: int, filters: Tuple = ()) -> List[Tuple[str, float]]:
+        """Exact importance-weighted search over the cold tier, read from disk on each call."""
+        where, params = self._filter_clause(*filters, statuses=('cold',))
+        with self.db.read() as conn:
+            rows = conn.execute(f'''
+                SELECT id, importance, embedding_row,
+                       CASE WHEN embedding_row IS NULL THEN embedding END
+                FROM memories
+                WHERE {where} AND embedding IS NOT NULL
+            ''', params).fetchall()
+        if not rows:
+            return []
+        vectors = EmbeddingIndex.normalize(self._row_vectors(rows, 2))
+        query = EmbeddingIndex.normalize(np.asarray(query_embedding).ravel())
+        scores = vectors @ query * (np.asarray([row[1] or 0 for row in rows], dtype=np.float32) / 10.0)
+        top = np.argsort(-scores, kind="stable")[:limit]
+        return [(rows[i][0], float(scores[i])) for i in top]
+    
+    def _merge_cold_results(self, top: List[Tuple[str, Dict]], cold: List[Tuple[str, float]],
+                            limit: int) -> List[Tuple[str, Dict]]:
+        """Interleave cold-tier hits into ranked results by similarity (or by a fused rank in hybrid mode)."""
+        if not cold:
+            return top
+        if top and 'rrf_score' in top[0][1]:
+            merged = top + [(memory_id, {'similarity': similarity, 'rrf_score': 1.0 / (self.rrf_k + rank + 1),
+                                         'tier': 'cold'})
+                            for rank, (memory_id, similarity) in enumerate(cold)]
+            key = lambda item: item[1]['rrf_score']
+        else:
+            merged = top + [(memory_id, {'similarity': similarity, 'tier': 'cold'}) for memory_id, similarity in cold]
+            key = lambda item: item[1]['similarity'] if item[1]['similarity'] is not None else -1.0
+        return sorted(merged, key=key, reverse=True)[:limit]
+    
+    def get_consolidated_sources(self, summary_id: str) -> List[MemoryRecord]:
+        """The archived memories a consolidation summary replaced, oldest first."""
+        with self.db.read() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = MemoryRecord.row_factory
+            cursor.execute(f'''
+                SELECT {MEMORY_COLUMNS}
+                FROM memories
+                WHERE consolidated_into = ?
+                ORDER BY rowid
+            ''', (summary_id,))
+            return cursor.fetchall()
     
     def store_conversation(self, session_id: str, user_input: str, ai_response: str, 
-                          retrieved_memory_ids: List[str] = None):
-        """Store a conversation exchange."""
+                          retrieved_memory_ids: List[str] = None,
+                          retrieval_scores: Sequence[Optional[float]] = None) -> ConversationRecord:
+        """
+        Store a conversation exchange.
+        
+        Args:
+            retrieved_memory_ids: Memories the turn used, best match first
+            retrieval_scores: Each retrieved memory's ranking score, i.e. its `similarity`
+                (cosine weighted by importance and retrieval boost; None for keyword-only hits)
+        
+        Returns the record; its rowid and timestamp are filled in once the
+        exchange is written (on return, or when the enclosing unit of work flushes).
+        """
+        retrieved_memory_ids = list(retrieved_memory_ids or [])
+        if retrieval_scores is None:
+            retrieval_scores = [None] * len(retrieved_memory_ids)
+        elif len(retrieval_scores) != len(retrieved_memory_ids):
+            raise ValueError("retrieval_scores must have one score per retrieved memory")
         conversation_id = str(uuid.uuid4())
-        retrieved_memories_json = json.dumps(retrieved_memory_ids) if retrieved_memory_ids else None
+        links = [(conversation_id, memory_id, rank, score) for rank, (memory_id, score)
+                 in enumerate(zip(retrieved_memory_ids, retrieval_scores), start=1)]
+        record = ConversationRecord(user_input, ai_response, None)
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        def write(conn):
+            cursor = conn.execute('''
+                INSERT INTO conversations (id, session_id, user_input, ai_response)
+                VALUES (?, ?, ?, ?)
+            ''', (conversation_id, session_id, user_input, ai_response))
+            record.rowid = cursor.lastrowid
+            record.timestamp = conn.execute('SELECT timestamp FROM conversations WHERE rowid = ?',
+                                            (record.rowid,)).fetchone()[0]
+            if links:
+                conn.executemany('''
+                    INSERT INTO conversation_memories (conversation_id, memory_id, rank, rank_score)
+                    VALUES (?, ?, ?, ?)
+                ''', links)
         
-        cursor.execute('''
-            INSERT INTO conversations (id, session_id, user_input, ai_response, retrieved_memories)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (conversation_id, session_id, user_input, ai_response, retrieved_memories_json))
+        self._write(write)
+        return record
+    
+    def get_memory_usage(self, memory_id: str, limit: int = 50, session_id: str = None) -> List[Dict]:
+        """The conversation turns that retrieved a memory, newest first."""
+        session_clause, params = '', [memory_id]
+        if session_id is not None:
+            session_clause = 'AND c.session_id = ?'
+            params.append(session_id)
+        
+        with self.db.read() as conn:
+            rows = conn.execute(f'''
+                SELECT c.id, c.session_id, c.timestamp, cm.rank, cm.rank_score, c.user_input
+                FROM conversation_memories cm
+                JOIN conversations c ON c.id = cm.conversation_id
+                WHERE cm.memory_id = ? {session_clause}
+                ORDER BY c.timestamp DESC, c.rowid DESC
+                LIMIT ?
+            ''', params + [limit]).fetchall()
         
-        conn.commit()
-        conn.close()
+        return [{'conversation_id': row[0], 'session_id': row[1], 'timestamp': row[2],
+                 'rank': row[3], 'rank_score': row[4], 'user_input': row[5]} for row in rows]
     
-    def get_conversation_history(self, session_id: str, limit: int = 10) -> List[Dict]:
-        """Retrieve conversation history for a session."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def get_most_used_memories(self, since=None, until=None, limit: int = 10,
+                               session_id: str = None) -> List[MemoryRecord]:
+        """
+        Memories retrieved by the most conversation turns in a time range, with
+        `uses`, `avg_rank` and `last_used` attached. The range is a seek on the
+        conversations timestamp (or session) index; memories are joined by key.
         
-        cursor.execute('''
-            SELECT user_input, ai_response, timestamp
-            FROM conversations
-            WHERE session_id = ?
-            ORDER BY timestamp DESC
-            LIMIT ?
-        ''', (session_id, limit))
+        Args:
+            since: Only count turns at or after this time (datetime or
+                "YYYY-MM-DD HH:MM:SS" UTC string)
+            until: Only count turns before this time
+        """
+        conditions, params = [], []
+        if session_id is not None:
+            conditions.append('c.session_id = ?')
+            params.append(session_id)
+        if since is not None:
+            conditions.append('c.timestamp >= ?')
+            params.append(self._sql_timestamp(since))
+        if until is not None:
+            conditions.append('c.timestamp < ?')
+            params.append(self._sql_timestamp(until))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        # CROSS JOIN pins the filtered conversations as the outer loop (a range seek),
+        # otherwise the planner tends to scan every link and look each turn up
+        join = 'CROSS JOIN' if conditions else 'JOIN'
+        columns = ', '.join(f'm.{column.strip()}' for column in MEMORY_COLUMNS.split(','))
         
-        results = cursor.fetchall()
-        conn.close()
+        with self.db.read() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = MemoryRecord.row_factory
+            cursor.execute(f'''
+                WITH usage AS (
+                    SELECT cm.memory_id, COUNT(*) AS uses, AVG(cm.rank) AS avg_rank,
+                           MAX(c.timestamp) AS last_used
+                    FROM conversations c
+                    {join} conversation_memories cm ON cm.conversation_id = c.id
+                    {where}
+                    GROUP BY cm.memory_id
+                )
+                SELECT {columns}, usage.uses, usage.avg_rank, usage.last_used
+                FROM usage
+                JOIN memories m ON m.id = usage.memory_id
+                ORDER BY usage.uses DESC, usage.last_used DESC
+                LIMIT ?
+            ''', params + [limit])
+            return cursor.fetchall()
+    
+    def get_latest_conversation_rowid(self, session_id: str) -> Optional[int]:
+        """Rowid of the session's newest exchange (an index-only seek), or None."""
+        with self.db.read() as conn:
+            row = conn.execute('''
+                SELECT rowid FROM conversations
+                WHERE session_id = ?
+                ORDER BY timestamp DESC, rowid DESC
+                LIMIT 1
+            ''', (session_id,)).fetchone()
+        return row[0] if row else None
+    
+    def get_conversation_history(self, session_id: str, limit: int = 10,
+                                 before: str = None) -> List[ConversationRecord]:
+        """
+        Retrieve conversation history for a session.
         
-        return [{
-            'user_input': row[0],
-            'ai_response': row[1],
-            'timestamp': row[2]
-        } for row in results[::-1]]  # Reverse to get chronological order
+        Args:
+            limit: Number of most recent exchanges
+            before: Cursor of an exchange (ConversationRecord.cursor); only older ones are returned
+        """
+        keyset, params = '', [session_id]
+        if before is not None:
+            keyset = 'AND (timestamp, rowid) < (?, ?)'
+            params += decode_history_cursor(before)
+        
+        with self.db.read() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = ConversationRecord.row_factory
+            cursor.execute(f'''
+                SELECT user_input, ai_response, timestamp, rowid
+                FROM conversations
+                WHERE session_id = ? {keyset}
+                ORDER BY timestamp DESC, rowid DESC
+                LIMIT ?
+            ''', params + [limit])
+        
+            results = cursor.fetchall()
+        
+        return results[::-1]  # Reverse to get chronological order
     
-    def set_world_state(self, state_type: str, key: str, value: str, description: str = None):
-        """Set or update world state information."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def get_conversation_page(self, session_id: str, after: str = None,
+                              limit: int = 100) -> List[ConversationRecord]:
+        """
+        One page of a session's history in chronological order, starting after
+        the `after` cursor (from the beginning if None). Pages are keyset seeks
+        on (session_id, timestamp, rowid), so deep pages cost the same as the first.
+        """
+        keyset, params = '', [session_id]
+        if after is not None:
+            keyset = 'AND (timestamp, rowid) > (?, ?)'
+            params += decode_history_cursor(after)
         
-        cursor.execute('''
-            INSERT INTO world_state (state_type, key, value, description)
-            VALUES (?, ?, ?, ?)
-        ''', (state_type, key, value, description))
+        with self.db.read() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = ConversationRecord.row_factory
+            cursor.execute(f'''
+                SELECT user_input, ai_response, timestamp, rowid
+                FROM conversations
+                WHERE session_id = ? {keyset}
+                ORDER BY timestamp, rowid
+                LIMIT ?
+            ''', params + [limit])
+            return cursor.fetchall()
+    
+    def iter_conversation_history(self, session_id: str, after: str = None,
+                                  page_size: int = 100) -> Iterator[ConversationRecord]:
+        """Stream a whole session page by page, holding at most one page in memory."""
+        while True:
+            page = self.get_conversation_page(session_id, after, page_size)
+            yield from page
+            if len(page) < page_size:
+                return
+            after = page[-1].cursor
+    
+    def set_world_state(self, state_type: str, key: str, value: str, description: str = None,
+                        exclusive: bool = False):
+        """
+        Set or update world state information.
         
-        conn.commit()
-        conn.close()
+        Args:
+            exclusive: Make this the only current key of state_type (e.g. the time of
+                day moving from "morning" to "midday"); older keys stay in the history
+        """
+        def write(conn):
+            cursor = conn.execute('''
+                INSERT INTO world_state (state_type, key, value, description, exclusive)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (state_type, key, value, description, int(exclusive)))
+            log_id = cursor.lastrowid
+            if exclusive:
+                conn.execute('DELETE FROM world_state_current WHERE state_type = ? AND key != ?',
+                             (state_type, key))
+            conn.execute('''
+                INSERT INTO world_state_current (state_type, key, value, description, timestamp, log_id)
+                SELECT state_type, key, value, description, timestamp, id FROM world_state WHERE id = ?
+                ON CONFLICT (state_type, key) DO UPDATE SET
+                    value = excluded.value,
+                    description = excluded.description,
+                    timestamp = excluded.timestamp,
+                    log_id = excluded.log_id
+            ''', (log_id,))
+            
+            last_snapshot = conn.execute('SELECT MAX(log_id) FROM world_state_snapshots').fetchone()[0] or 0
+            if log_id - last_snapshot >= self.world_state_snapshot_every:
+                snapshot_time = conn.execute('SELECT timestamp FROM world_state WHERE id = ?',
+                                             (log_id,)).fetchone()[0]
+                current = conn.execute('''
+                    SELECT state_type, key, value, description, timestamp, log_id FROM world_state_current
+                ''').fetchall()
+                self._write_world_state_snapshot(conn, log_id, snapshot_time, current)
+        
+        self._write(write)
     
-    def get_world_state(self, state_type: str = None) -> List[Dict]:
-        """Get world state information."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def get_world_state(self, state_type: str = None, as_of=None) -> List[Dict]:
+        """
+        Get the current world state, most recently changed first.
         
-        if state_type:
-            cursor.execute('''
-                SELECT state_type, key, value, description, timestamp
-                FROM world_state
-                WHERE state_type = ?
-                ORDER BY timestamp DESC
-            ''', (state_type,))
-        else:
-            cursor.execute('''
-                SELECT state_type, key, value, description, timestamp
-                FROM world_state
-                ORDER BY timestamp DESC
-            ''')
+        Args:
+            state_type: Only return this state type
+            as_of: Return the state as it was at this time instead (datetime or
+                "YYYY-MM-DD HH:MM:SS" UTC string)
+        """
+        if as_of is not None:
+            return self._get_world_state_as_of(state_type, self._sql_timestamp(as_of))
         
-        results = cursor.fetchall()
-        conn.close()
+        with self.db.read() as conn:
+            cursor = conn.cursor()
+            if state_type:
+                cursor.execute('''
+                    SELECT state_type, key, value, description, timestamp
+                    FROM world_state_current
+                    WHERE state_type = ?
+                    ORDER BY log_id DESC
+                ''', (state_type,))
+            else:
+                cursor.execute('''
+                    SELECT state_type, key, value, description, timestamp
+                    FROM world_state_current
+                    ORDER BY log_id DESC
+                ''')
+        
+            results = cursor.fetchall()
         
         return [{
             'state_type': row[0],
@@ -333,28 +1969,109 @@ class FantasyMemorySystem:
             'timestamp': row[4]
         } for row in results]
     
-    def get_memory_stats(self) -> Dict:
-        """Get statistics about stored memories."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def _get_world_state_as_of(self, state_type: Optional[str], as_of: str) -> List[Dict]:
+        """
+        Start from the latest snapshot taken at or before `as_of` and replay the
+        log rows between it and the next snapshot, so at most
+        world_state_snapshot_every rows are read however long the history is.
+        """
+        type_filter = 'AND state_type = ?' if state_type else ''
+        type_params = [state_type] if state_type else []
+        with self.db.read() as conn:
+            snapshot = conn.execute('''
+                SELECT log_id FROM world_state_snapshots
+                WHERE timestamp <= ?
+                ORDER BY timestamp DESC, log_id DESC
+                LIMIT 1
+            ''', (as_of,)).fetchone()
+            start = snapshot[0] if snapshot else 0
+            end = conn.execute('SELECT MIN(log_id) FROM world_state_snapshots WHERE log_id > ?',
+                               (start,)).fetchone()[0]
+            
+            state: Dict[Tuple[str, str], Tuple] = {}
+            if snapshot:
+                for row in conn.execute(f'''
+                    SELECT state_type, key, value, description, timestamp, log_id
+                    FROM world_state_snapshot_rows
+                    WHERE snapshot_id = ? {type_filter}
+                ''', [start] + type_params):
+                    state[(row[0], row[1])] = row
+            
+            end_filter = 'AND id < ?' if end is not None else ''
+            changes = conn.execute(f'''
+                SELECT id, state_type, key, value, description, timestamp, exclusive
+                FROM world_state
+                WHERE id > ? {end_filter} AND timestamp <= ? {type_filter}
+                ORDER BY id
+            ''', [start] + ([end] if end is not None else []) + [as_of] + type_params).fetchall()
         
-        # Count by type
-        cursor.execute('SELECT type, COUNT(*) FROM memories GROUP BY type')
-        type_counts = dict(cursor.fetchall())
+        for row in changes:
+            self._apply_world_state_change(state, row)
         
-        # Total count
-        cursor.execute('SELECT COUNT(*) FROM memories')
-        total_count = cursor.fetchone()[0]
+        return [{
+            'state_type': row[0],
+            'key': row[1],
+            'value': row[2],
+            'description': row[3],
+            'timestamp': row[4]
+        } for row in sorted(state.values(), key=lambda row: row[5], reverse=True)]
+    
+    def get_world_state_history(self, state_type: str = None, key: str = None,
+                                limit: int = 100) -> List[Dict]:
+        """Logged world state changes, newest first."""
+        conditions, params = [], []
+        if state_type:
+            conditions.append('state_type = ?')
+            params.append(state_type)
+        if key:
+            conditions.append('key = ?')
+            params.append(key)
+        where = 'WHERE ' + ' AND '.join(conditions) if conditions else ''
+        with self.db.read() as conn:
+            results = conn.execute(f'''
+                SELECT state_type, key, value, description, timestamp
+                FROM world_state
+                {where}
+                ORDER BY timestamp DESC, id DESC
+                LIMIT ?
+            ''', params + [limit]).fetchall()
         
-        # Recent memories (last 24 hours)
-        cursor.execute('SELECT COUNT(*) FROM memories WHERE timestamp > datetime("now", "-1 day")')
-        recent_count = cursor.fetchone()[0]
+        return [{
+            'state_type': row[0],
+            'key': row[1],
+            'value': row[2],
+            'description': row[3],
+            'timestamp': row[4]
+        } for row in results]
+    
+    def get_embedding_cache_stats(self) -> Dict:
+        """Hit/miss counters of the embedding cache."""
+        return self.embedding_cache.stats()
+    
+    def get_memory_stats(self) -> Dict:
+        """
+        Get statistics about stored memories. Totals and per-type counts cover
+        the active set; by_status also counts archived and cold memories.
+        """
+        with self.db.read() as conn:
+            cursor = conn.cursor()
+            # Count by type and status, maintained by triggers
+            cursor.execute('SELECT type, status, count FROM memory_stats ORDER BY type')
+            type_counts, status_counts = {}, {'active': 0, 'archived': 0, 'cold': 0}
+            for memory_type, status, count in cursor.fetchall():
+                status_counts[status] = status_counts.get(status, 0) + count
+                if status == 'active':
+                    type_counts[memory_type] = count
         
-        conn.close()
+            # Recent memories (last 24 hours): a range seek on idx_memories_timestamp
+            since = self._sql_timestamp(datetime.now(timezone.utc) - timedelta(days=1))
+            cursor.execute("SELECT COUNT(*) FROM memories WHERE timestamp > ? AND status = 'active'", (since,))
+            recent_count = cursor.fetchone()[0]
         
         return {
-            'total_memories': total_count,
+            'total_memories': status_counts['active'],
             'by_type': type_counts,
+            'by_status': status_counts,
             'recent_memories': recent_count
         }
 
@@ -364,21 +2081,22 @@ if __name__ == "__main__":
     memory = FantasyMemorySystem()
     
     # Store some example memories
-    memory.store_memory(
-        "Eldara the Elf Queen rules from her crystal palace in the Skylands",
-        "character",
-        "Eldara",
-        {"race": "elf", "role": "queen", "location": "Skylands"},
-        importance=9
-    )
-    
-    memory.store_memory(
-        "The Ancient Forest of Whispering Trees lies east of the village",
-        "location",
-        "Ancient Forest",
-        {"type": "forest", "mysterious": True, "danger_level": "moderate"},
-        importance=7
-    )
+    memory.store_memories([
+        {
+            'content': "Eldara the Elf Queen rules from her crystal palace in the Skylands",
+            'memory_type': "character",
+            'name': "Eldara",
+            'attributes': {"race": "elf", "role": "queen", "location": "Skylands"},
+            'importance': 9
+        },
+        {
+            'content': "The Ancient Forest of Whispering Trees lies east of the village",
+            'memory_type': "location",
+            'name': "Ancient Forest",
+            'attributes': {"type": "forest", "mysterious": True, "danger_level": "moderate"},
+            'importance': 7
+        }
+    ])
     
     # Test retrieval
     relevant = memory.retrieve_relevant_memories("Tell me about the queen", limit=3)
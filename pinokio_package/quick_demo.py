@@ -21,37 +21,36 @@ def demo_memory_system():
     # Add some fantasy world memories
     print("📝 Adding world memories...")
     
-    memory.store_memory(
-        "Thorin Ironbeard is a friendly dwarf bartender at The Prancing Pony tavern",
-        "character",
-        "Thorin Ironbeard", 
-        {"race": "dwarf", "role": "barkeeper", "personality": "friendly"},
-        importance=8
-    )
-    
-    memory.store_memory(
-        "Havenbrook is a bustling medieval town with cobblestone streets",
-        "location",
-        "Havenbrook",
-        {"type": "town", "size": "medium", "tech_level": "medieval"},
-        importance=7
-    )
-    
-    memory.store_memory(
-        "The Ancient Forest lies east of Havenbrook, filled with mysterious creatures",
-        "location", 
-        "Ancient Forest",
-        {"type": "forest", "danger_level": "moderate", "mysterious": True},
-        importance=6
-    )
-    
-    memory.store_memory(
-        "You found a glowing crystal pendant in the forest",
-        "item",
-        "Crystal Pendant",
-        {"magical": True, "glows": True, "source": "Ancient Forest"},
-        importance=5
-    )
+    memory.store_memories([
+        {
+            'content': "Thorin Ironbeard is a friendly dwarf bartender at The Prancing Pony tavern",
+            'memory_type': "character",
+            'name': "Thorin Ironbeard",
+            'attributes': {"race": "dwarf", "role": "barkeeper", "personality": "friendly"},
+            'importance': 8
+        },
+        {
+            'content': "Havenbrook is a bustling medieval town with cobblestone streets",
+            'memory_type': "location",
+            'name': "Havenbrook",
+            'attributes': {"type": "town", "size": "medium", "tech_level": "medieval"},
+            'importance': 7
+        },
+        {
+            'content': "The Ancient Forest lies east of Havenbrook, filled with mysterious creatures",
+            'memory_type': "location",
+            'name': "Ancient Forest",
+            'attributes': {"type": "forest", "danger_level": "moderate", "mysterious": True},
+            'importance': 6
+        },
+        {
+            'content': "You found a glowing crystal pendant in the forest",
+            'memory_type': "item",
+            'name': "Crystal Pendant",
+            'attributes': {"magical": True, "glows": True, "source": "Ancient Forest"},
+            'importance': 5
+        }
+    ])
     
     # Demonstrate search
     print("\n🔍 Searching for 'dwarf'...")
@@ -0,0 +1,68 @@
+"""
+Memory Retention
+Scores how much each active memory is worth keeping from its importance,
+how recently it was stored or retrieved, and how often it has been
+retrieved. FantasyMemorySystem uses the policy to keep the active
+retrieval set within a target size or RAM budget; the lowest scoring
+memories move to the cold tier, which is only searched on request.
+"""
+
+from typing import Optional, Sequence
+import numpy as np
+
+
+class RetentionPolicy:
+    def __init__(self, max_active: int = None, max_index_bytes: int = None,
+                 importance_weight: float = 0.5, recency_weight: float = 0.3,
+                 frequency_weight: float = 0.2, half_life_days: float = 7.0,
+                 low_watermark: float = 0.9, protected_types: Sequence[str] = ("world",)):
+        """
+        Args:
+            max_active: Most memories kept in the active set
+            max_index_bytes: RAM budget of the resident embedding matrix
+            importance_weight: Weight of importance (1-10, scaled to 0-1)
+            recency_weight: Weight of recency, halving every half_life_days since
+                the memory was stored or last retrieved
+            frequency_weight: Weight of the retrieval count (log-scaled against the busiest memory)
+            half_life_days: Age at which the recency term has decayed to one half
+            low_watermark: An eviction shrinks the active set to this fraction of its
+                capacity, so evictions run in batches rather than on every insert
+            protected_types: Memory types that are never evicted
+        """
+        if max_active is None and max_index_bytes is None:
+            raise ValueError("Set max_active, max_index_bytes or both")
+        if not 0 < low_watermark <= 1:
+            raise ValueError(f"low_watermark must be in (0, 1]: {low_watermark}")
+        if half_life_days <= 0:
+            raise ValueError(f"half_life_days must be positive: {half_life_days}")
+        self.max_active = max_active
+        self.max_index_bytes = max_index_bytes
+        self.importance_weight = importance_weight
+        self.recency_weight = recency_weight
+        self.frequency_weight = frequency_weight
+        self.half_life_days = half_life_days
+        self.low_watermark = low_watermark
+        self.protected_types = frozenset(protected_types)
+
+    def capacity(self, dim: Optional[int]) -> Optional[int]:
+        """Most active memories allowed for embeddings of `dim` float32 values."""
+        limits = []
+        if self.max_active is not None:
+            limits.append(self.max_active)
+        if self.max_index_bytes is not None and dim:
+            limits.append(self.max_index_bytes // (4 * dim))
+        return min(limits) if limits else None
+
+    def target(self, capacity: int) -> int:
+        """Size an eviction shrinks the active set to."""
+        return int(capacity * self.low_watermark)
+
+    def scores(self, importance: np.ndarray, age_days: np.ndarray, retrieval_count: np.ndarray) -> np.ndarray:
+        """Retention score per memory; the lowest scores are evicted first."""
+        importance = np.asarray(importance, dtype=np.float64) / 10.0
+        recency = np.power(0.5, np.maximum(np.asarray(age_days, dtype=np.float64), 0.0) / self.half_life_days)
+        frequency = np.log1p(np.asarray(retrieval_count, dtype=np.float64))
+        if len(frequency) and frequency.max() > 0:
+            frequency = frequency / frequency.max()
+        return (self.importance_weight * importance + self.recency_weight * recency
+                + self.frequency_weight * frequency)
@@ -3,16 +3,16 @@ Web Interface for Fantasy Chatbot
 FastAPI-based web server with real-time chat interface
 """
 
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import json
 import asyncio
 from typing import List, Dict, Optional
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
 from fantasy_chatbot import FantasyChatbot
 
@@ -90,6 +90,7 @@ async def health_check():
             "status": "healthy",
             "session_id": chatbot.session_id,
             "memory_stats": chatbot.get_memory_stats(),
+            "embedding_cache": chatbot.memory_system.get_embedding_cache_stats(),
             "memory_usage": chatbot.get_memory_usage()
         }
     else:
@@ -115,14 +116,36 @@ async def chat_endpoint(request: Dict):
         logger.error(f"Chat error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def records_response(key: str, records) -> JSONResponse:
+    """Serialize memory records directly, skipping FastAPI's generic encoder walk."""
+    return JSONResponse({key: [record.to_dict() for record in records]})
+
+def parse_attribute_filters(pairs: List[str]) -> Dict[str, str]:
+    """Turn repeated key:value query parameters into an attribute filter."""
+    filters = {}
+    for pair in pairs:
+        key, sep, value = pair.partition(":")
+        if not sep or not key:
+            raise HTTPException(status_code=400, detail=f"Attribute filter must be key:value, got {pair!r}")
+        filters[key] = value
+    return filters
+
 @app.get("/memories")
-async def get_memories(memory_type: Optional[str] = None, limit: int = 50):
-    """Get stored memories."""
+async def get_memories(memory_type: Optional[str] = None, limit: int = 50, query: Optional[str] = None,
+                       attr: List[str] = Query(default=[]), since: Optional[str] = None,
+                       until: Optional[str] = None):
+    """Get stored memories, ranked by relevance to `query` when one is given."""
     global chatbot
     if not chatbot:
         raise HTTPException(status_code=503, detail="Chatbot not initialized")
     
-    if memory_type:
+    attributes = parse_attribute_filters(attr)
+    if query:
+        memories = chatbot.memory_system.retrieve_relevant_memories(
+            query, limit, memory_type=memory_type, attributes=attributes or None, since=since, until=until)
+    elif attributes or since or until:
+        memories = chatbot.memory_system.find_memories(memory_type, attributes, since, until, limit)
+    elif memory_type:
         memories = chatbot.memory_system.get_memories_by_type(memory_type, limit)
     else:
         # Get all types
@@ -132,16 +155,69 @@ async def get_memories(memory_type: Optional[str] = None, limit: int = 50):
             all_memories.extend(memories)
         memories = sorted(all_memories, key=lambda x: x['importance'], reverse=True)[:limit]
     
-    return {"memories": memories}
+    return records_response("memories", memories)
+
+@app.get("/memories/{memory_id}/usage")
+async def get_memory_usage(memory_id: str, limit: int = 50, session_id: Optional[str] = None):
+    """Conversation turns that retrieved a memory, newest first."""
+    global chatbot
+    if not chatbot:
+        raise HTTPException(status_code=503, detail="Chatbot not initialized")
+    
+    return {"memory_id": memory_id,
+            "turns": chatbot.memory_system.get_memory_usage(memory_id, limit, session_id)}
+
+@app.get("/analytics/top-memories")
+async def get_top_memories(days: float = 7, limit: int = 10, session_id: Optional[str] = None):
+    """Memories retrieved by the most turns over the last `days` days."""
+    global chatbot
+    if not chatbot:
+        raise HTTPException(status_code=503, detail="Chatbot not initialized")
+    if days <= 0:
+        raise HTTPException(status_code=400, detail="days must be positive")
+    
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    memories = chatbot.memory_system.get_most_used_memories(since=since, limit=limit, session_id=session_id)
+    return records_response("memories", memories)
 
 @app.get("/world-state")
-async def get_world_state():
-    """Get current world state."""
+async def get_world_state(state_type: Optional[str] = None, as_of: Optional[str] = None):
+    """Get current world state, or the state at `as_of` ("YYYY-MM-DD HH:MM:SS" UTC)."""
     global chatbot
     if not chatbot:
         raise HTTPException(status_code=503, detail="Chatbot not initialized")
     
-    return {"world_state": chatbot.memory_system.get_world_state()}
+    return {"world_state": chatbot.memory_system.get_world_state(state_type, as_of=as_of)}
+
+@app.get("/sessions/{session_id}/history")
+async def get_session_history(session_id: str, after: Optional[str] = None, page_size: int = 200):
+    """
+    Stream a session's conversation history as NDJSON, oldest first.
+    Each line carries a `cursor`; pass the last one as `after` to resume.
+    """
+    global chatbot
+    if not chatbot:
+        raise HTTPException(status_code=503, detail="Chatbot not initialized")
+    if page_size < 1:
+        raise HTTPException(status_code=400, detail="page_size must be positive")
+    
+    memory_system = chatbot.memory_system
+    try:
+        # Read the first page eagerly so a bad cursor is a 400, not a broken stream
+        first_page = memory_system.get_conversation_page(session_id, after, page_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    def lines():
+        page = first_page
+        while True:
+            for record in page:
+                yield json.dumps({**record.to_dict(), "cursor": record.cursor}) + "\n"
+            if len(page) < page_size:
+                return
+            page = memory_system.get_conversation_page(session_id, page[-1].cursor, page_size)
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 @app.post("/search-memories")
 async def search_memories(request: Dict):
@@ -155,8 +231,10 @@ async def search_memories(request: Dict):
     if not query:
         raise HTTPException(status_code=400, detail="Query is required")
     
-    results = chatbot.search_memories(query, memory_type)
-    return {"results": results}
+    results = chatbot.search_memories(query, memory_type, attributes=request.get("attributes"),
+                                      since=request.get("since"), until=request.get("until"),
+                                      include_cold=bool(request.get("include_cold", False)))
+    return records_response("results", results)
 
 @app.websocket("/ws/chat")
 async def websocket_chat(websocket: WebSocket):
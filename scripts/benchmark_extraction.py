@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark memory extraction on long LLM responses.
+
+Compares the single-pass extraction pipeline (extraction.py) with the
+previous approach of running every pattern and keyword check separately
+over the text. No database or embedding model is involved.
+
+Usage:
+    python scripts/benchmark_extraction.py [--sizes 1000 10000 100000] [--runs 5]
+"""
+
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extraction import build_mention_pipeline, build_narrative_pipeline
+
+SENTENCES = [
+    "I meet Eldara, a wise elf who guards the northern pass.",
+    "Thorin is grumbling about the price of ale.",
+    "Suddenly a wolf howls in the distance.",
+    "You go to the Silver Inn, where travellers rest.",
+    "The rain keeps falling over the quiet village and the old mill.",
+    "Then the bard begins a song about the lost castle.",
+    "You find a Rusty key, half buried in the mud.",
+    "Meanwhile the merchants argue near the river.",
+    "Nothing stirs in the dark forest for a long while.",
+    "The innkeeper serves a hearty dinner of stew and bread.",
+]
+
+LEGACY_PATTERNS = {
+    'character': [
+        r'(?:I meet|meet|see|encounter)\s+(?:a|an|the)?\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\s*,?\s*(.*?)(?:\.|\n)',
+        r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\s+(?:is|appears|seems)\s+(.*?)(?:\.|\n)',
+        r'NPC:\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\s*[:\-]\s*(.*?)(?:\.|\n)'
+    ],
+    'location': [
+        r'(?:go to|enter|arrive at|reach)\s+(?:the\s+)?([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\s*,?\s*(.*?)(?:\.|\n)',
+        r'(?:Location|Place):\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\s*[:\-]\s*(.*?)(?:\.|\n)'
+    ],
+    'item': [
+        r'(?:find|discover|pick up|take)\s+(?:a|an|the)?\s*([A-Z][a-z]+(?:\s+[a-z]+)*)\s*,?\s*(.*?)(?:\.|\n)',
+        r'(?:Item|Object):\s*([A-Z][a-z]+(?:\s+[a-z]+)*)\s*[:\-]\s*(.*?)(?:\.|\n)'
+    ],
+    'event': [
+        r'(?:suddenly|then|afterwards)\s+(.*?)(?:\.|\n)',
+        r'(?:Event|Incident):\s*(.*?)(?:\.|\n)'
+    ]
+}
+LOCATION_KEYWORDS = ['village', 'town', 'city', 'forest', 'mountain', 'castle', 'tavern', 'inn', 'palace',
+                     'forest', 'river', 'lake']
+EVENT_INDICATORS = ['suddenly', 'meanwhile', 'however', 'unexpectedly', 'the next day', 'afterwards']
+
+
+def legacy_extract(text: str) -> int:
+    """The per-pattern, per-keyword scans the pipeline replaced; returns the number of findings."""
+    found = 0
+    for type_patterns in LEGACY_PATTERNS.values():
+        for pattern in type_patterns:
+            found += sum(1 for _ in re.finditer(pattern, text, re.IGNORECASE))
+    found += len([name for name in re.findall(r'\b[A-Z][a-z]+\b', text)[:3]])
+    for keyword in LOCATION_KEYWORDS:
+        if keyword in text.lower() and re.findall(rf'(\b\w+\s+){keyword}\b', text.lower()):
+            found += 1
+    for indicator in EVENT_INDICATORS:
+        if indicator in text.lower():
+            found += 1
+            break
+    return found
+
+
+def make_response(size: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    parts, length = [], 0
+    while length < size:
+        sentence = rng.choice(SENTENCES)
+        parts.append(sentence)
+        length += len(sentence) + 1
+    return ' '.join(parts)[:size]
+
+
+def time_it(function, text: str, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function(text)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark memory extraction")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help='Response lengths in characters')
+    parser.add_argument('--runs', type=int, default=5, help='Timed runs per measurement')
+    args = parser.parse_args()
+
+    narrative, mentions = build_narrative_pipeline(), build_mention_pipeline()
+
+    def pipeline_extract(text: str) -> int:
+        return len(narrative.extract(text)) + len(mentions.extract(text))
+
+    pipeline_extract("warm up")
+    print(f"{'chars':>8} {'legacy ms':>10} {'pipeline ms':>12} {'speedup':>8} {'candidates':>11}")
+    for size in args.sizes:
+        text = make_response(size)
+        legacy = time_it(legacy_extract, text, args.runs)
+        pipeline = time_it(pipeline_extract, text, args.runs)
+        print(f"{size:>8} {legacy * 1000:>10.2f} {pipeline * 1000:>12.2f} {legacy / pipeline:>7.1f}x "
+              f"{pipeline_extract(text):>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Measure import and startup time of the memory system.
+
+Each measurement runs in a fresh interpreter so module caches don't skew it.
+Read-only operations (stats, world state) should not load the embedding model.
+
+Usage:
+    python scripts/benchmark_startup.py [--db-path fantasy_world.db] [--runs 3]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import statistics
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import memory_system
+print(time.perf_counter() - start)
+"""
+
+STARTUP_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+from memory_system import FantasyMemorySystem
+memory = FantasyMemorySystem(sys.argv[1])
+ready = time.perf_counter()
+memory.get_memory_stats()
+memory.get_world_state()
+done = time.perf_counter()
+print(json.dumps({
+    'construct_s': ready - start,
+    'read_only_s': done - ready,
+    'embedder_loaded': memory.embedder.loaded,
+    'imported_sentence_transformers': 'sentence_transformers' in sys.modules
+}))
+"""
+
+
+def run_snippet(snippet: str, *args) -> str:
+    result = subprocess.run([sys.executable, "-c", snippet, *args], cwd=PROJECT_ROOT,
+                            capture_output=True, text=True, check=True)
+    return result.stdout.strip().splitlines()[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark memory system startup")
+    parser.add_argument('--db-path', default='fantasy_world.db', help='Database to open')
+    parser.add_argument('--runs', type=int, default=3, help='Fresh interpreters per measurement')
+    args = parser.parse_args()
+
+    import_times = [float(run_snippet(IMPORT_SNIPPET)) for _ in range(args.runs)]
+    startups = [json.loads(run_snippet(STARTUP_SNIPPET, os.path.abspath(args.db_path)))
+                for _ in range(args.runs)]
+
+    print(f"import memory_system:      {statistics.median(import_times) * 1000:8.1f} ms (median of {args.runs})")
+    print(f"FantasyMemorySystem():     {statistics.median(s['construct_s'] for s in startups) * 1000:8.1f} ms")
+    print(f"stats + world state:       {statistics.median(s['read_only_s'] for s in startups) * 1000:8.1f} ms")
+    print(f"embedding model loaded:    {any(s['embedder_loaded'] for s in startups)}")
+    print(f"sentence_transformers imported: {any(s['imported_sentence_transformers'] for s in startups)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Shared fixtures. Tests run against real SQLite databases in a temporary
+directory; the sentence embedder is replaced by a deterministic bag-of-words
+hashing embedder, so no model is downloaded and similar texts still embed
+close together.
+"""
+
+import hashlib
+import os
+import re
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import memory_system  # noqa: E402
+from memory_system import FantasyMemorySystem  # noqa: E402
+
+DIM = 64
+
+
+class HashingEmbedder:
+    """Each word adds weight to two hashed dimensions; shared words mean high cosine."""
+
+    def __init__(self):
+        self.calls = 0
+        self.synonyms = {}  # word -> word it embeds as, to model paraphrases
+
+    def encode(self, texts, **kwargs):
+        self.calls += 1
+        vectors = np.zeros((len(texts), DIM), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in re.findall(r"\w+", text.lower()):
+                word = self.synonyms.get(word, word)
+                digest = int(hashlib.md5(word.encode()).hexdigest(), 16)
+                vectors[i, digest % DIM] += 1.0
+                vectors[i, (digest >> 20) % DIM] += 0.5
+        return vectors
+
+
+@pytest.fixture
+def embedder(monkeypatch):
+    embedder = HashingEmbedder()
+    monkeypatch.setattr(memory_system, "get_shared_embedder", lambda model_name: embedder)
+    return embedder
+
+
+@pytest.fixture
+def make_memory(tmp_path, embedder):
+    """Factory for memory systems on a temporary database; all are closed afterwards."""
+    systems = []
+
+    def factory(name: str = "world.db", **kwargs) -> FantasyMemorySystem:
+        kwargs.setdefault("dedup_threshold", None)
+        system = FantasyMemorySystem(str(tmp_path / name), **kwargs)
+        systems.append(system)
+        return system
+
+    yield factory
+    for system in systems:
+        try:
+            system.close()
+        except Exception:
+            pass
+
+
+@pytest.fixture
+def memory(make_memory) -> FantasyMemorySystem:
+    return make_memory()
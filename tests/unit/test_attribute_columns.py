@@ -0,0 +1,67 @@
+"""Indexed attribute columns: generated from the JSON and used by filters."""
+
+import pytest
+
+from memory_system import INDEXED_ATTRIBUTES
+
+
+@pytest.fixture
+def memory(memory):
+    if not memory.indexed_attributes:
+        pytest.skip("SQLite build without generated columns")
+    return memory
+
+
+def query_plan(memory, sql, params):
+    with memory.db.read() as conn:
+        return ' '.join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+
+
+def test_every_key_gets_a_column(memory):
+    assert memory.indexed_attributes == INDEXED_ATTRIBUTES
+    memory_id = memory.store_memory("Grukk the orc warlord", "character", name="Grukk",
+                                    attributes={'race': "Orc", 'role': "warlord", 'danger_level': 9})
+    with memory.db.read() as conn:
+        row = conn.execute("SELECT attr_race, attr_role, attr_location, attr_danger_level FROM memories "
+                           "WHERE id = ?", (memory_id,)).fetchone()
+    assert row == ("Orc", "warlord", None, "9")
+
+
+def test_filter_uses_the_index(memory):
+    where, params = memory._filter_clause("character", {'race': "Orc"})
+    plan = query_plan(memory, f"SELECT id FROM memories WHERE {where}", params)
+    assert "idx_memories_attr_race" in plan
+
+
+def test_numeric_values_match_as_text_or_number(memory):
+    memory.store_memory("A wyvern nest", "location", name="Nest", attributes={'danger_level': 7})
+    assert len(memory.find_memories(attributes={'danger_level': 7})) == 1
+    assert len(memory.find_memories(attributes={'danger_level': "7"})) == 1
+
+
+def test_columns_are_added_to_existing_databases(make_memory):
+    memory = make_memory()
+    memory.store_memory("Lira the bard", "character", name="Lira", attributes={'race': "Human"})
+    with memory.db.write() as conn:
+        for key in INDEXED_ATTRIBUTES:
+            conn.execute(f"DROP INDEX idx_memories_attr_{key}")
+            conn.execute(f"ALTER TABLE memories DROP COLUMN attr_{key}")
+    memory.close()
+
+    reopened = make_memory()
+    assert [record['name'] for record in reopened.find_memories(attributes={'race': "Human"})] == ["Lira"]
+
+
+@pytest.mark.parametrize("indexed", [True, False])
+def test_numeric_attributes_match_string_filters(memory, indexed):
+    if not indexed:
+        memory.indexed_attributes = ()  # The json_extract fallback must behave the same
+    memory.store_memory("A wyvern nest", "location", name="Nest", attributes={'danger_level': 7, 'level': 5})
+    memory.store_memory("A quiet glade", "location", name="Glade", attributes={'danger_level': "2", 'level': "3"})
+
+    # Web filters arrive as strings
+    assert [record['name'] for record in memory.find_memories(attributes={'level': "5"})] == ["Nest"]
+    assert [record['name'] for record in memory.find_memories(attributes={'level': 3})] == ["Glade"]
+    assert [record['name'] for record in memory.find_memories(attributes={'danger_level': "7"})] == ["Nest"]
+    results = memory.retrieve_relevant_memories("wyvern nest", attributes={'level': "5"})
+    assert [record['name'] for record in results] == ["Nest"]
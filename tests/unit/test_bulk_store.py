@@ -0,0 +1,51 @@
+"""Bulk store_memories: batched encoding and ordered ids."""
+
+
+def records(count, prefix="event"):
+    return [{'content': f"{prefix} {i} word{i}", 'memory_type': 'event', 'importance': 1 + i % 10}
+            for i in range(count)]
+
+
+def test_ids_are_returned_in_input_order(memory):
+    ids = memory.store_memories(records(25))
+
+    with memory.db.read() as conn:
+        content = dict(conn.execute("SELECT id, content FROM memories"))
+    assert len(set(ids)) == 25
+    assert [content[memory_id] for memory_id in ids] == [f"event {i} word{i}" for i in range(25)]
+
+
+def test_one_encode_call_per_batch(memory, embedder):
+    memory.store_memories(records(25), batch_size=10)
+    assert embedder.calls == 3
+    assert memory.last_bulk_stats['memories'] == 25
+
+
+def test_fields_are_stored(memory):
+    (memory_id,) = memory.store_memories([{'content': "Elara guards the forest", 'memory_type': 'character',
+                                           'name': "Elara", 'attributes': {'race': "Elf"},
+                                           'importance': 8, 'context': "chapter one"}])
+
+    with memory.db.read() as conn:
+        row = conn.execute("SELECT type, name, importance, context FROM memories WHERE id = ?",
+                           (memory_id,)).fetchone()
+    assert row == ('character', "Elara", 8, "chapter one")
+    assert memory.find_memories(attributes={'race': "Elf"})[0].id == memory_id
+
+
+def test_bulk_memories_are_searchable(memory):
+    memory.store_memories([dict(record, importance=5) for record in records(50)])
+    results = memory.retrieve_relevant_memories("event word42", limit=1)
+    assert results[0]['content'] == "event 42 word42"
+
+
+def test_inside_a_unit_of_work_nothing_is_written_until_exit(memory, embedder):
+    with memory.unit_of_work():
+        memory.store_memories(records(5))
+        memory.store_memory("One more", "event")
+        with memory.db.read() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM memories").fetchone()[0] == 0
+
+    with memory.db.read() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM memories").fetchone()[0] == 6
+    assert embedder.calls == 1
@@ -0,0 +1,102 @@
+"""Background consolidation of similar event memories."""
+
+import threading
+
+from consolidation import MemoryConsolidator
+
+RAID = "the goblin raiders attacked the caravan near the river crossing at night"
+
+
+def store_raid_cluster(memory, suffixes=("alpha", "beta", "gamma", "delta")):
+    return memory.store_memories([{'content': f"{RAID} {suffix}", 'memory_type': 'event'} for suffix in suffixes])
+
+
+def test_cluster_is_replaced_by_summary(memory):
+    raid_ids = store_raid_cluster(memory)
+    other_ids = memory.store_memories([{'content': content, 'memory_type': 'event'} for content in
+                                       ("a merchant sold silk", "snow fell on the peaks", "the king held court")])
+    consolidator = MemoryConsolidator(memory, similarity_threshold=0.8)
+
+    stats = consolidator.run_once()
+
+    assert stats['clusters'] == 1 and stats['archived'] == len(raid_ids)
+    summary_id = stats['summaries'][0]
+    assert sorted(record.id for record in memory.get_consolidated_sources(summary_id)) == sorted(raid_ids)
+    retrieved = [record.id for record in memory.retrieve_relevant_memories(RAID, limit=10)]
+    assert summary_id in retrieved
+    assert not set(raid_ids) & set(retrieved)
+    assert set(other_ids) <= set(retrieved)
+
+
+def test_runs_are_incremental(memory):
+    store_raid_cluster(memory)
+    consolidator = MemoryConsolidator(memory, similarity_threshold=0.8)
+    first = consolidator.run_once()
+    consolidator.run_once()  # Examines the summary stored by the first run
+
+    assert first['examined'] == 4
+    assert consolidator.run_once()['examined'] == 0
+    store_raid_cluster(memory, ("epsilon",))
+    assert consolidator.run_once()['examined'] == 1
+
+
+def test_other_types_are_left_alone(memory):
+    memory.store_memories([{'content': f"{RAID} {suffix}", 'memory_type': 'character', 'name': suffix}
+                           for suffix in ("alpha", "beta", "gamma")])
+    assert MemoryConsolidator(memory, similarity_threshold=0.8).run_once()['clusters'] == 0
+
+
+def test_consolidation_thread_and_chat_writes_do_not_interfere(memory):
+    memory.retrieve_relevant_memories("warm up the index", limit=1)
+    consolidator = MemoryConsolidator(memory, similarity_threshold=0.8, min_cluster_size=2)
+    stop = threading.Event()
+    errors = []
+
+    def consolidate():
+        try:
+            while not stop.is_set():
+                consolidator.run_once()
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=consolidate)
+    thread.start()
+    try:
+        for turn in range(40):
+            with memory.unit_of_work():
+                memory.store_memory(f"{RAID} turn{turn}", "event")
+                memory.store_memory(f"the bard sang song number {turn} to the crowd", "dialogue")
+                memory.store_conversation("session", f"turn {turn}", "response")
+    finally:
+        stop.set()
+        thread.join()
+    consolidator.run_once()
+
+    assert not errors
+    assert memory.verify_embedding_store(deep=True)['consistent']
+    with memory.db.read() as conn:
+        active = {row[0] for row in conn.execute("SELECT id FROM memories WHERE status = 'active'")}
+    memory.retrieve_relevant_memories("anything", limit=1)
+    assert set(memory._index.ids) == active
+
+
+def test_archived_memories_leave_the_index_of_another_instance(make_memory):
+    reader = make_memory()
+    raid_ids = store_raid_cluster(reader)
+    assert len(reader.retrieve_relevant_memories(RAID, limit=10)) == len(raid_ids)
+
+    stats = MemoryConsolidator(make_memory(), similarity_threshold=0.8).run_once()
+
+    retrieved = [record.id for record in reader.retrieve_relevant_memories(RAID, limit=10)]
+    assert retrieved == stats['summaries']
+
+
+def test_stale_index_hits_are_not_returned(memory):
+    raid_ids = store_raid_cluster(memory)
+    memory.retrieve_relevant_memories(RAID, limit=10)
+    # Written on our own connection, so the resident index does not notice
+    with memory.db.write() as conn:
+        conn.execute("UPDATE memories SET status = 'archived' WHERE id = ?", (raid_ids[0],))
+
+    retrieved = [record.id for record in memory.retrieve_relevant_memories(RAID, limit=10)]
+    assert sorted(retrieved) == sorted(raid_ids[1:])
@@ -0,0 +1,89 @@
+"""conversation_memories join table: backfill, writes and usage analytics."""
+
+import json
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+
+def test_backfill_from_retrieved_memories_json(make_memory, tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "world.db"))
+    conn.execute('''
+        CREATE TABLE conversations (
+            id TEXT PRIMARY KEY, session_id TEXT NOT NULL, user_input TEXT NOT NULL,
+            ai_response TEXT NOT NULL, retrieved_memories TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.executemany('INSERT INTO conversations (id, session_id, user_input, ai_response, retrieved_memories) '
+                     'VALUES (?, ?, ?, ?, ?)',
+                     [('c1', 's', 'u', 'a', json.dumps(['m1', 'm2'])), ('c2', 's', 'u', 'a', 'not json'),
+                      ('c3', 's', 'u', 'a', None)])
+    conn.commit()
+    conn.close()
+
+    memory = make_memory()
+    with memory.db.read() as conn:
+        links = conn.execute('SELECT conversation_id, memory_id, rank, rank_score FROM conversation_memories '
+                             'ORDER BY conversation_id, rank').fetchall()
+    assert links == [('c1', 'm1', 1, None), ('c1', 'm2', 2, None)]
+
+    memory.close()
+    reopened = make_memory()
+    with reopened.db.read() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM conversation_memories').fetchone()[0] == 2
+
+
+def test_usage_and_most_used(memory):
+    ids = memory.store_memories([{'content': f"memory {i}", 'memory_type': 'event', 'name': f"m{i}"}
+                                 for i in range(3)])
+    memory.store_conversation('s1', 'first', 'a', [ids[0], ids[1]], [0.9, None])
+    with memory.unit_of_work():
+        memory.store_conversation('s2', 'second', 'a', [ids[0]])
+    memory.store_conversation('s1', 'third', 'a')
+
+    usage = memory.get_memory_usage(ids[0])
+    assert [(turn['user_input'], turn['rank'], turn['rank_score']) for turn in usage] == \
+        [('second', 1, None), ('first', 1, 0.9)]
+    assert [turn['user_input'] for turn in memory.get_memory_usage(ids[0], session_id='s1')] == ['first']
+
+    week_ago = datetime.now(timezone.utc) - timedelta(days=7)
+    top = memory.get_most_used_memories(since=week_ago)
+    assert [(record.name, record['uses'], record['avg_rank']) for record in top] == [('m0', 2, 1.0), ('m1', 1, 2.0)]
+    assert [record.name for record in memory.get_most_used_memories(session_id='s2')] == ['m0']
+    assert memory.get_most_used_memories(since=datetime.now(timezone.utc) + timedelta(days=1)) == []
+
+
+def test_most_used_range_is_half_open(memory):
+    (memory_id,) = memory.store_memories([{'content': "the boundary turn", 'memory_type': 'event'}])
+    memory.store_conversation('s1', 'boundary', 'a', [memory_id])
+    with memory.db.write() as conn:
+        conn.execute("UPDATE conversations SET timestamp = '2024-01-01 12:00:00'")
+
+    boundary = datetime(2024, 1, 1, 12)
+    assert [record.id for record in memory.get_most_used_memories(since=boundary)] == [memory_id]
+    assert memory.get_most_used_memories(until=boundary) == []
+    assert len(memory.get_most_used_memories(since=boundary, until=boundary + timedelta(seconds=1))) == 1
+
+
+def test_scores_must_match_ids(memory):
+    with pytest.raises(ValueError):
+        memory.store_conversation('s', 'u', 'a', ['m1'], [0.1, 0.2])
+
+
+def test_analytics_queries_use_indexes(memory):
+    with memory.db.read() as conn:
+        plan = [row[3] for row in conn.execute('''
+            EXPLAIN QUERY PLAN
+            SELECT c.id FROM conversation_memories cm JOIN conversations c ON c.id = cm.conversation_id
+            WHERE cm.memory_id = ?
+        ''', ('m1',))]
+        assert any('idx_conversation_memories_memory' in step for step in plan)
+        plan = [row[3] for row in conn.execute('''
+            EXPLAIN QUERY PLAN
+            SELECT cm.memory_id, COUNT(*) FROM conversations c
+            CROSS JOIN conversation_memories cm ON cm.conversation_id = c.id
+            WHERE c.timestamp >= ? GROUP BY cm.memory_id
+        ''', ('2020-01-01',))]
+        assert any('idx_conversations_timestamp' in step for step in plan)
@@ -0,0 +1,57 @@
+"""Keyset-paginated conversation history."""
+
+import pytest
+
+
+@pytest.fixture
+def session(memory):
+    with memory.unit_of_work():
+        for i in range(25):
+            memory.store_conversation("s1", f"question {i}", f"answer {i}")
+            memory.store_conversation("s2", f"other {i}", f"reply {i}")
+    return memory
+
+
+def inputs(records):
+    return [record['user_input'] for record in records]
+
+
+def test_recent_history_is_chronological(session):
+    assert inputs(session.get_conversation_history("s1", limit=3)) == ["question 22", "question 23", "question 24"]
+
+
+def test_before_cursor_walks_backwards_without_gaps(session):
+    seen = []
+    page = session.get_conversation_history("s1", limit=4)
+    while page:
+        seen = inputs(page) + seen
+        page = session.get_conversation_history("s1", limit=4, before=page[0].cursor)
+    # All rows share one timestamp, so the rowid tiebreak is what keeps pages apart
+    assert seen == [f"question {i}" for i in range(25)]
+
+
+def test_pages_continue_after_the_cursor(session):
+    first = session.get_conversation_page("s1", limit=10)
+    second = session.get_conversation_page("s1", after=first[-1].cursor, limit=10)
+    assert inputs(first + second) == [f"question {i}" for i in range(20)]
+
+
+def test_iterate_whole_session(session):
+    assert inputs(session.iter_conversation_history("s1", page_size=7)) == [f"question {i}" for i in range(25)]
+    assert inputs(session.iter_conversation_history("missing")) == []
+
+
+@pytest.mark.parametrize("cursor", ["", "no-separator", "2024-01-01 00:00:00|abc", "|5"])
+def test_malformed_cursors_are_rejected(session, cursor):
+    with pytest.raises(ValueError):
+        session.get_conversation_page("s1", after=cursor)
+    with pytest.raises(ValueError):
+        session.get_conversation_history("s1", before=cursor)
+
+
+def test_pagination_uses_the_composite_index(session):
+    with session.db.read() as conn:
+        plan = ' '.join(row[-1] for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT rowid FROM conversations WHERE session_id = ? "
+            "AND (timestamp, rowid) > (?, ?) ORDER BY timestamp, rowid LIMIT 10", ("s1", "2024", 1)))
+    assert "idx_conversations_session_time" in plan and "TEMP B-TREE" not in plan
@@ -0,0 +1,70 @@
+"""SQLite connection manager."""
+
+import sqlite3
+import threading
+import time
+
+from database import SQLiteConnectionManager
+
+
+def test_reads_proceed_during_a_write(tmp_path):
+    db = SQLiteConnectionManager(str(tmp_path / "test.db"))
+    with db.write() as conn:
+        conn.execute('CREATE TABLE t (x INTEGER)')
+        conn.execute('INSERT INTO t VALUES (1)')
+    writing, release = threading.Event(), threading.Event()
+
+    def writer():
+        with db.write() as conn:
+            conn.execute('INSERT INTO t VALUES (2)')
+            writing.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        writing.wait(5)
+        start = time.perf_counter()
+        with db.read() as conn:
+            assert conn.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 1  # Uncommitted row not visible
+        db.data_version()
+        assert time.perf_counter() - start < 1.0
+    finally:
+        release.set()
+        thread.join()
+    db.close()
+
+
+def test_data_version_only_tracks_other_connections(tmp_path):
+    path = str(tmp_path / "test.db")
+    db = SQLiteConnectionManager(path)
+    with db.write() as conn:
+        conn.execute('CREATE TABLE t (x INTEGER)')
+    version = db.data_version()
+    with db.write() as conn:
+        conn.execute('INSERT INTO t VALUES (1)')
+    assert db.data_version() == version
+
+    other = sqlite3.connect(path)
+    other.execute('INSERT INTO t VALUES (2)')
+    other.commit()
+    other.close()
+    assert db.data_version() != version
+    db.close()
+
+
+def test_nested_writes_commit_once_and_roll_back_together(tmp_path):
+    db = SQLiteConnectionManager(str(tmp_path / "test.db"))
+    with db.write() as conn:
+        conn.execute('CREATE TABLE t (x INTEGER)')
+    try:
+        with db.write() as conn:
+            conn.execute('INSERT INTO t VALUES (1)')
+            with db.write() as inner:
+                inner.execute('INSERT INTO t VALUES (2)')
+            raise RuntimeError("abort the turn")
+    except RuntimeError:
+        pass
+    with db.read() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 0
+    db.close()
@@ -0,0 +1,66 @@
+"""Content-hash embedding cache: LRU tier, shared disk tier and keying."""
+
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+
+
+def test_repeated_texts_hit_the_lru(embedder):
+    cache = EmbeddingCache(embedder, "model")
+
+    first = cache.encode(["the dragon", "the ranger"])
+    second = cache.encode(["the ranger", "the dragon"])
+
+    assert embedder.calls == 1
+    np.testing.assert_array_equal(second, first[::-1])
+    assert cache.stats()['hits'] == 2 and cache.stats()['misses'] == 2
+
+
+def test_duplicates_in_one_call_are_encoded_once(embedder):
+    cache = EmbeddingCache(embedder, "model")
+    vectors = cache.encode(["the dragon", "the dragon", "  the   dragon "])
+    assert embedder.calls == 1 and cache.stats()['entries'] == 1
+    np.testing.assert_array_equal(vectors[0], vectors[2])
+
+
+def test_lru_evicts_least_recently_used(embedder):
+    cache = EmbeddingCache(embedder, "model", max_entries=2)
+    cache.encode(["a"])
+    cache.encode(["b"])
+    cache.encode(["a"])  # b is now the least recently used
+    cache.encode(["c"])
+
+    calls = embedder.calls
+    cache.encode(["a"])
+    assert embedder.calls == calls
+    cache.encode(["b"])
+    assert embedder.calls == calls + 1
+
+
+def test_disk_tier_is_shared_between_caches(tmp_path, embedder):
+    path = str(tmp_path / "cache.db")
+    first = EmbeddingCache(type(embedder)(), "model", disk_path=path)
+    expected = first.encode(["the dragon"])
+    first.close()
+
+    second = EmbeddingCache(embedder, "model", disk_path=path)
+    np.testing.assert_array_equal(second.encode(["the dragon"]), expected)
+    assert embedder.calls == 0 and second.stats()['disk_hits'] == 1
+    second.close()
+
+
+def test_model_name_is_part_of_the_key(tmp_path, embedder):
+    path = str(tmp_path / "cache.db")
+    EmbeddingCache(type(embedder)(), "model-a", disk_path=path).encode(["the dragon"])
+
+    EmbeddingCache(embedder, "model-b", disk_path=path).encode(["the dragon"])
+    assert embedder.calls == 1
+
+
+def test_memory_system_reuses_embeddings_for_repeated_queries(memory, embedder):
+    memory.store_memory("The dragon sleeps under the mountain", "event")
+    calls = embedder.calls
+    memory.retrieve_relevant_memories("dragon", limit=1)
+    memory.retrieve_relevant_memories("dragon", limit=1)
+    assert embedder.calls == calls + 1
+    assert memory.get_embedding_cache_stats()['hits'] >= 1
@@ -0,0 +1,106 @@
+"""Embedding sidecar: concurrent appends and startup repair."""
+
+import os
+import threading
+
+import numpy as np
+
+from embedding_store import HEADER_SIZE, EmbeddingSidecar
+
+
+def test_concurrent_appends_get_distinct_rows(tmp_path):
+    store = EmbeddingSidecar(str(tmp_path / "world.vectors"))
+    threads, batches, per_thread, dim = 8, 300, 50, 16
+    results = []
+    results_lock = threading.Lock()
+
+    def worker(thread_id):
+        for batch in range(batches):
+            value = thread_id * batches + batch
+            first_row = store.append(np.full((per_thread, dim), value, dtype=np.float32))
+            with results_lock:
+                results.append((first_row, value))
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    assert store.rows == threads * batches * per_thread
+    assert sorted(first_row for first_row, _ in results) == list(range(0, store.rows, per_thread))
+    vectors = store.view()
+    for first_row, value in results:
+        assert (vectors[first_row:first_row + per_thread] == value).all()
+
+
+def test_partial_trailing_vector_is_dropped(tmp_path):
+    path = str(tmp_path / "world.vectors")
+    store = EmbeddingSidecar(path)
+    store.append(np.ones((2, 4), dtype=np.float32))
+    with open(path, "ab") as f:
+        f.write(b"\1\2\3")  # Torn write
+    assert store.append(np.full((1, 4), 2.0, dtype=np.float32)) == 2
+    assert os.path.getsize(path) == HEADER_SIZE + 3 * 16
+    assert (store.view()[2] == 2.0).all()
+
+
+def test_concurrent_flushes_keep_row_pointers_consistent(make_memory):
+    memory = make_memory()
+    errors = []
+
+    def worker(thread_id):
+        try:
+            for batch in range(10):
+                memory.store_memories([{'content': f"thread{thread_id} batch{batch} item{i}", 'memory_type': 'event'}
+                                       for i in range(5)])
+        except Exception as e:
+            errors.append(e)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(6)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    assert not errors
+    report = memory.verify_embedding_store(deep=True)
+    assert report['memories'] == 300
+    assert report['consistent'], report
+
+
+def test_deleted_sidecar_is_rebuilt(make_memory, tmp_path):
+    memory = make_memory()
+    memory.store_memories([{'content': f"memory number {i}", 'memory_type': 'event'} for i in range(10)])
+    memory.close()
+    os.remove(tmp_path / "world.vectors")
+
+    reopened = make_memory()
+    results = reopened.retrieve_relevant_memories("memory number 3", limit=1)
+    assert results[0]['content'] == "memory number 3"
+    assert reopened.verify_embedding_store(deep=True)['consistent']
+
+
+def test_truncated_sidecar_is_rebuilt(make_memory, tmp_path):
+    memory = make_memory()
+    memory.store_memories([{'content': f"memory number {i}", 'memory_type': 'event'} for i in range(10)])
+    memory.close()
+    path = tmp_path / "world.vectors"
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) // 2)
+
+    reopened = make_memory()
+    assert reopened.retrieve_relevant_memories("memory number 9", limit=1)[0]['content'] == "memory number 9"
+    assert reopened.embedding_store.rows == 10
+
+
+def test_verify_detects_and_repair_fixes_corrupt_vectors(memory):
+    memory.store_memories([{'content': f"memory number {i}", 'memory_type': 'event'} for i in range(4)])
+    with open(memory.embedding_store.path, "r+b") as f:
+        f.seek(HEADER_SIZE)
+        f.write(np.zeros(memory.embedding_store.dim, dtype=np.float32).tobytes())
+    report = memory.verify_embedding_store(deep=True)
+    assert report['mismatched'] == 1 and not report['consistent']
+
+    memory.repair_embedding_store()
+    assert memory.verify_embedding_store(deep=True)['consistent']
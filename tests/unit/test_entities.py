@@ -0,0 +1,50 @@
+"""Normalized entity-name index behind auto_extract_memories()."""
+
+import sqlite3
+
+from extraction import Candidate
+
+
+def test_names_are_matched_after_normalization(memory):
+    thorin = memory.store_memory("Thorin the dwarf", "character", "Thorin")
+    assert memory.find_entity("character", "  THORIN ") == thorin
+    assert memory.find_entity("location", "Thorin") is None
+
+
+def test_repeated_mentions_are_stored_once(memory):
+    memory.store_memory("Thorin the dwarf", "character", "Thorin")
+    first = memory.auto_extract_memories("I meet Gandalf and THORIN near the old tavern", "Gandalf nods")
+    again = memory.auto_extract_memories("I meet Gandalf and THORIN near the old tavern", "Gandalf nods")
+
+    assert len(first) == 2  # Gandalf and the tavern; Thorin already exists
+    assert again == []
+    assert memory.get_memory_stats()['by_type'] == {'character': 2, 'location': 1}
+
+
+def test_buffered_entities_are_visible_inside_a_unit_of_work(memory):
+    with memory.unit_of_work():
+        memory.store_candidates([Candidate('character', "Eldara", "Eldara is mentioned")], entity_types=('character',))
+        assert memory.find_entity("character", "eldara") is not None
+        assert memory.store_candidates([Candidate('character', "ELDARA", "Eldara again")],
+                                       entity_types=('character',)) == []
+
+
+def test_entities_written_by_another_process_are_seen(make_memory):
+    memory = make_memory()
+    assert memory.find_entity("character", "Zed") is None
+    other = make_memory()
+    other.store_memory("Zed the rogue", "character", "Zed")
+    assert memory.find_entity("character", "zed") is not None
+
+
+def test_name_keys_are_backfilled_for_older_databases(make_memory, tmp_path):
+    memory = make_memory()
+    memory.store_memory("Gandalf the grey", "character", "Gandalf")
+    memory.close()
+    conn = sqlite3.connect(str(tmp_path / "world.db"))
+    conn.execute("DROP INDEX idx_memories_name_key")
+    conn.execute("ALTER TABLE memories DROP COLUMN name_key")
+    conn.commit()
+    conn.close()
+
+    assert make_memory().find_entity("character", "GANDALF") is not None
@@ -0,0 +1,110 @@
+"""Single-pass extraction: the Aho-Corasick automaton and the extractor pipelines."""
+
+import random
+
+import pytest
+
+from extraction import (Candidate, ExtractionPipeline, KeywordAutomaton, PlotIndicatorExtractor,
+                        ProperNounExtractor, build_mention_pipeline, build_narrative_pipeline)
+
+
+def brute_force(keywords, text):
+    lowered = text.lower()
+    return sorted((start, start + len(keyword), index) for index, keyword in enumerate(keywords)
+                  for start in range(len(text)) if lowered.startswith(keyword, start))
+
+
+def test_overlapping_keywords_match_like_a_brute_force_scan():
+    keywords = ["he", "she", "his", "hers", "h", "ushe", "e"]
+    automaton = KeywordAutomaton(keywords)
+    rng = random.Random(0)
+    for _ in range(200):
+        text = ''.join(rng.choice("hesuirHS ") for _ in range(rng.randrange(40)))
+        assert sorted(automaton.find_all(text)) == brute_force(keywords, text)
+
+
+def test_matches_are_ordered_by_end_offset():
+    automaton = KeywordAutomaton(["the next day", "next", "day"])
+    ends = [end for _, end, _ in automaton.find_all("On THE NEXT DAY they left")]
+    assert ends == sorted(ends) and len(ends) == 3
+
+
+def test_offsets_stay_aligned_with_multi_char_lowercase():
+    # "İ" lowercases to two characters; offsets must still index the original text
+    text = "İstanbul inn"
+    (start, end, _), = KeywordAutomaton(["inn"]).find_all(text)
+    assert text[start:end] == "inn"
+
+
+def test_keywords_added_after_a_search_are_found():
+    automaton = KeywordAutomaton(["inn"])
+    list(automaton.find_all("an inn"))
+    automaton.add("tavern")
+    assert [automaton.keywords[index] for _, _, index in automaton.find_all("inn and tavern")] == ["inn", "tavern"]
+    with pytest.raises(ValueError):
+        automaton.add("")
+
+
+def test_triggers_only_fire_on_word_boundaries():
+    pipeline = build_mention_pipeline()
+    assert [c for c in pipeline.extract("we ate dinner by the lakeside") if c.memory_type == 'location'] == []
+    assert Candidate('location', "Old Inn", "old inn is mentioned in the story", 5) in pipeline.extract("the old inn")
+
+
+def test_mention_pipeline():
+    candidates = build_mention_pipeline().extract(
+        "Thorin and Elara reach the dark forest. Suddenly Grimbold and Vex appear.")
+
+    characters = [c.name for c in candidates if c.memory_type == 'character']
+    assert characters == ["Thorin", "Elara", "Suddenly"]  # capped at three per text
+    assert [c.name for c in candidates if c.memory_type == 'location'] == ["Dark Forest"]
+    assert len([c for c in candidates if c.memory_type == 'event']) == 1
+
+
+def test_narrative_pipeline():
+    candidates = build_narrative_pipeline().extract(
+        "You meet Old Tom, a grizzled fisherman. You enter the Whispering Pines, dark and cold.\n"
+        "You find a Silver dagger, glowing faintly. Item: Moonstone - a pale gem.")
+
+    found = {(c.memory_type, c.name) for c in candidates}
+    assert ('character', "Old Tom") in found
+    assert ('location', "Whispering Pines") in found
+    assert ('item', "Silver dagger") in found
+    assert ('item', "Moonstone") in found
+    assert next(c for c in candidates if c.name == "Old Tom").content == "Old Tom: a grizzled fisherman"
+
+
+def test_duplicates_are_dropped_and_limits_apply():
+    pipeline = (ExtractionPipeline()
+                .register(ProperNounExtractor("character", limit=2))
+                .register(PlotIndicatorExtractor("event", ["suddenly", "meanwhile"])))
+    candidates = pipeline.extract("Aria, Bram and Cole. Suddenly it rained. Meanwhile, Aria slept.")
+
+    assert [c.name for c in candidates if c.memory_type == 'character'] == ["Aria", "Bram"]
+    assert pipeline.extract("Aria met Aria") == [Candidate("character", "Aria", "Aria is mentioned in the story")]
+    assert len([c for c in candidates if c.memory_type == 'event']) == 1
+
+
+def test_pipeline_recompiles_after_register():
+    pipeline = ExtractionPipeline().register(PlotIndicatorExtractor("event", ["suddenly"]))
+    assert pipeline.extract("meanwhile, rain") == []
+    pipeline.register(PlotIndicatorExtractor("event", ["meanwhile"]))
+    assert len(pipeline.extract("meanwhile, rain")) == 1
+
+
+def test_triggers_match_in_any_case():
+    narrative = build_narrative_pipeline().extract("YOU MEET Mira, a healer. SUDDENLY the lights fade.")
+    assert ('character', "Mira") in {(c.memory_type, c.name) for c in narrative}
+    assert any(c.memory_type == 'event' and c.content == "the lights fade" for c in narrative)
+
+    mentions = build_mention_pipeline().extract("They rest at the OLD TAVERN. MEANWHILE it rains.")
+    assert [c.name for c in mentions if c.memory_type == 'location'] == ["Old Tavern"]
+    assert len([c for c in mentions if c.memory_type == 'event']) == 1
+
+
+def test_names_must_be_capitalized():
+    # The legacy re.IGNORECASE patterns stored "The door" and "old man" as characters here
+    candidates = build_narrative_pipeline().extract("The door is locked. You see the old man, tired.\n")
+    assert [c for c in candidates if c.memory_type == 'character'] == []
+    assert [c.name for c in build_narrative_pipeline().extract("Mira is a healer.")
+            if c.memory_type == 'character'] == ["Mira"]
@@ -0,0 +1,51 @@
+"""Filtered vector retrieval: type, attribute and time filters are applied before ranking."""
+
+from datetime import datetime, timezone
+
+import pytest
+
+
+@pytest.fixture
+def world(memory):
+    # Many strong event matches would crowd out the characters if filters ran after ranking
+    memory.store_memories([{'content': f"dragon attack number {i} on the dragon keep", 'memory_type': 'event',
+                            'importance': 10} for i in range(30)])
+    memory.store_memory("Vel the elf tames a dragon", "character", name="Vel",
+                        attributes={'race': "Elf", 'title': "tamer"}, importance=2)
+    memory.store_memory("Brom the dwarf fears any dragon", "character", name="Brom",
+                        attributes={'race': "Dwarf", 'title': "smith"}, importance=2)
+    return memory
+
+
+def names(records):
+    return sorted(record['name'] for record in records)
+
+
+@pytest.mark.parametrize("mode", ["vector", "hybrid"])
+def test_type_filter_returns_low_ranked_matches(world, mode):
+    results = world.retrieve_relevant_memories("dragon", limit=2, memory_type="character", mode=mode)
+    assert names(results) == ["Brom", "Vel"]
+
+
+@pytest.mark.parametrize("mode", ["vector", "hybrid"])
+def test_indexed_and_plain_attribute_filters(world, mode):
+    # race is an indexed column, title goes through json_extract
+    assert names(world.retrieve_relevant_memories("dragon", attributes={'race': "Elf"}, mode=mode)) == ["Vel"]
+    assert names(world.retrieve_relevant_memories("dragon", attributes={'title': "smith"}, mode=mode)) == ["Brom"]
+    assert world.retrieve_relevant_memories("dragon", attributes={'race': "Orc"}, mode=mode) == []
+
+
+def test_time_range_filter(world):
+    with world.db.write() as conn:
+        conn.execute("UPDATE memories SET timestamp = '2020-01-01 00:00:00' WHERE name = 'Vel'")
+
+    old = world.retrieve_relevant_memories("dragon", limit=5, until=datetime(2021, 1, 1, tzinfo=timezone.utc))
+    assert names(old) == ["Vel"]
+    recent = world.retrieve_relevant_memories("dragon", limit=50, memory_type="character", since="2021-01-01 00:00:00")
+    assert names(recent) == ["Brom"]
+
+
+def test_find_memories_lists_without_a_query(world):
+    assert names(world.find_memories(memory_type="character")) == ["Brom", "Vel"]
+    assert names(world.find_memories(attributes={'race': "Dwarf"})) == ["Brom"]
+    assert len(world.find_memories(memory_type="event", limit=5)) == 5
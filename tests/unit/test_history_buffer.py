@@ -0,0 +1,62 @@
+"""Per-session ring buffer of recent exchanges in FantasyChatbot."""
+
+import sqlite3
+import uuid
+
+import pytest
+
+pytest.importorskip("local_llm")
+import fantasy_chatbot  # noqa: E402
+
+
+class ScriptedLLM:
+    def __init__(self, model_name):
+        self.model_name = model_name
+
+    def generate_response(self, user_input, **kwargs):
+        return f"The world answers: {user_input}"
+
+    def get_memory_usage(self):
+        return {}
+
+
+@pytest.fixture
+def chatbot(tmp_path, embedder, monkeypatch):
+    monkeypatch.setattr(fantasy_chatbot, "LocalFantasyLLM", ScriptedLLM)
+    bot = fantasy_chatbot.FantasyChatbot(session_id="s", model_name="scripted",
+                                         memory_db_path=str(tmp_path / "world.db"), history_buffer_size=5)
+    yield bot
+    bot.memory_system.close()
+
+
+def insert_external_exchange(path, session_id, user_input):
+    conn = sqlite3.connect(path)
+    conn.execute('INSERT INTO conversations (id, session_id, user_input, ai_response) VALUES (?, ?, ?, ?)',
+                 (str(uuid.uuid4()), session_id, user_input, "external"))
+    conn.commit()
+    conn.close()
+
+
+def test_chat_turns_fill_the_buffer(chatbot):
+    for turn in range(7):
+        chatbot.chat(f"turn {turn}")
+    assert [record['user_input'] for record in chatbot._recent_history("s", 10)] == \
+        [f"turn {turn}" for turn in range(2, 7)]
+
+
+def test_other_process_writes_are_picked_up(chatbot, tmp_path):
+    chatbot.chat("turn 0")
+    chatbot._recent_history("s", 5)
+    insert_external_exchange(str(tmp_path / "world.db"), "s", "from elsewhere")
+    assert chatbot._recent_history("s", 5)[-1]['user_input'] == "from elsewhere"
+
+
+def test_exchange_loaded_by_a_refresh_is_not_appended_twice(chatbot, tmp_path):
+    chatbot._recent_history("s", 5)
+    exchange = chatbot.memory_system.store_conversation("s", "ours", "reply")
+    # Another process commits before we append, and a history read refreshes the buffer
+    insert_external_exchange(str(tmp_path / "world.db"), "s", "theirs")
+    chatbot._recent_history("s", 5)
+    chatbot._remember_exchange("s", exchange)
+
+    assert [record['user_input'] for record in chatbot._recent_history("s", 5)] == ["ours", "theirs"]
@@ -0,0 +1,110 @@
+"""Retrieval tracking: hot tier admission, ranking boost and write-behind counts."""
+
+import pytest
+
+from hot_memories import HotMemoryTier
+from memory_records import MemoryRecord
+from retention import RetentionPolicy
+
+
+def record(memory_id):
+    return MemoryRecord((memory_id, "event", None, f"content {memory_id}", None, 5, None))
+
+
+def retrieval_count(memory, memory_id):
+    with memory.db.read() as conn:
+        return conn.execute("SELECT retrieval_count FROM memories WHERE id = ?", (memory_id,)).fetchone()[0]
+
+
+def test_admission_needs_min_hits_and_displaces_the_coldest():
+    tier = HotMemoryTier(capacity=2, min_hits=2)
+    tier.record(["a"], "t")
+    tier.offer(record("a"))
+    assert "a" not in tier
+
+    tier.record(["a", "b", "c", "a", "b", "c", "c"], "t")
+    for memory_id in "abc":
+        tier.offer(record(memory_id))
+    # a and b (3 and 2 hits) filled the tier; c (3 hits) displaced b
+    assert "a" in tier and "c" in tier and "b" not in tier
+    assert tier.get("a")['content'] == "content a" and tier.get("b") is None
+    assert tier.stats()['served'] == 1 and tier.stats()['missed'] == 1
+
+
+def test_boost_grows_with_hits_and_saturates():
+    tier = HotMemoryTier(boost=0.1, saturation_hits=50)
+    factors = [tier.boost_factor(hits) for hits in (0, 1, 10, 50, 500)]
+    assert factors[0] == 1.0
+    assert factors == sorted(factors)
+    assert factors[3] == pytest.approx(1.1) and factors[4] == pytest.approx(1.1)
+
+
+def test_pending_counts_are_handed_off_once():
+    tier = HotMemoryTier()
+    tier.record(["a", "a", "b"], "2024-01-01 00:00:00")
+    assert sorted(tier.take_pending()) == [(1, "2024-01-01 00:00:00", "b"), (2, "2024-01-01 00:00:00", "a")]
+    assert not tier.has_pending() and tier.hits("a") == 2
+
+
+def test_frequent_memories_are_served_from_ram(memory):
+    memory_id = memory.store_memory("The dragon sleeps under the mountain", "event")
+    memory.store_memory("Merchants trade silk in the harbor", "event")
+    for _ in range(5):
+        assert memory.retrieve_relevant_memories("dragon", limit=1)[0].id == memory_id
+
+    assert memory_id in memory.hot_tier
+    assert memory.get_hot_tier_stats()['served'] >= 1
+
+
+def test_counts_are_written_behind(memory):
+    memory_id = memory.store_memory("The dragon sleeps under the mountain", "event")
+    for _ in range(3):
+        memory.retrieve_relevant_memories("dragon", limit=1)
+    assert retrieval_count(memory, memory_id) == 0
+
+    # Piggybacks on the next write
+    memory.store_memory("Merchants trade silk in the harbor", "event")
+    assert retrieval_count(memory, memory_id) == 3
+    memory.retrieve_relevant_memories("dragon", limit=1)
+    memory.flush_access_counts()
+    assert retrieval_count(memory, memory_id) == 4
+
+
+def test_counts_survive_a_restart_and_boost_ranking(make_memory):
+    memory = make_memory()
+    popular = memory.store_memory("The old king rules the northern realm", "event")
+    memory.store_memory("The old king rules the southern realm", "event")
+    for _ in range(10):
+        memory.retrieve_relevant_memories("northern king", limit=1)
+    memory.close()
+
+    reopened = make_memory()
+    results = reopened.retrieve_relevant_memories("old king rules the realm", limit=2)
+    assert reopened.hot_tier.hits(popular) == 11
+    assert results[0].id == popular and results[0]['similarity'] > results[1]['similarity']
+
+
+def test_changed_rows_leave_the_hot_tier(make_memory):
+    memory = make_memory(dedup_threshold=0.92)
+    memory_id = memory.store_memory("The dragon sleeps under the mountain", "event", importance=5)
+    for _ in range(5):
+        memory.retrieve_relevant_memories("dragon", limit=1)
+    assert memory_id in memory.hot_tier
+
+    memory.store_memory("The dragon sleeps under the mountain", "event", importance=5)
+    assert memory_id not in memory.hot_tier
+    assert memory.retrieve_relevant_memories("dragon", limit=1)[0]['importance'] == 6
+
+
+def test_hot_memories_are_not_evicted(make_memory):
+    memory = make_memory(retention_policy=RetentionPolicy(max_active=10, low_watermark=0.5))
+    favourite = memory.store_memory("The lighthouse keeper hums old songs", "event", importance=1)
+    for _ in range(5):
+        memory.retrieve_relevant_memories("lighthouse keeper", limit=1)
+    assert favourite in memory.hot_tier
+
+    memory.store_memories([{'content': f"event {i} word{i}", 'memory_type': 'event', 'importance': 10}
+                           for i in range(15)])
+    with memory.db.read() as conn:
+        assert conn.execute("SELECT status FROM memories WHERE id = ?", (favourite,)).fetchone()[0] == 'active'
+        assert conn.execute("SELECT COUNT(*) FROM memories WHERE status = 'cold'").fetchone()[0] > 0
@@ -0,0 +1,47 @@
+"""Hybrid BM25 + vector retrieval with reciprocal rank fusion."""
+
+
+def test_paraphrase_only_match_competes_with_keyword_matches(make_memory, embedder):
+    embedder.synonyms = {'blade': 'sword', 'ancient': 'old'}
+    memory = make_memory(hybrid_candidates=8)
+    # Nine keyword matches on "old" with little else in common with the query
+    memory.store_memories([{'content': f"old cart{i} barn{i} field{i} fence{i}", 'memory_type': 'event'}
+                           for i in range(9)])
+    target = memory.store_memory("ancient blade", "item", name="Heirloom")
+
+    results = memory.retrieve_relevant_memories("old sword", limit=8, mode="hybrid")
+
+    assert target in [record.id for record in results]
+
+
+def test_memories_matching_both_passes_rank_first(memory):
+    memory.store_memories([
+        {'content': "Thorin the dwarf keeps the tavern", 'memory_type': 'character', 'name': "Thorin"},
+        {'content': "a dwarf smith works the forge", 'memory_type': 'character', 'name': "Smith"},
+        {'content': "the tavern by the river", 'memory_type': 'location', 'name': "Tavern"},
+    ])
+
+    results = memory.retrieve_relevant_memories("Thorin dwarf tavern", limit=3, mode="hybrid")
+
+    assert results[0].name == "Thorin"
+    assert all(record['rrf_score'] > 0 for record in results)
+    assert [record['rrf_score'] for record in results] == sorted((record['rrf_score'] for record in results),
+                                                                 reverse=True)
+
+
+def test_prefix_keyword_match_is_found(memory):
+    memory.store_memories([{'content': f"filler memory number {i}", 'memory_type': 'event'} for i in range(20)])
+    memory.store_memory("Eldara rules from the crystal palace", "character", name="Eldara")
+
+    results = memory.retrieve_relevant_memories("elda", limit=1, mode="hybrid")
+
+    assert results[0].name == "Eldara"
+
+
+def test_filters_apply_to_both_passes(memory):
+    memory.store_memory("the dragon sleeps in the mountain", "location", name="Lair")
+    memory.store_memory("the dragon hunter", "character", name="Hunter")
+
+    results = memory.retrieve_relevant_memories("dragon", limit=5, mode="hybrid", memory_type="character")
+
+    assert [record.name for record in results] == ["Hunter"]
@@ -0,0 +1,129 @@
+"""IVF approximate index: recall against exact search, persistence and routing."""
+
+import os
+
+import numpy as np
+import pytest
+
+from vector_index import EmbeddingIndex, IVFIndex
+
+
+def clustered_index(count=2000, clusters=20, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    vectors = centers[rng.integers(0, clusters, size=count)] + 0.3 * rng.normal(size=(count, dim))
+    index = EmbeddingIndex()
+    index.add_batch([f"m{i}" for i in range(count)], vectors, [5] * count)
+    queries = centers + 0.3 * rng.normal(size=(clusters, dim))
+    return index, queries
+
+
+def test_probing_every_list_is_exact():
+    index, queries = clustered_index()
+    ivf = IVFIndex(index, nlist=16)
+
+    report = ivf.evaluate_recall(queries, k=10, nprobe=16)
+    assert report['recall_at_k'] == 1.0
+    assert report['nlist'] == 16 and report['vectors'] == len(index)
+
+
+def test_recall_on_clustered_data():
+    index, queries = clustered_index()
+    ivf = IVFIndex(index, nlist=32, nprobe=4)
+
+    assert ivf.evaluate_recall(queries, k=10)['recall_at_k'] >= 0.9
+
+
+def test_new_vectors_are_bucketed_incrementally():
+    index, _ = clustered_index(count=500)
+    ivf = IVFIndex(index, nlist=8)
+    ivf.train()
+    centroids = ivf.centroids.copy()
+
+    rng = np.random.default_rng(5)
+    target = rng.normal(size=32)
+    index.add('new', target, 5)
+
+    assert ivf.search(target, 1, nprobe=1)[0][0] == 'new'
+    assert len(ivf) == 501
+    np.testing.assert_array_equal(ivf.centroids, centroids)
+
+
+def test_persisted_index_is_reloaded(tmp_path):
+    path = str(tmp_path / "world.ivf.npz")
+    index, queries = clustered_index(count=500)
+    ivf = IVFIndex(index, nlist=8, path=path)
+    ivf.train()
+
+    restored = IVFIndex(index, nlist=8, path=path)
+    assert restored.load() is True
+    np.testing.assert_array_equal(restored.centroids, ivf.centroids)
+    assert restored.search(queries[0], 5) == ivf.search(queries[0], 5)
+
+
+def test_stale_persisted_index_is_rebuilt(tmp_path):
+    path = str(tmp_path / "world.ivf.npz")
+    index, _ = clustered_index(count=500)
+    IVFIndex(index, nlist=8, path=path).train()
+
+    other, _ = clustered_index(count=500, seed=1)
+    other.ids = [f"x{i}" for i in range(500)]
+    other.id_to_pos = {memory_id: i for i, memory_id in enumerate(other.ids)}
+    rebuilt = IVFIndex(other, nlist=8, path=path)
+    assert rebuilt.load() is False
+    assert len(rebuilt) == 500
+
+
+def test_compact_follows_removed_rows():
+    index, queries = clustered_index(count=500)
+    ivf = IVFIndex(index, nlist=8)
+    ivf.train()
+
+    keep = index.remove([f"m{i}" for i in range(0, 500, 2)])
+    ivf.compact(keep)
+
+    assert len(ivf) == 250
+    assert ivf.evaluate_recall(queries, k=5, nprobe=8)['recall_at_k'] == 1.0
+
+
+def test_unknown_index_type_is_rejected(make_memory):
+    with pytest.raises(ValueError):
+        make_memory(index_type="hnsw")
+
+
+def test_memory_system_switches_to_ivf_above_min_size(make_memory):
+    memory = make_memory(index_type="ivf", ann_min_size=20, ann_nlist=4)
+    memory.store_memories([{'content': f"event {i} word{i}", 'memory_type': 'event'} for i in range(10)])
+    memory.retrieve_relevant_memories("event word3", mode="vector")
+    assert memory._ann is None
+
+    memory.store_memories([{'content': f"event {i} word{i}", 'memory_type': 'event'} for i in range(10, 30)])
+    results = memory.retrieve_relevant_memories("event word25", limit=3, mode="vector")
+    assert memory._ann is not None and os.path.exists(memory._ann_index_path())
+    assert results[0]['content'] == "event 25 word25"
+    assert memory.ann_recall_report(["event word7"], k=5, nprobe=4)['recall_at_k'] == 1.0
+
+
+def test_flush_buckets_and_persists_new_vectors(tmp_path):
+    path = str(tmp_path / "world.ivf.npz")
+    index, _ = clustered_index(count=500)
+    ivf = IVFIndex(index, nlist=8, path=path)
+    ivf.train()
+    index.add('new', np.ones(32), 5)
+
+    ivf.flush()
+    assert len(ivf) == 501
+    with np.load(path) as data:
+        assert data['ids'][-1] == 'new'
+
+
+def test_inserts_reach_the_ann_index_and_its_file(make_memory):
+    memory = make_memory(index_type="ivf", ann_min_size=20, ann_nlist=4)
+    memory.store_memories([{'content': f"event {i} word{i}", 'memory_type': 'event'} for i in range(25)])
+    memory.retrieve_relevant_memories("event word3", mode="vector")
+    assert memory._ann is not None
+
+    memory.store_memories([{'content': f"event {i} word{i}", 'memory_type': 'event'} for i in range(25, 35)])
+    assert len(memory._ann) == 35
+    with np.load(memory._ann_index_path()) as data:
+        assert len(data['ids']) == 35
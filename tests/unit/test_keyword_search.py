@@ -0,0 +1,65 @@
+"""FTS5 keyword search: BM25 ranking, prefixes, operators and trigger sync."""
+
+import pytest
+
+
+@pytest.fixture
+def world(memory):
+    if not memory.fts_enabled:
+        pytest.skip("SQLite build without FTS5")
+    memory.store_memory("Thorin the dwarf forges axes in the mountain hall", "character", name="Thorin")
+    memory.store_memory("The mountain pass is guarded by trolls", "location", name="Troll Pass")
+    memory.store_memory("A merchant mentions Thorin once, in passing", "event")
+    memory.store_memory("Élodie sings at the tavern", "character", name="Élodie")
+    return memory
+
+
+def names(records):
+    return [record['name'] for record in records]
+
+
+def test_name_matches_outrank_content_matches(world):
+    results = world.search_memories_keyword("thorin")
+    assert len(results) == 2
+    assert results[0]['name'] == "Thorin"
+    assert results[0]['score'] > results[1]['score']
+
+
+def test_prefix_matching(world):
+    assert names(world.search_memories_keyword("thor", memory_type="character")) == ["Thorin"]
+    assert world.search_memories_keyword("thor", prefix=False) == []
+
+
+def test_all_or_any_words(world):
+    assert len(world.search_memories_keyword("mountain trolls")) == 1
+    assert len(world.search_memories_keyword("mountain trolls", match_all=False)) == 2
+
+
+def test_diacritics_and_query_syntax_are_neutralized(world):
+    assert names(world.search_memories_keyword("elodie")) == ["Élodie"]
+    # FTS5 operators in user input are treated as plain words
+    assert "Thorin" in names(world.search_memories_keyword('"thorin*  ('))
+    assert world.search_memories_keyword("!!!") == []
+
+
+def test_updates_and_deletes_keep_the_index_in_sync(world):
+    with world.db.write() as conn:
+        conn.execute("UPDATE memories SET content = 'Thorin now tends bees' WHERE name = 'Thorin'")
+        conn.execute("DELETE FROM memories WHERE name = 'Troll Pass'")
+
+    assert names(world.search_memories_keyword("bees")) == ["Thorin"]
+    assert world.search_memories_keyword("axes") == []
+    assert world.search_memories_keyword("trolls") == []
+
+
+def test_existing_databases_are_backfilled(make_memory, tmp_path):
+    memory = make_memory()
+    memory.store_memory("The lighthouse keeper hums old songs", "character", name="Keeper")
+    with memory.db.write() as conn:
+        for trigger in ("insert", "delete", "update"):
+            conn.execute(f"DROP TRIGGER memories_fts_{trigger}")
+        conn.execute("DROP TABLE memories_fts")
+    memory.close()
+
+    reopened = make_memory()
+    assert names(reopened.search_memories_keyword("lighthouse")) == ["Keeper"]
@@ -0,0 +1,58 @@
+"""Lazy embedder: nothing heavy is imported or loaded until the first encode."""
+
+import os
+import subprocess
+import sys
+import types
+
+import numpy as np
+
+import embedding_cache
+from embedding_cache import LazyEmbedder, get_shared_embedder
+from memory_system import FantasyMemorySystem
+
+
+def test_importing_memory_system_does_not_import_the_model_stack():
+    code = ("import sys, memory_system; "
+            "print('sentence_transformers' in sys.modules or 'torch' in sys.modules)")
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(embedding_cache.__file__))).stdout
+    assert output.strip() == "False"
+
+
+def test_read_only_use_does_not_load_the_model(tmp_path):
+    memory = FantasyMemorySystem(str(tmp_path / "world.db"))
+    try:
+        memory.get_memory_stats()
+        memory.get_world_state()
+        memory.get_memories_by_type("character")
+        assert isinstance(memory.embedder, LazyEmbedder)
+        assert not memory.embedder.loaded
+    finally:
+        memory.close()
+
+
+def test_first_encode_loads_the_model_once(monkeypatch):
+    loads = []
+
+    class FakeSentenceTransformer:
+        def __init__(self, model_name):
+            loads.append(model_name)
+
+        def encode(self, texts, **kwargs):
+            return np.ones((len(texts), 4), dtype=np.float32)
+
+    monkeypatch.setitem(sys.modules, "sentence_transformers",
+                        types.SimpleNamespace(SentenceTransformer=FakeSentenceTransformer))
+    embedder = LazyEmbedder("some-model")
+    assert not embedder.loaded
+
+    embedder.encode(["a"])
+    embedder.encode(["b"])
+    assert embedder.loaded and loads == ["some-model"]
+
+
+def test_embedder_is_shared_per_model(monkeypatch):
+    monkeypatch.setattr(embedding_cache, "_shared_embedders", {})
+    assert get_shared_embedder("model-a") is get_shared_embedder("model-a")
+    assert get_shared_embedder("model-a") is not get_shared_embedder("model-b")
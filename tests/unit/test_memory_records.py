@@ -0,0 +1,60 @@
+"""Slotted memory and conversation records behave like read-only dicts."""
+
+import json
+import sqlite3
+
+import pytest
+
+from memory_records import MEMORY_COLUMNS, ConversationRecord, MemoryRecord
+
+ROW = ("id-1", "character", "Elara", "Elara guards the forest", '{"race": "Elf"}', 7, "2024-01-01 00:00:00")
+
+
+def test_memory_record_reads_like_a_dict():
+    record = MemoryRecord(ROW)
+
+    assert record['name'] == "Elara" and record.get('importance') == 7
+    assert record['attributes'] == {'race': "Elf"}
+    assert record.get('similarity') is None
+    assert dict(record) == record.to_dict()
+    assert len(record) == 7
+    with pytest.raises(KeyError):
+        record['missing']
+    assert not hasattr(record, '__dict__')
+
+
+def test_scores_come_from_extra_columns():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = MemoryRecord.row_factory
+    record = conn.execute(f"SELECT ?, ?, ?, ?, ?, ?, ?, 0.5 AS score", ROW).fetchone()
+
+    assert record['score'] == 0.5
+    assert list(record) == MEMORY_COLUMNS.split(', ') + ['score']
+    assert json.loads(json.dumps(record.to_dict()))['score'] == 0.5
+
+
+def test_copy_drops_scores_and_with_scores_adds_them():
+    record = MemoryRecord(ROW).with_scores(similarity=0.9)
+    copy = record.copy()
+
+    assert copy.get('similarity') is None and copy['name'] == "Elara"
+    assert record.with_scores(rrf_score=0.1)['similarity'] == 0.9
+
+
+def test_missing_attributes_decode_to_none():
+    assert MemoryRecord(ROW[:4] + ("", 5, None))['attributes'] is None
+
+
+def test_conversation_record_cursor():
+    record = ConversationRecord("hi", "hello", "2024-01-01 00:00:00", 42)
+    assert dict(record) == {'user_input': "hi", 'ai_response': "hello", 'timestamp': "2024-01-01 00:00:00"}
+    assert record.cursor == "2024-01-01 00:00:00|42"
+    assert ConversationRecord("hi", "hello", None).cursor is None
+
+
+def test_memory_system_returns_records(memory):
+    memory.store_memory("Elara guards the forest", "character", name="Elara", attributes={'race': "Elf"})
+    (record,) = memory.retrieve_relevant_memories("forest", limit=1)
+
+    assert isinstance(record, MemoryRecord)
+    assert record['attributes'] == {'race': "Elf"} and record['similarity'] > 0
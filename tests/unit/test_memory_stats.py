@@ -0,0 +1,50 @@
+"""Trigger-maintained memory statistics."""
+
+import sqlite3
+
+from retention import RetentionPolicy
+
+
+def brute_force_counts(memory):
+    with memory.db.read() as conn:
+        return dict(((memory_type, status), count) for memory_type, status, count in conn.execute(
+            'SELECT type, status, COUNT(*) FROM memories GROUP BY type, status'))
+
+
+def stats_table(memory):
+    with memory.db.read() as conn:
+        return {(memory_type, status): count for memory_type, status, count in
+                conn.execute('SELECT type, status, count FROM memory_stats')}
+
+
+def test_counts_follow_inserts_and_status_changes(make_memory):
+    memory = make_memory(retention_policy=RetentionPolicy(max_active=10, low_watermark=0.5))
+    memory.store_memory("The realm of Aldoria", "world")
+    memory.store_memories([{'content': f"event {i} word{i}", 'memory_type': 'event'} for i in range(15)])
+    memory.archive_memories([memory.get_memories_by_type('event', 1)[0].id])
+
+    stats = memory.get_memory_stats()
+    assert stats_table(memory) == brute_force_counts(memory)
+    assert stats['by_status']['cold'] > 0 and stats['by_status']['archived'] == 1
+    assert stats['total_memories'] == stats['by_status']['active'] == sum(stats['by_type'].values())
+    assert sum(stats['by_status'].values()) == 16
+
+
+def test_older_per_type_counts_are_rebuilt(make_memory, tmp_path):
+    memory = make_memory()
+    memory.store_memories([{'content': f"event {i}", 'memory_type': 'event'} for i in range(3)])
+    memory.archive_memories([memory.get_memories_by_type('event', 1)[0].id])
+    memory.close()
+    conn = sqlite3.connect(str(tmp_path / "world.db"))
+    for trigger in ('memory_stats_insert', 'memory_stats_delete', 'memory_stats_update'):
+        conn.execute(f'DROP TRIGGER {trigger}')
+    conn.execute('DROP TABLE memory_stats')
+    conn.execute('CREATE TABLE memory_stats (type TEXT PRIMARY KEY, count INTEGER NOT NULL)')
+    conn.execute("INSERT INTO memory_stats VALUES ('event', 3)")
+    conn.commit()
+    conn.close()
+
+    reopened = make_memory()
+    assert reopened.get_memory_stats()['by_type'] == {'event': 2}
+    reopened.store_memory("another event", "event")
+    assert stats_table(reopened) == brute_force_counts(reopened)
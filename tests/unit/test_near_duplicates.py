@@ -0,0 +1,95 @@
+"""Near-duplicate detection at ingest: merge into the existing memory instead of inserting."""
+
+import pytest
+
+
+@pytest.fixture
+def memory(make_memory):
+    return make_memory(dedup_threshold=0.92)
+
+
+def rows(memory):
+    with memory.db.read() as conn:
+        return conn.execute("SELECT id, name, importance, context FROM memories ORDER BY rowid").fetchall()
+
+
+def test_duplicate_ingest_merges_instead_of_inserting(memory):
+    first = memory.store_memory("The bridge over the river collapsed", "event", importance=5)
+    second = memory.store_memory("The bridge over the river collapsed!", "event", importance=5,
+                                 context="Seen by the ferryman")
+
+    assert second == first
+    assert rows(memory) == [(first, None, 6, "Seen by the ferryman")]
+    # The resident index follows the bumped importance
+    assert memory.retrieve_relevant_memories("bridge river", limit=1)[0]['importance'] == 6
+
+
+def test_repeated_merges_do_not_repeat_context_and_cap_importance(memory):
+    memory_id = memory.store_memory("The bridge over the river collapsed", "event", importance=9)
+    for _ in range(3):
+        memory.store_memory("The bridge over the river collapsed", "event", importance=9, context="Rumour")
+
+    assert rows(memory) == [(memory_id, None, 10, "Rumour")]
+
+
+def test_different_types_and_differently_named_entities_stay_apart(memory):
+    memory.store_memory("A tall ranger who guards the forest", "character", name="Elara")
+    memory.store_memory("A tall ranger who guards the forest", "character", name="Lyra")
+    memory.store_memory("A tall ranger who guards the forest", "event")
+    assert len(rows(memory)) == 3
+
+    memory.store_memory("A tall ranger who guards the forest.", "character", name="  ELARA ")
+    assert len(rows(memory)) == 3
+
+
+def test_unrelated_memories_are_inserted(memory):
+    memory.store_memory("The bridge over the river collapsed", "event")
+    memory.store_memory("A festival of lanterns lights the city", "event")
+    assert len(rows(memory)) == 2
+
+
+def test_duplicates_within_a_batch_and_a_unit_of_work(memory):
+    ids = memory.store_memories([{'content': "Wolves howl at night", 'memory_type': 'event'},
+                                 {'content': "Wolves howl at night", 'memory_type': 'event', 'context': "again"}])
+    assert ids[0] == ids[1]
+
+    with memory.unit_of_work():
+        pending = memory.store_memory("The moon turns red", "event")
+        assert memory.store_memory("The moon turns red.", "event") == pending
+    assert [row[0] for row in rows(memory)] == [ids[0], pending]
+
+
+def test_deduplicate_false_always_inserts(memory):
+    memory.store_memory("The bridge over the river collapsed", "event")
+    memory.store_memory("The bridge over the river collapsed", "event", deduplicate=False)
+    memory.store_memories([{'content': "The bridge over the river collapsed", 'memory_type': 'event'}],
+                          deduplicate=False)
+    assert len(rows(memory)) == 3
+
+
+@pytest.mark.parametrize("threshold", [0, 1.5, -0.2])
+def test_threshold_must_be_a_cosine(make_memory, threshold):
+    with pytest.raises(ValueError):
+        make_memory(dedup_threshold=threshold)
+
+
+def test_unit_of_work_dedup_encodes_each_text_a_bounded_number_of_times(memory, monkeypatch):
+    encoded = []
+    encode = memory.embedding_cache.encode
+    monkeypatch.setattr(memory.embedding_cache, "encode", lambda texts: encoded.append(len(texts)) or encode(texts))
+
+    with memory.unit_of_work():
+        ids = [memory.store_memory(f"event {i} word{i} other{i * 7}", "event") for i in range(200)]
+        assert memory.store_memory("event 5 word5 other35", "event") == ids[5]
+
+    # Pending memories are not re-encoded by every later store_memory call
+    assert sum(encoded) < 4 * 201
+
+
+def test_named_entities_in_a_unit_of_work_merge_by_name(memory):
+    with memory.unit_of_work():
+        elara = memory.store_memory("A tall ranger who guards the forest", "character", name="Elara")
+        lyra = memory.store_memory("A tall ranger who guards the forest", "character", name="Lyra")
+        assert memory.store_memory("A tall ranger who guards the forest.", "character", name="ELARA") == elara
+        assert lyra != elara
+    assert len(rows(memory)) == 2
@@ -0,0 +1,92 @@
+"""Retention policy: bounded active set and the cold tier."""
+
+import pytest
+
+from retention import RetentionPolicy
+
+
+def store_events(memory, count, prefix="event", importance=5):
+    return memory.store_memories([{'content': f"{prefix} {i} word{i} other{i * 7}", 'memory_type': 'event',
+                                   'importance': importance} for i in range(count)])
+
+
+def active_count(memory):
+    with memory.db.read() as conn:
+        return conn.execute("SELECT COUNT(*) FROM memories WHERE status = 'active'").fetchone()[0]
+
+
+def test_policy_requires_a_bound():
+    with pytest.raises(ValueError):
+        RetentionPolicy()
+
+
+def test_max_active_is_enforced_without_prior_retrieval(make_memory):
+    memory = make_memory(retention_policy=RetentionPolicy(max_active=10, low_watermark=0.5))
+    for _ in range(3):
+        store_events(memory, 10)
+
+    assert active_count(memory) <= 10
+
+
+def test_lowest_scores_are_evicted_and_protected_types_kept(make_memory):
+    memory = make_memory(retention_policy=RetentionPolicy(max_active=10, low_watermark=0.9))
+    memory.store_memory("The realm of Aldoria", "world", importance=1)
+    important = store_events(memory, 5, "important", importance=10)
+    store_events(memory, 10, "trivial", importance=1)
+
+    with memory.db.read() as conn:
+        statuses = dict(conn.execute("SELECT id, status FROM memories"))
+        world_status = conn.execute("SELECT status FROM memories WHERE type = 'world'").fetchone()[0]
+    assert world_status == 'active'
+    assert all(statuses[memory_id] == 'active' for memory_id in important)
+    assert 'cold' in statuses.values()
+
+
+def test_max_index_bytes_budget(make_memory):
+    # 64-dimensional float32 vectors: 2560 bytes hold 10 of them
+    memory = make_memory(retention_policy=RetentionPolicy(max_index_bytes=2560))
+    store_events(memory, 20)
+    assert active_count(memory) <= 10
+
+
+def test_cold_memories_are_searched_on_request_and_restored(make_memory):
+    memory = make_memory(retention_policy=RetentionPolicy(max_active=10, low_watermark=0.5))
+    store_events(memory, 20)
+    with memory.db.read() as conn:
+        cold_id, content = conn.execute("SELECT id, content FROM memories WHERE status = 'cold' LIMIT 1").fetchone()
+
+    assert cold_id not in [record.id for record in memory.retrieve_relevant_memories(content, limit=3)]
+    results = memory.retrieve_relevant_memories(content, limit=3, include_cold=True)
+    assert results[0].id == cold_id and results[0]['tier'] == 'cold'
+
+    memory.restore_memories([cold_id])
+    assert memory.retrieve_relevant_memories(content, limit=1)[0].id == cold_id
+
+
+def test_evictions_and_restores_by_another_instance_reach_the_index(make_memory):
+    reader = make_memory()
+    store_events(reader, 20)
+    reader.retrieve_relevant_memories("event", limit=1)  # Load the resident index
+
+    writer = make_memory(retention_policy=RetentionPolicy(max_active=10, low_watermark=0.5))
+    assert writer.enforce_retention() > 0
+    with writer.db.read() as conn:
+        cold_id, content = conn.execute("SELECT id, content FROM memories WHERE status = 'cold' LIMIT 1").fetchone()
+
+    assert len(reader._sync_index()) == active_count(reader)
+    assert cold_id not in [record.id for record in reader.retrieve_relevant_memories(content, limit=3)]
+
+    writer.restore_memories([cold_id])
+    assert reader.retrieve_relevant_memories(content, limit=1)[0].id == cold_id
+
+
+def test_importance_changes_by_another_instance_reach_the_index(make_memory):
+    reader = make_memory()
+    (memory_id,) = store_events(reader, 1, importance=2)
+    assert reader.retrieve_relevant_memories("event", limit=1)[0]['similarity'] < 0.2
+
+    with make_memory().db.write() as conn:
+        conn.execute("UPDATE memories SET importance = 10 WHERE id = ?", (memory_id,))
+
+    result = reader.retrieve_relevant_memories("event", limit=1)[0]
+    assert result['importance'] == 10 and result['similarity'] > 0.2
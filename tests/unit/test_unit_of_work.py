@@ -0,0 +1,66 @@
+"""Per-turn unit of work: one transaction, one encode call, all or nothing."""
+
+import pytest
+
+
+def count(memory, table):
+    with memory.db.read() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_writes_are_buffered_until_the_block_exits(memory, embedder):
+    with memory.unit_of_work():
+        memory.store_memory("Elara the ranger guards the forest", "character", name="Elara")
+        memory.store_memory("The forest of Whispering Pines", "location", name="Whispering Pines")
+        record = memory.store_conversation("session", "Who guards the forest?", "Elara does.")
+        memory.set_world_state("weather", "current", "rain")
+
+        assert count(memory, "memories") == 0 and count(memory, "conversations") == 0
+        assert record.rowid is None
+        assert [m['name'] for m in memory.get_memories_by_type("character")] == ["Elara"]
+
+    assert count(memory, "memories") == 2
+    assert count(memory, "conversations") == 1
+    assert record.rowid is not None and record.timestamp is not None
+    assert memory.get_world_state("weather")[0]['value'] == "rain"
+    # Both memories were embedded by one batched call
+    assert embedder.calls == 1
+
+
+def test_an_exception_discards_every_write(memory):
+    with pytest.raises(RuntimeError):
+        with memory.unit_of_work():
+            memory.store_memory("A memory that never lands", "event")
+            memory.store_conversation("session", "hello", "hi")
+            memory.set_world_state("weather", "current", "snow")
+            raise RuntimeError("turn failed")
+
+    assert count(memory, "memories") == 0
+    assert count(memory, "conversations") == 0
+    assert memory.get_world_state() == []
+
+
+def test_nested_blocks_join_the_outermost(memory):
+    with memory.unit_of_work() as outer:
+        with memory.unit_of_work() as inner:
+            assert inner is outer
+            memory.store_memory("Inner write", "event")
+        assert count(memory, "memories") == 0
+        memory.store_memory("Outer write", "event")
+
+    assert count(memory, "memories") == 2
+
+
+def test_memories_are_searchable_after_the_flush(memory):
+    with memory.unit_of_work():
+        memory.store_memory("The dragon sleeps under the mountain", "event")
+        memory.store_memory("Merchants trade silk in the harbor", "event")
+
+    results = memory.retrieve_relevant_memories("dragon mountain", limit=1)
+    assert results[0]['content'] == "The dragon sleeps under the mountain"
+
+
+def test_writes_outside_a_block_commit_immediately(memory):
+    memory.store_memory("Standalone memory", "event")
+    memory.store_conversation("session", "hello", "hi")
+    assert count(memory, "memories") == 1 and count(memory, "conversations") == 1
@@ -0,0 +1,99 @@
+"""Resident embedding matrix: exact scoring, partitions and removal."""
+
+import numpy as np
+
+from vector_index import EmbeddingIndex
+
+
+def random_index(count=200, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(count, dim)).astype(np.float32)
+    importances = rng.integers(1, 11, size=count).astype(np.float32)
+    types = ['event' if i % 3 else 'character' for i in range(count)]
+    index = EmbeddingIndex(initial_capacity=8)
+    # Several batches exercise the amortized growth of the matrix
+    for start in range(0, count, 50):
+        ids = [f"m{i}" for i in range(start, min(count, start + 50))]
+        index.add_batch(ids, vectors[start:start + 50], importances[start:start + 50],
+                        types=types[start:start + 50])
+    return index, vectors, importances, types
+
+
+def brute_force(vectors, importances, query, k, keep=None):
+    scored = []
+    for i, (vector, importance) in enumerate(zip(vectors, importances)):
+        if keep is not None and not keep(i):
+            continue
+        cosine = float(vector @ query / (np.linalg.norm(vector) * np.linalg.norm(query)))
+        scored.append((f"m{i}", cosine * importance / 10.0))
+    return sorted(scored, key=lambda pair: -pair[1])[:k]
+
+
+def assert_same_ranking(actual, expected):
+    assert [memory_id for memory_id, _ in actual] == [memory_id for memory_id, _ in expected]
+    np.testing.assert_allclose([score for _, score in actual], [score for _, score in expected], rtol=1e-4)
+
+
+def test_search_matches_brute_force():
+    index, vectors, importances, _ = random_index()
+    query = np.random.default_rng(1).normal(size=16)
+
+    assert_same_ranking(index.search(query, 10), brute_force(vectors, importances, query, 10))
+
+
+def test_partition_search_scores_only_its_type():
+    index, vectors, importances, types = random_index()
+    query = np.random.default_rng(2).normal(size=16)
+
+    results = index.search(query, 5, index.partition('character'))
+    assert_same_ranking(results, brute_force(vectors, importances, query, 5,
+                                             keep=lambda i: types[i] == 'character'))
+    assert sorted(index.memory_types()) == ['character', 'event']
+
+
+def test_importance_and_boost_reweight_scores():
+    index = EmbeddingIndex()
+    index.add_batch(['a', 'b'], np.array([[1.0, 0.0], [1.0, 0.0]]), [5, 5])
+
+    index.set_importance('a', 10)
+    index.set_boost('b', 3.0)
+    index.set_importance('unknown', 1)
+
+    assert dict(index.search(np.array([1.0, 0.0]), 2)) == {'a': 1.0, 'b': 1.5}
+
+
+def test_remove_compacts_positions_and_partitions():
+    index, vectors, importances, types = random_index(count=30)
+    dropped = {'m0', 'm4', 'm29'}
+
+    keep = index.remove(list(dropped) + ['unknown'])
+
+    assert keep is not None and int(keep.sum()) == 27
+    assert len(index) == 27 and not dropped & set(index.ids)
+    assert all(index.ids[position] == memory_id for memory_id, position in index.id_to_pos.items())
+    character_ids = {index.ids[position] for position in index.partition('character')}
+    assert character_ids == {f"m{i}" for i in range(30) if types[i] == 'character'} - dropped
+    query = np.random.default_rng(3).normal(size=16)
+    assert_same_ranking(index.search(query, 5), brute_force(vectors, importances, query, 5,
+                                                            keep=lambda i: f"m{i}" not in dropped))
+
+
+def test_remove_of_unknown_ids_is_a_no_op():
+    index, _, _, _ = random_index(count=5)
+    assert index.remove(['missing']) is None
+    assert len(index) == 5
+
+
+def test_positions_of_skips_unknown_and_duplicates():
+    index, _, _, _ = random_index(count=10)
+    np.testing.assert_array_equal(index.positions_of(['m7', 'm2', 'm7', 'missing']), [2, 7])
+
+
+def test_memory_system_retrieval_ranks_by_similarity(memory):
+    memory.store_memory("The dragon sleeps under the mountain", "event", importance=5)
+    memory.store_memory("Merchants trade silk in the harbor", "event", importance=5)
+    memory.store_memory("A festival of lanterns lights the city", "event", importance=5)
+
+    results = memory.retrieve_relevant_memories("dragon mountain", limit=3)
+    assert results[0]['content'] == "The dragon sleeps under the mountain"
+    assert len(memory._sync_index()) == 3
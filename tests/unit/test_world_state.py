@@ -0,0 +1,44 @@
+"""Materialized current world state kept alongside the history log."""
+
+
+def current(memory, state_type=None):
+    return {(row['state_type'], row['key']): row['value'] for row in memory.get_world_state(state_type)}
+
+
+def test_latest_value_per_key_is_current(memory):
+    memory.set_world_state("weather", "sky", "clear")
+    memory.set_world_state("weather", "wind", "calm")
+    memory.set_world_state("weather", "sky", "storm")
+
+    assert current(memory) == {("weather", "sky"): "storm", ("weather", "wind"): "calm"}
+    assert len(memory.get_world_state_history("weather", "sky")) == 2
+
+
+def test_most_recently_changed_comes_first(memory):
+    memory.set_world_state("weather", "sky", "clear")
+    memory.set_world_state("time", "hour", "dawn")
+    memory.set_world_state("weather", "sky", "rain")
+
+    assert [row['key'] for row in memory.get_world_state()] == ["sky", "hour"]
+    assert current(memory, "time") == {("time", "hour"): "dawn"}
+
+
+def test_exclusive_replaces_the_other_keys_of_its_type(memory):
+    memory.set_world_state("time_of_day", "morning", "The sun rises", exclusive=True)
+    memory.set_world_state("time_of_day", "midday", "The sun is high", exclusive=True)
+
+    assert current(memory, "time_of_day") == {("time_of_day", "midday"): "The sun is high"}
+    assert len(memory.get_world_state_history("time_of_day")) == 2
+
+
+def test_current_state_is_backfilled_from_the_log(make_memory):
+    memory = make_memory()
+    memory.set_world_state("weather", "sky", "clear")
+    memory.set_world_state("weather", "sky", "fog")
+    memory.set_world_state("politics", "king", "Aldric")
+    with memory.db.write() as conn:
+        conn.execute("DROP TABLE world_state_current")
+    memory.close()
+
+    reopened = make_memory()
+    assert current(reopened) == {("weather", "sky"): "fog", ("politics", "king"): "Aldric"}
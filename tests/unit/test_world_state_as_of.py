@@ -0,0 +1,91 @@
+"""As-of world state: snapshot plus replay equals a replay of the whole log."""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+START = datetime(2024, 1, 1)
+
+
+def spread_timestamps(memory):
+    """Give log row n the time START + n minutes (and carry it into the snapshots)."""
+    with memory.db.write() as conn:
+        conn.execute("UPDATE world_state SET timestamp = datetime('2024-01-01', '+' || id || ' minutes')")
+        conn.execute("UPDATE world_state_current SET timestamp = "
+                     "(SELECT timestamp FROM world_state WHERE id = log_id)")
+        conn.execute("UPDATE world_state_snapshots SET timestamp = "
+                     "(SELECT timestamp FROM world_state WHERE id = log_id)")
+        conn.execute("UPDATE world_state_snapshot_rows SET timestamp = "
+                     "(SELECT timestamp FROM world_state WHERE id = world_state_snapshot_rows.log_id)")
+
+
+def random_history(memory, changes=60, seed=0):
+    rng = random.Random(seed)
+    for i in range(changes):
+        state_type = rng.choice(["weather", "time_of_day", "politics"])
+        memory.set_world_state(state_type, f"key{rng.randrange(4)}", f"value{i}",
+                               exclusive=state_type == "time_of_day")
+    spread_timestamps(memory)
+
+
+def brute_force(memory, as_of, state_type=None):
+    state = {}
+    with memory.db.read() as conn:
+        for log_id, kind, key, value, timestamp, exclusive in conn.execute(
+                "SELECT id, state_type, key, value, timestamp, exclusive FROM world_state "
+                "WHERE timestamp <= ? ORDER BY id", (memory._sql_timestamp(as_of),)):
+            if exclusive:
+                state = {k: v for k, v in state.items() if k[0] != kind}
+            state[(kind, key)] = (value, timestamp, log_id)
+    rows = sorted(state.items(), key=lambda item: -item[1][2])
+    return [(kind, key, value, timestamp) for (kind, key), (value, timestamp, _) in rows
+            if state_type is None or kind == state_type]
+
+
+def as_tuples(rows):
+    return [(row['state_type'], row['key'], row['value'], row['timestamp']) for row in rows]
+
+
+def probe_times(changes):
+    return [START + timedelta(minutes=minute, seconds=seconds)
+            for minute in range(changes + 2) for seconds in (0, 30)]
+
+
+@pytest.mark.parametrize("snapshot_every", [1, 7, 1000])
+def test_as_of_matches_a_full_replay(make_memory, snapshot_every):
+    memory = make_memory(world_state_snapshot_every=snapshot_every)
+    random_history(memory)
+
+    for as_of in probe_times(60):
+        assert as_tuples(memory.get_world_state(as_of=as_of)) == brute_force(memory, as_of)
+        assert as_tuples(memory.get_world_state("weather", as_of=as_of)) == brute_force(memory, as_of, "weather")
+
+
+def test_as_of_now_equals_the_current_state(make_memory):
+    memory = make_memory(world_state_snapshot_every=7)
+    random_history(memory)
+    assert memory.get_world_state(as_of=START + timedelta(days=1)) == memory.get_world_state()
+
+
+def test_as_of_accepts_sql_timestamps(make_memory):
+    memory = make_memory(world_state_snapshot_every=7)
+    random_history(memory)
+    assert (memory.get_world_state(as_of="2024-01-01 00:20:00")
+            == memory.get_world_state(as_of=START + timedelta(minutes=20)))
+    assert memory.get_world_state(as_of="2023-12-31 23:59:59") == []
+
+
+def test_snapshots_are_backfilled_for_existing_histories(make_memory):
+    memory = make_memory(world_state_snapshot_every=1000)
+    random_history(memory)
+    with memory.db.write() as conn:
+        conn.execute("DROP TABLE world_state_snapshot_rows")
+        conn.execute("DROP TABLE world_state_snapshots")
+    memory.close()
+
+    reopened = make_memory(world_state_snapshot_every=7)
+    with reopened.db.read() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM world_state_snapshots").fetchone()[0] == 60 // 7
+    for as_of in probe_times(60):
+        assert as_tuples(reopened.get_world_state(as_of=as_of)) == brute_force(reopened, as_of)
@@ -0,0 +1,420 @@
+"""
+Vector Index for Fantasy World Memories
+Keeps memory embeddings resident in RAM as a pre-normalized float32 matrix
+so retrieval is a single matrix-vector product instead of a per-row Python loop.
+Optionally fronted by an IVF approximate-nearest-neighbour index for very large worlds.
+"""
+
+import os
+import time
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _grow(array: np.ndarray, needed: int) -> np.ndarray:
+    """Return `array` with room for at least `needed` rows (amortized doubling)."""
+    if needed <= len(array):
+        return array
+    grown = np.zeros((max(needed, 2 * len(array)),) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class EmbeddingIndex:
+    """
+    Matrix of unit-length memory embeddings with importance weights.
+
+    Rows live either in a growable in-RAM array or, when the memories line
+    up one-to-one with an EmbeddingSidecar, directly in its read-only memory map.
+    """
+
+    def __init__(self, initial_capacity: int = 1024):
+        self.ids: List[str] = []
+        self.id_to_pos = {}
+        self.last_rowid = 0
+        self._initial_capacity = max(1, initial_capacity)
+        self._matrix: Optional[np.ndarray] = None
+        self._mapped = False
+        self._importance = np.zeros(self._initial_capacity, dtype=np.float32)
+        # Per-row score multipliers (e.g. for frequently retrieved memories)
+        self._boost = np.ones(self._initial_capacity, dtype=np.float32)
+        # Positions of each memory type, so type-scoped queries only score their partition
+        self._partitions: Dict[str, List[int]] = {}
+        self._partition_arrays: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def dim(self) -> Optional[int]:
+        return None if self._matrix is None else self._matrix.shape[1]
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """View of the populated rows of the embedding matrix."""
+        if self._matrix is None:
+            return np.zeros((0, 0), dtype=np.float32)
+        return self._matrix[:len(self.ids)]
+
+    @property
+    def importance(self) -> np.ndarray:
+        """View of the importance weights of the populated rows."""
+        return self._importance[:len(self.ids)]
+
+    @staticmethod
+    def normalize(vectors: np.ndarray) -> np.ndarray:
+        """Scale rows to unit length (zero vectors are left as zeros)."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+    def _append_ids(self, ids: Sequence[str], importances: Sequence[float], rowid: Optional[int],
+                    types: Optional[Sequence[str]]):
+        start = len(self.ids)
+        if types is not None:
+            for offset, memory_type in enumerate(types):
+                self._partitions.setdefault(memory_type, []).append(start + offset)
+                self._partition_arrays.pop(memory_type, None)
+        self._importance = _grow(self._importance, start + len(ids))
+        self._importance[start:start + len(ids)] = np.asarray(importances, dtype=np.float32)
+        self._boost = _grow(self._boost, start + len(ids))
+        self._boost[start:start + len(ids)] = 1.0
+        for offset, memory_id in enumerate(ids):
+            self.id_to_pos[memory_id] = start + offset
+        self.ids.extend(ids)
+        if rowid is not None:
+            self.last_rowid = max(self.last_rowid, rowid)
+
+    def add_batch(self, ids: Sequence[str], embeddings: np.ndarray,
+                  importances: Sequence[float], rowid: int = None, types: Sequence[str] = None):
+        """Append embeddings for the given memory ids (and their memory types)."""
+        if not ids:
+            return
+        embeddings = self.normalize(np.atleast_2d(embeddings))
+        start = len(self.ids)
+        if self._matrix is None:
+            self._matrix = np.zeros((max(self._initial_capacity, len(ids)), embeddings.shape[1]),
+                                    dtype=np.float32)
+        elif self._mapped:
+            # Leaving the sidecar layout: take a private, writable copy
+            self._matrix = np.array(self._matrix[:start])
+            self._mapped = False
+        self._matrix = _grow(self._matrix, start + len(ids))
+        self._matrix[start:start + len(ids)] = embeddings
+        self._append_ids(ids, importances, rowid, types)
+
+    def add(self, memory_id: str, embedding: np.ndarray, importance: float, rowid: int = None,
+            memory_type: str = None):
+        """Append a single embedding."""
+        self.add_batch([memory_id], np.asarray(embedding)[None, :], [importance], rowid,
+                       None if memory_type is None else [memory_type])
+
+    def add_from_store(self, ids: Sequence[str], store, rows: Sequence[int],
+                       importances: Sequence[float], rowid: int = None, types: Sequence[str] = None):
+        """
+        Append embeddings that already live in an EmbeddingSidecar.
+
+        While sidecar rows match index positions the matrix is just a memory
+        map of the file (zero-copy); otherwise the vectors are gathered into RAM.
+        """
+        if not ids:
+            return
+        start = len(self.ids)
+        rows = np.asarray(rows, dtype=np.int64)
+        contiguous = np.array_equal(rows, np.arange(start, start + len(ids)))
+        if contiguous and (self._matrix is None or self._mapped):
+            self._matrix = store.view(start + len(ids))
+            self._mapped = True
+            self._append_ids(ids, importances, rowid, types)
+        else:
+            self.add_batch(ids, store.view()[rows], importances, rowid, types)
+
+    def remove(self, ids: Sequence[str]) -> Optional[np.ndarray]:
+        """
+        Drop memories and compact the remaining rows into a private in-RAM matrix.
+
+        Returns the keep mask over the previous positions, or None if none of
+        the ids were indexed.
+        """
+        drop = [self.id_to_pos[memory_id] for memory_id in ids if memory_id in self.id_to_pos]
+        if not drop:
+            return None
+        keep = np.ones(len(self.ids), dtype=bool)
+        keep[drop] = False
+        new_positions = np.cumsum(keep) - 1
+
+        self._matrix = self.matrix[keep]
+        self._mapped = False
+        self._importance = self.importance[keep]
+        self._boost = self._boost[:len(keep)][keep]
+        self.ids = [memory_id for memory_id, kept in zip(self.ids, keep) if kept]
+        self.id_to_pos = {memory_id: position for position, memory_id in enumerate(self.ids)}
+        for memory_type, positions in self._partitions.items():
+            positions = np.asarray(positions, dtype=np.int64)
+            self._partitions[memory_type] = new_positions[positions[keep[positions]]].tolist()
+        self._partition_arrays.clear()
+        return keep
+
+    def memory_types(self) -> List[str]:
+        """Types that have a partition."""
+        return list(self._partitions)
+
+    def partition(self, memory_type: str) -> np.ndarray:
+        """Positions of all memories of one type."""
+        if memory_type not in self._partition_arrays:
+            self._partition_arrays[memory_type] = np.asarray(self._partitions.get(memory_type, []),
+                                                             dtype=np.int64)
+        return self._partition_arrays[memory_type]
+
+    def positions_of(self, ids: Sequence[str]) -> np.ndarray:
+        """Sorted, de-duplicated positions of the given ids (unknown ids are skipped)."""
+        return np.unique(np.asarray([self.id_to_pos[memory_id] for memory_id in ids
+                                     if memory_id in self.id_to_pos], dtype=np.int64))
+
+    def score(self, query: np.ndarray, positions: np.ndarray = None) -> np.ndarray:
+        """Importance-weighted (and boosted) cosine of a unit-length query against rows (all by default)."""
+        if positions is None:
+            return self.matrix @ query * (self.importance / 10.0) * self._boost[:len(self.ids)]
+        return self._matrix[positions] @ query * (self._importance[positions] / 10.0) * self._boost[positions]
+
+    def cosine(self, queries: np.ndarray, positions: np.ndarray = None) -> np.ndarray:
+        """Unweighted cosine of unit-length query rows against rows (all by default), shape (rows, queries)."""
+        rows = self.matrix if positions is None else self._matrix[positions]
+        return rows @ np.atleast_2d(queries).T
+
+    def set_importance(self, memory_id: str, importance: float):
+        """Update the weight of an indexed memory (unknown ids are ignored)."""
+        position = self.id_to_pos.get(memory_id)
+        if position is not None:
+            self._importance[position] = importance
+
+    def set_boost(self, memory_id: str, factor: float):
+        """Set the score multiplier of an indexed memory (unknown ids are ignored)."""
+        position = self.id_to_pos.get(memory_id)
+        if position is not None:
+            self._boost[position] = factor
+
+    def top_k(self, scores: np.ndarray, k: int, positions: np.ndarray = None) -> List[Tuple[str, float]]:
+        """Pick the k best scores (optionally over a subset of positions)."""
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        if positions is None:
+            return [(self.ids[pos], float(scores[pos])) for pos in top]
+        return [(self.ids[positions[i]], float(scores[i])) for i in top]
+
+    def search(self, query_embedding: np.ndarray, k: int,
+               positions: np.ndarray = None) -> List[Tuple[str, float]]:
+        """Return the top-k (memory_id, importance-weighted cosine) pairs, optionally within a subset."""
+        if len(self.ids) == 0 or k <= 0 or (positions is not None and len(positions) == 0):
+            return []
+        query = self.normalize(np.asarray(query_embedding).ravel())
+        return self.top_k(self.score(query, positions), k, positions)
+
+
+def _nearest_centroid(vectors: np.ndarray, centroids: np.ndarray, batch_size: int = 8192) -> np.ndarray:
+    """Assign unit vectors to their most similar centroid, in bounded-memory batches."""
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), batch_size):
+        chunk = vectors[start:start + batch_size]
+        assignments[start:start + batch_size] = np.argmax(chunk @ centroids.T, axis=1)
+    return assignments
+
+
+class IVFIndex:
+    """
+    Inverted-file ANN index over an EmbeddingIndex.
+
+    Vectors are bucketed under the nearest of `nlist` spherical k-means
+    centroids; a query only scores the members of its `nprobe` closest
+    buckets. Raising nprobe trades latency for recall.
+    """
+
+    def __init__(self, base: EmbeddingIndex, nlist: int = None, nprobe: int = 8,
+                 path: str = None, save_every: int = 1000, retrain_factor: float = 2.0):
+        self.base = base
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.path = path
+        self.save_every = save_every
+        self.retrain_factor = retrain_factor
+        self.centroids: Optional[np.ndarray] = None
+        self.trained_size = 0
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._lists: List[List[int]] = []
+        self._list_arrays: List[Optional[np.ndarray]] = []
+        self._unsaved = 0
+
+    def __len__(self) -> int:
+        return len(self._assignments)
+
+    # -- building -------------------------------------------------------
+
+    def train(self, iterations: int = 10, sample_size: int = None, seed: int = 0):
+        """(Re)build centroids with spherical k-means and reassign every vector."""
+        vectors = self.base.matrix
+        n = len(vectors)
+        if n == 0:
+            return
+        nlist = self.nlist or max(1, int(4 * np.sqrt(n)))
+        nlist = min(nlist, n)
+        rng = np.random.default_rng(seed)
+        sample_size = min(n, sample_size or 256 * nlist)
+        sample = vectors[rng.choice(n, sample_size, replace=False)] if sample_size < n else vectors
+
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = _nearest_centroid(sample, centroids)
+            counts = np.bincount(assignments, minlength=nlist)
+            order = np.argsort(assignments, kind="stable")
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            empty = counts == 0
+            sums = np.zeros_like(centroids)
+            sums[~empty] = np.add.reduceat(sample[order], starts[~empty], axis=0)
+            # Re-seed empty buckets so every centroid stays useful
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = EmbeddingIndex.normalize(sums)
+
+        self.centroids = centroids
+        self.trained_size = n
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._lists = [[] for _ in range(nlist)]
+        self._list_arrays = [None] * nlist
+        self._assign_pending()
+        self.save()
+        logger.info(f"Trained IVF index: {n} vectors in {nlist} lists")
+
+    def _assign_pending(self):
+        """Bucket vectors appended to the base index since the last sync."""
+        start, end = len(self._assignments), len(self.base)
+        if start >= end or self.centroids is None:
+            return
+        assignments = _nearest_centroid(self.base.matrix[start:end], self.centroids)
+        for offset, bucket in enumerate(assignments):
+            self._lists[bucket].append(start + offset)
+            self._list_arrays[bucket] = None
+        self._assignments = np.concatenate([self._assignments, assignments])
+        self._unsaved += end - start
+
+    def sync(self):
+        """Incrementally index new vectors, retraining once the base has outgrown the centroids."""
+        if self.centroids is None or len(self.base) > self.trained_size * self.retrain_factor:
+            self.train()
+            return
+        self._assign_pending()
+        if self._unsaved >= self.save_every:
+            self.save()
+
+    def flush(self):
+        """Bucket new vectors of the base index and persist, if anything changed since the last save."""
+        self.sync()
+        if self._unsaved:
+            self.save()
+
+    def compact(self, keep: np.ndarray):
+        """Follow rows removed from the base index; `keep` masks its previous positions."""
+        if self.centroids is None:
+            return
+        self._assignments = self._assignments[keep[:len(self._assignments)]]
+        counts = np.bincount(self._assignments, minlength=len(self.centroids))
+        order = np.argsort(self._assignments, kind="stable").astype(np.int64)
+        self._list_arrays = np.split(order, np.cumsum(counts)[:-1])
+        self._lists = [bucket.tolist() for bucket in self._list_arrays]
+        self.save()
+
+    # -- querying -------------------------------------------------------
+
+    def _bucket(self, bucket: int) -> np.ndarray:
+        if self._list_arrays[bucket] is None:
+            self._list_arrays[bucket] = np.asarray(self._lists[bucket], dtype=np.int64)
+        return self._list_arrays[bucket]
+
+    def search(self, query_embedding: np.ndarray, k: int, nprobe: int = None) -> List[Tuple[str, float]]:
+        """Approximate top-k (memory_id, importance-weighted cosine) pairs."""
+        self.sync()
+        if len(self) == 0 or k <= 0:
+            return []
+        query = EmbeddingIndex.normalize(np.asarray(query_embedding).ravel())
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        centroid_scores = self.centroids @ query
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        positions = np.concatenate([self._bucket(bucket) for bucket in probe])
+        if len(positions) == 0:
+            return []
+        return self.base.top_k(self.base.score(query, positions), k, positions)
+
+    def evaluate_recall(self, query_embeddings: np.ndarray, k: int = 10, nprobe: int = None) -> Dict:
+        """Measure recall@k and latency of the ANN path against exact search."""
+        self.sync()
+        exact_time = ann_time = 0.0
+        hits = total = 0
+        for query in np.atleast_2d(query_embeddings):
+            start = time.perf_counter()
+            exact = {memory_id for memory_id, _ in self.base.search(query, k)}
+            exact_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            approx = {memory_id for memory_id, _ in self.search(query, k, nprobe)}
+            ann_time += time.perf_counter() - start
+
+            hits += len(exact & approx)
+            total += len(exact)
+
+        queries = max(1, len(np.atleast_2d(query_embeddings)))
+        return {
+            'k': k,
+            'nprobe': nprobe or self.nprobe,
+            'nlist': 0 if self.centroids is None else len(self.centroids),
+            'vectors': len(self),
+            'recall_at_k': hits / total if total else 1.0,
+            'exact_ms_per_query': exact_time * 1000 / queries,
+            'ann_ms_per_query': ann_time * 1000 / queries
+        }
+
+    # -- persistence ----------------------------------------------------
+
+    def save(self):
+        """Persist centroids and bucket assignments next to the database."""
+        self._unsaved = 0
+        if not self.path or self.centroids is None:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, centroids=self.centroids, assignments=self._assignments,
+                     ids=np.array(self.base.ids[:len(self._assignments)]),
+                     trained_size=np.array(self.trained_size))
+        os.replace(tmp_path, self.path)
+
+    def load(self) -> bool:
+        """
+        Restore a persisted index if it matches the base index.
+
+        Vectors appended since the file was written are bucketed incrementally;
+        a missing file or one whose ids diverge from the base is rebuilt.
+        """
+        if self.path and os.path.exists(self.path):
+            try:
+                with np.load(self.path) as data:
+                    ids = data['ids']
+                    if len(ids) <= len(self.base) and np.array_equal(ids, np.array(self.base.ids[:len(ids)])):
+                        self.centroids = data['centroids']
+                        self.trained_size = int(data['trained_size'])
+                        self._assignments = np.zeros(0, dtype=np.int32)
+                        self._lists = [[] for _ in range(len(self.centroids))]
+                        self._list_arrays = [None] * len(self.centroids)
+                        assignments = data['assignments']
+                        for position, bucket in enumerate(assignments):
+                            self._lists[bucket].append(position)
+                        self._assignments = assignments.astype(np.int32)
+                        self.sync()
+                        return True
+                logger.info("IVF index is stale, rebuilding")
+            except Exception as e:
+                logger.warning(f"Could not load IVF index ({e}), rebuilding")
+        self.train()
+        return False